@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+import argparse
+import copy
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+# Un "banc d'essai": mesure combien de temps prennent les fonctions les plus
+# souvent appelées du démineur et des robots, pour plusieurs tailles de
+# terrain.
+#
+# Avant d'essayer d'accélérer une fonction, il faut savoir combien de temps
+# elle prend, et après, vérifier que c'est vraiment plus rapide (et, avec les
+# tests de demineur_papa/test.py et robots_papa/test.py, que le résultat est
+# toujours le même).  Les mesures sont écrites dans un fichier JSON, avec le
+# numéro du commit git, pour pouvoir comparer deux versions du programme:
+#
+#    python banc_d_essai.py --sortie avant.json
+#    ... changer le programme ...
+#    python banc_d_essai.py --sortie apres.json --compare avant.json
+#
+# Chaque mesure est la durée d'un seul appel, en secondes: la plus petite de
+# plusieurs répétitions (les autres ont été ralenties par autre chose qui
+# tournait en même temps sur l'ordinateur).
+
+REPERTOIRE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(REPERTOIRE, 'demineur_papa'))
+sys.path.insert(0, os.path.join(REPERTOIRE, 'robots_papa'))
+
+import demineur
+import robots
+
+# (rangées, colonnes, bombes) pour le démineur: débutant, expert, puis plus
+# grand
+TAILLES_DEMINEUR = [(9, 9, 10), (16, 30, 99), (100, 100, 500), (500, 500, 5000)]
+# (rangées, colonnes, robots) pour les robots
+TAILLES_ROBOTS = [(18, 30, 15), (100, 100, 200), (500, 500, 2000)]
+
+def mesure(fonction, prepare=None, repetitions=5, duree_minimum=0.01):
+    """La durée (en secondes) d'un appel de fonction(preparation)
+
+    `prepare' (facultatif) est appelée avant chaque appel, sans être
+    mesurée, p.ex. pour recopier un terrain que `fonction' va changer.  Les
+    appels très courts sont répétés jusqu'à durer au moins `duree_minimum'."""
+    meilleure = None
+    for _ in range(repetitions):
+        total = 0.0
+        appels = 0
+        while total < duree_minimum:
+            argument = prepare() if prepare is not None else None
+            debut = time.perf_counter()
+            fonction(argument)
+            total += time.perf_counter() - debut
+            appels += 1
+        if meilleure is None or total / appels < meilleure:
+            meilleure = total / appels
+    return meilleure
+
+def mesures_demineur(tailles, repetitions):
+    resultats = {}
+    for (nombre_de_rangees, nombre_de_colonnes, nombre_de_bombes) in tailles:
+        taille = f'{nombre_de_rangees}x{nombre_de_colonnes}'
+        # la case du milieu n'a pas de bombe autour: demine découvre une
+        # grande partie du terrain d'un coup
+        milieu = (nombre_de_rangees // 2, nombre_de_colonnes // 2)
+        terrain_de_jeu = demineur.nouveau_jeu(
+            nombre_de_rangees, nombre_de_colonnes, nombre_de_bombes, graine=0,
+            cases_sures=demineur.autour(nombre_de_rangees, nombre_de_colonnes, *milieu))
+        def toutes_les_cases(_):
+            for rangee in range(nombre_de_rangees):
+                for colonne in range(nombre_de_colonnes):
+                    demineur.bombes_voisines(terrain_de_jeu, rangee, colonne)
+        # par case, pour pouvoir comparer les tailles entre elles
+        resultats[f'demineur.bombes_voisines {taille}'] = (
+            mesure(toutes_les_cases, repetitions=repetitions) / (nombre_de_rangees * nombre_de_colonnes))
+        resultats[f'demineur.cases_voisines {taille}'] = mesure(
+            lambda _: demineur.cases_voisines(terrain_de_jeu, *milieu), repetitions=repetitions)
+        resultats[f'demineur.demine {taille}'] = mesure(
+            lambda terrain: demineur.demine(terrain, *milieu),
+            prepare=lambda: copy.deepcopy(terrain_de_jeu), repetitions=repetitions)
+    return resultats
+
+def mesures_robots(tailles, repetitions):
+    resultats = {}
+    for (nombre_de_rangees, nombre_de_colonnes, nombre_de_robots) in tailles:
+        taille = f'{nombre_de_rangees}x{nombre_de_colonnes}'
+        indexe = robots.nouveau_jeu(nombre_de_colonnes, nombre_de_rangees, nombre_de_robots, graine=0)
+        # la même chose sans l'index, comme au tout début de robots.py
+        simple = [list(rangee) for rangee in indexe]
+        for (nom, terrain_de_jeu, recopie) in [
+                ('liste', simple, lambda: [list(rangee) for rangee in simple]),
+                ('indexe', indexe, lambda: robots.TerrainIndexe(list(rangee) for rangee in indexe))]:
+            resultats[f'robots.joueur {nom} {taille}'] = mesure(
+                lambda _: robots.joueur(terrain_de_jeu), repetitions=repetitions)
+            resultats[f'robots.robots {nom} {taille}'] = mesure(
+                lambda _: robots.robots(terrain_de_jeu), repetitions=repetitions)
+            resultats[f'robots.bouge_robots {nom} {taille}'] = mesure(
+                robots.bouge_robots, prepare=recopie, repetitions=repetitions)
+        resultats[f'robots.bouge_robots malins {taille}'] = mesure(
+            lambda terrain: robots.bouge_robots(terrain, robots.nouveau_champ()),
+            prepare=lambda: robots.TerrainIndexe(list(rangee) for rangee in indexe),
+            repetitions=repetitions)
+    return resultats
+
+def commit_git():
+    "Le numéro du commit git actuel (None si git n'est pas disponible)"
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPERTOIRE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(anciennes, nouvelles):
+    "Texte comparant deux séries de mesures (plus de 1.00x: plus rapide qu'avant)"
+    lignes = []
+    for nom in sorted(set(anciennes) | set(nouvelles)):
+        if nom in anciennes and nom in nouvelles:
+            lignes.append(f'{nom:45} {1e6 * anciennes[nom]:12.2f} µs {1e6 * nouvelles[nom]:12.2f} µs '
+                          f'{anciennes[nom] / nouvelles[nom]:8.2f}x')
+        else:
+            fichier = "l'ancien" if nom in anciennes else 'le nouveau'
+            lignes.append(f'{nom:45} (seulement dans {fichier})')
+    return '\n'.join(lignes)
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description='Mesure la durée des fonctions du démineur et des robots')
+    arguments.add_argument('--sortie', default=None, help='fichier JSON pour les mesures')
+    arguments.add_argument('--compare', default=None, help='fichier JSON de mesures précédentes')
+    arguments.add_argument('--repetitions', type=int, default=5)
+    arguments.add_argument('--rapide', action='store_true', help='seulement les petits terrains')
+    options = arguments.parse_args()
+    random.seed(0)
+    tailles_demineur = TAILLES_DEMINEUR[:2] if options.rapide else TAILLES_DEMINEUR
+    tailles_robots = TAILLES_ROBOTS[:1] if options.rapide else TAILLES_ROBOTS
+    # demine parle au joueur: redirect_stdout le fait taire
+    with contextlib.redirect_stdout(io.StringIO()):
+        mesures = mesures_demineur(tailles_demineur, options.repetitions)
+        mesures.update(mesures_robots(tailles_robots, options.repetitions))
+    resultat = {'commit': commit_git(),
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'mesures': mesures}
+    if options.sortie is not None:
+        with open(options.sortie, 'w') as fichier:
+            json.dump(resultat, fichier, indent=1, sort_keys=True)
+    if options.compare is not None:
+        with open(options.compare) as fichier:
+            print(compare(json.load(fichier)['mesures'], mesures))
+    else:
+        for (nom, duree) in sorted(mesures.items()):
+            print(f'{nom:45} {1e6 * duree:12.2f} µs')
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+import atexit
+import functools
+import json
+import os
+import sys
+import time
+
+# Un chronomètre pour savoir où passe le temps pendant une vraie partie (cf.
+# banc_d_essai.py qui mesure chaque fonction toute seule).
+#
+# Chaque module de jeu (demineur.py, robots.py) a une liste A_CHRONOMETRER
+# des fonctions les plus souvent appelées.  Quand le chronomètre est actif,
+# chacune de ces fonctions est remplacée par une "enveloppe" qui compte les
+# appels, additionne leur durée et range chaque durée dans un histogramme,
+# puis appelle la vraie fonction.  Quand il n'est pas actif, rien n'est
+# remplacé: les fonctions sont exactement celles du module et le programme
+# ne va pas plus lentement du tout.
+#
+# La durée d'une fonction comprend celle des fonctions qu'elle appelle (p.ex.
+# demine appelle bombes_voisines qui appelle cases_voisines).
+#
+# Un tour entier (p.ex. bouge_joueur, puis bouge_robots, puis
+# montre_le_terrain) a aussi son histogramme, sous le nom "module.tour".
+# Les boucles de jeu appellent debut_du_tour() et fin_du_tour() de leur
+# module (qui ne font rien quand le chronomètre n'est pas actif): ce qui se
+# passe entre les deux est un tour, sans le temps que le joueur met à
+# choisir son coup.
+#
+# Les mesures sont faites dans le processus qui joue.  Quand les parties
+# sont jouées par d'autres processus (cf. simulation.py), chacun renvoie ses
+# mesures avec le résultat de chaque partie (cf. envoie) et le processus
+# principal les additionne aux siennes (cf. recoit).
+#
+# Pour l'activer, il suffit de définir la variable d'environnement
+# CHRONOMETRE avant de lancer le jeu; le résumé est imprimé à la fin (ou
+# écrit dans un fichier JSON si CHRONOMETRE est un nom de fichier .json):
+#
+#    CHRONOMETRE=1 python -c 'import robots; robots.partie()'
+#    CHRONOMETRE=mesures.json python ia.py --parties 5
+#
+# ou depuis Python, à n'importe quel moment:
+#
+#    import chronometre, demineur
+#    chronometre.active(demineur)
+#    ...
+#    print(chronometre.resume())
+
+# nom complet de la fonction -> statistiques (cf. nouvelles_statistiques)
+STATISTIQUES = {}
+# les vraies fonctions, pour pouvoir les remettre (cf. desactive)
+ORIGINALES = {}
+
+def nouvelles_statistiques():
+    return {'appels': 0,
+            'duree': 0.0,
+            'maximum': 0.0,
+            # histogramme[i]: nombre d'appels qui ont duré moins de 2**i µs
+            # (et au moins 2**(i-1) µs)
+            'histogramme': [0] * 32}
+
+def note(statistiques, duree):
+    "Compte une durée (en secondes) dans les statistiques"
+    statistiques['appels'] += 1
+    statistiques['duree'] += duree
+    if duree > statistiques['maximum']:
+        statistiques['maximum'] = duree
+    # p.ex. (5).bit_length() = 3 parce que 5 = 0b101: c'est le numéro de la
+    # puissance de 2 juste au-dessus
+    histogramme = statistiques['histogramme']
+    histogramme[min(len(histogramme) - 1, int(duree * 1e6).bit_length())] += 1
+
+def enveloppe(fonction, statistiques):
+    "La fonction qui remplace `fonction' quand le chronomètre est actif"
+    # time.perf_counter est rangé dans une variable locale: c'est un peu
+    # plus rapide que de le chercher dans le module time à chaque appel
+    horloge = time.perf_counter
+    @functools.wraps(fonction)
+    def chronometree(*args, **kwargs):
+        debut = horloge()
+        try:
+            return fonction(*args, **kwargs)
+        finally:
+            note(statistiques, horloge() - debut)
+    chronometree.originale = fonction
+    return chronometree
+
+def marques_de_tour(statistiques):
+    "Les fonctions qui remplacent debut_du_tour et fin_du_tour d'un module (cf. active)"
+    horloge = time.perf_counter
+    debut = [None] # une liste pour que les deux fonctions partagent la valeur
+    def debut_du_tour():
+        debut[0] = horloge()
+    def fin_du_tour():
+        # un tour qui n'a pas commencé (p.ex. annulé) ne compte pas
+        if debut[0] is not None:
+            note(statistiques, horloge() - debut[0])
+            debut[0] = None
+    return (debut_du_tour, fin_du_tour)
+
+def remplace_partout(ancienne, nouvelle):
+    """Remplace `ancienne' par `nouvelle' dans tous les modules chargés
+
+    Nécessaire à cause de `from demineur import *': les autres modules ont
+    leur propre copie du nom de la fonction."""
+    for module in list(sys.modules.values()):
+        variables = getattr(module, '__dict__', None)
+        if variables is None:
+            continue
+        for (nom, valeur) in list(variables.items()):
+            if valeur is ancienne:
+                variables[nom] = nouvelle
+
+def active(module, noms=None):
+    """Chronomètre les fonctions `noms' du module (par défaut module.A_CHRONOMETRER)
+
+    Si le module a des fonctions debut_du_tour et fin_du_tour, les tours
+    sont chronométrés aussi.  Activer deux fois ne fait rien de plus."""
+    for nom in (module.A_CHRONOMETRER if noms is None else noms):
+        cle = f'{module.__name__}.{nom}'
+        if cle in ORIGINALES:
+            continue
+        fonction = getattr(module, nom)
+        ORIGINALES[cle] = fonction
+        remplace_partout(fonction, enveloppe(fonction, STATISTIQUES.setdefault(cle, nouvelles_statistiques())))
+    if hasattr(module, 'debut_du_tour') and f'{module.__name__}.debut_du_tour' not in ORIGINALES:
+        marques = marques_de_tour(STATISTIQUES.setdefault(f'{module.__name__}.tour', nouvelles_statistiques()))
+        for (nom, marque) in zip(['debut_du_tour', 'fin_du_tour'], marques):
+            ORIGINALES[f'{module.__name__}.{nom}'] = getattr(module, nom)
+            remplace_partout(getattr(module, nom), marque)
+
+def desactive():
+    "Remet partout les vraies fonctions (les statistiques sont gardées)"
+    for (cle, fonction) in ORIGINALES.items():
+        (nom_du_module, nom) = cle.rsplit('.', 1)
+        module = sys.modules.get(nom_du_module)
+        if module is not None:
+            remplace_partout(getattr(module, nom), fonction)
+    ORIGINALES.clear()
+
+def remet_a_zero():
+    "Oublie toutes les mesures faites jusqu'ici"
+    for statistiques in STATISTIQUES.values():
+        # les enveloppes gardent le même dictionnaire et la même liste: il
+        # faut les vider, pas les remplacer
+        statistiques['appels'] = 0
+        statistiques['duree'] = 0.0
+        statistiques['maximum'] = 0.0
+        statistiques['histogramme'][:] = [0] * len(statistiques['histogramme'])
+
+def envoie():
+    """Les mesures faites depuis le dernier envoi, pour un autre processus (cf. recoit)
+
+    Les mesures de ce processus-ci sont remises à zéro: ce qui a été envoyé
+    ne le sera pas une deuxième fois."""
+    mesures = {cle: {'appels': statistiques['appels'],
+                     'duree': statistiques['duree'],
+                     'maximum': statistiques['maximum'],
+                     'histogramme': list(statistiques['histogramme'])}
+               for (cle, statistiques) in STATISTIQUES.items() if statistiques['appels'] > 0}
+    remet_a_zero()
+    return mesures
+
+def recoit(mesures):
+    "Ajoute aux mesures de ce processus celles envoyées par un autre (cf. envoie)"
+    for (cle, autres) in mesures.items():
+        statistiques = STATISTIQUES.setdefault(cle, nouvelles_statistiques())
+        statistiques['appels'] += autres['appels']
+        statistiques['duree'] += autres['duree']
+        statistiques['maximum'] = max(statistiques['maximum'], autres['maximum'])
+        for (puissance, combien) in enumerate(autres['histogramme']):
+            statistiques['histogramme'][puissance] += combien
+
+def centile(statistiques, fraction):
+    "Une limite (en secondes) sous laquelle se trouve au moins `fraction' des appels"
+    compte = 0
+    for (puissance, combien) in enumerate(statistiques['histogramme']):
+        compte += combien
+        if compte >= fraction * statistiques['appels']:
+            return 2 ** puissance / 1e6
+    return statistiques['maximum']
+
+def resume():
+    "Un tableau (texte) des mesures, de la fonction qui a pris le plus de temps à celle qui en a pris le moins"
+    lignes = [f'{"fonction":40} {"appels":>10} {"total s":>10} {"moyenne µs":>12} '
+              f'{"50% < µs":>10} {"99% < µs":>10} {"max µs":>10}']
+    for (cle, statistiques) in sorted(STATISTIQUES.items(), key=lambda element: -element[1]['duree']):
+        if statistiques['appels'] == 0:
+            continue
+        lignes.append(f'{cle:40} {statistiques["appels"]:10} {statistiques["duree"]:10.3f} '
+                      f'{1e6 * statistiques["duree"] / statistiques["appels"]:12.1f} '
+                      f'{1e6 * centile(statistiques, 0.5):10.0f} {1e6 * centile(statistiques, 0.99):10.0f} '
+                      f'{1e6 * statistiques["maximum"]:10.0f}')
+    return '\n'.join(lignes)
+
+def sauve(fichier):
+    "Écrit toutes les mesures dans un fichier JSON"
+    with open(fichier, 'w') as f:
+        json.dump(STATISTIQUES, f, indent=1, sort_keys=True)
+
+def a_la_fin():
+    "Appelée quand le programme se termine, si CHRONOMETRE est défini"
+    destination = os.environ.get('CHRONOMETRE', '')
+    if destination.endswith('.json'):
+        sauve(destination)
+    else:
+        print(resume(), file=sys.stderr)
+
+if os.environ.get('CHRONOMETRE'):
+    atexit.register(a_la_fin)
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import io
+import sys
+
+from demineur import *
+
+# Un affichage pour les grands terrains: au lieu d'imprimer tout le terrain à
+# chaque tour (cf. montre_le_terrain dans demineur.py), nous ne montrons qu'une
+# "fenêtre" (une partie du terrain qui tient dans le terminal) et nous ne
+# redessinons que les cases qui ont changé depuis le dernier tour.
+#
+# Pour écrire à un endroit précis de l'écran, le terminal comprend des
+# "séquences d'échappement ANSI": des caractères spéciaux qui commencent par
+# ESC (le caractère numéro 27, écrit '\x1b' en Python).  Par exemple
+# '\x1b[3;10H' place le curseur à la ligne 3, colonne 10 et '\x1b[2J' efface
+# tout l'écran.
+#
+# Le joueur tape ses commandes:
+#
+#    5 7    pour déminer la case à la rangée 5, colonne 7
+#    f 5 7  pour planter un drapeau à la rangée 5, colonne 7
+#    z q s d  pour déplacer la fenêtre vers le haut, la gauche, le bas ou la droite
+#
+# Comme dessine_le_terrain dans demineur.py, la fenêtre montre aussi les
+# terrains hexagonaux (les rangées impaires décalées d'une demi-case) et les
+# cubes (un titre avant chaque niveau).
+#
+# Exemple:
+#
+#    python affichage.py
+
+EFFACE_ECRAN = '\x1b[2J'
+EFFACE_FIN_DE_LIGNE = '\x1b[K'
+LARGEUR_CASE = 4 # cf. symbole dans demineur.py
+
+def position(ligne, colonne):
+    "Séquence ANSI pour placer le curseur (la première ligne et la première colonne ont le numéro 1)"
+    return f'\x1b[{ligne};{colonne}H'
+
+def nouvel_ecran(hauteur=20, largeur=15, topo=None):
+    """Une fenêtre de `hauteur' rangées et `largeur' colonnes sur le terrain
+
+    'haut' et 'gauche' sont la rangée et la colonne du terrain montrées dans
+    le coin en haut à gauche de la fenêtre.  `topo' est la forme du terrain
+    (cf. topologie_du_terrain), un terrain carré par défaut."""
+    nom = 'carre' if topo is None else topo['nom']
+    # pour un cube, le nombre de rangées d'un niveau (il y a un titre avant
+    # chaque niveau), sinon None
+    rangees_par_niveau = topo['forme'][1] if nom == 'cube' else None
+    if rangees_par_niveau is None:
+        lignes = hauteur
+    else:
+        # au plus autant de titres que de niveaux touchés par la fenêtre
+        lignes = hauteur + (hauteur + rangees_par_niveau - 2) // rangees_par_niveau + 1
+    return {'hauteur': hauteur,
+            'largeur': largeur,
+            'haut': 0,
+            'gauche': 0,
+            'hexagonal': nom == 'hexagonal',
+            'rangees_par_niveau': rangees_par_niveau,
+            # le nombre de lignes de l'écran sous les numéros de colonnes
+            'lignes': lignes,
+            # il faut tout dessiner la première fois
+            'tout_redessiner': True}
+
+def deplace_vue(ecran, terrain_de_jeu, rangees_en_plus, colonnes_en_plus):
+    "Fait glisser la fenêtre sur le terrain, sans sortir du terrain"
+    ecran['haut'] = max(0, min(rangees(terrain_de_jeu) - ecran['hauteur'],
+                               ecran['haut'] + rangees_en_plus))
+    ecran['gauche'] = max(0, min(colonnes(terrain_de_jeu) - ecran['largeur'],
+                                 ecran['gauche'] + colonnes_en_plus))
+    # les numéros des rangées et des colonnes changent: il faut tout redessiner
+    ecran['tout_redessiner'] = True
+
+def dans_la_vue(ecran, rangee, colonne):
+    "Vrai si la case est visible dans la fenêtre"
+    return (ecran['haut'] <= rangee < ecran['haut'] + ecran['hauteur'] and
+            ecran['gauche'] <= colonne < ecran['gauche'] + ecran['largeur'])
+
+def ligne_de_la_rangee(ecran, rangee):
+    "Numéro de la ligne de l'écran d'une rangée visible"
+    ligne = 2 + rangee - ecran['haut']
+    niveau = ecran['rangees_par_niveau']
+    if niveau is not None:
+        # un titre en haut de la fenêtre, puis un avant chaque nouveau niveau
+        ligne += 1 + rangee // niveau - ecran['haut'] // niveau
+    return ligne
+
+def place_de_la_case(ecran, rangee, colonne):
+    "Séquence ANSI pour placer le curseur sur une case visible"
+    # sur un terrain hexagonal, les rangées impaires sont décalées d'une
+    # demi-case (cf. dessine_le_terrain)
+    decalage = LARGEUR_CASE // 2 if ecran['hexagonal'] and rangee % 2 == 1 else 0
+    return position(ligne_de_la_rangee(ecran, rangee),
+                    1 + decalage + LARGEUR_CASE * (colonne - ecran['gauche']))
+
+def dessine(ecran, terrain_de_jeu, changements):
+    """Texte à écrire pour mettre l'écran à jour
+
+    `changements' est la liste des cases qui ont changé depuis la dernière
+    fois (cf. demine et plante_drapeau).  Seules ces cases sont redessinées,
+    donc le temps ne dépend pas de la taille du terrain."""
+    morceaux = []
+    if ecran['tout_redessiner']:
+        ecran['tout_redessiner'] = False
+        derniere_rangee = min(rangees(terrain_de_jeu), ecran['haut'] + ecran['hauteur'])
+        derniere_colonne = min(colonnes(terrain_de_jeu), ecran['gauche'] + ecran['largeur'])
+        morceaux.append(EFFACE_ECRAN)
+        morceaux.append(position(1, 1))
+        for colonne in range(ecran['gauche'], derniere_colonne):
+            morceaux.append(f'{colonne:3} ')
+        niveau = ecran['rangees_par_niveau']
+        for rangee in range(ecran['haut'], derniere_rangee):
+            if niveau is not None and (rangee == ecran['haut'] or rangee % niveau == 0):
+                # le titre du niveau, sur la ligne juste au-dessus
+                morceaux.append(position(ligne_de_la_rangee(ecran, rangee) - 1, 1))
+                morceaux.append(f"niveau {rangee // niveau}")
+            morceaux.append(place_de_la_case(ecran, rangee, ecran['gauche']))
+            for colonne in range(ecran['gauche'], derniere_colonne):
+                morceaux.append(symbole(case(terrain_de_jeu, rangee, colonne)))
+            if ecran['hexagonal'] and rangee % 2 == 0:
+                # pour que les numéros de rangée restent alignés
+                morceaux.append(' ' * (LARGEUR_CASE // 2))
+            morceaux.append(f"| rangee={rangee}")
+    else:
+        for (rangee, colonne) in changements:
+            if dans_la_vue(ecran, rangee, colonne):
+                morceaux.append(place_de_la_case(ecran, rangee, colonne))
+                morceaux.append(symbole(case(terrain_de_jeu, rangee, colonne)))
+    return ''.join(morceaux)
+
+def ligne_sous_le_terrain(ecran, numero, texte):
+    "Texte à écrire pour remplacer une des lignes sous la fenêtre"
+    return position(2 + ecran['lignes'] + numero, 1) + EFFACE_FIN_DE_LIGNE + texte
+
+def jouer_dans_le_terminal(terrain_de_jeu, hauteur=20, largeur=15, compteurs=None):
+    """Joue un partie sur un terrain donné (cf. jouer), en ne redessinant que ce qui change
+
+    Les compteurs (bombes, drapeaux, cases restantes) sont calculés une fois
+    au début puis mis à jour avec les changements: un tour prend le même
+    temps sur un petit et sur un grand terrain.
+
+    `compteurs' est un dictionnaire avec les clés 'bombes', 'drapeaux',
+    'restantes' et 'coups' (cf. sauvegarde.py) si on les connaît déjà.  Il
+    est mis à jour après chaque coup.  Le résultat est vrai si le joueur a
+    gagné, faux s'il a perdu."""
+    ecran = nouvel_ecran(min(hauteur, rangees(terrain_de_jeu)),
+                         min(largeur, colonnes(terrain_de_jeu)),
+                         topologie_du_terrain(terrain_de_jeu))
+    if compteurs is None:
+        # le jeu est fini quand il n'y a plus aucune case INCONNU ou BOMBE
+        # (cf. jouer)
+        compteurs = {'bombes': bombes_armees(terrain_de_jeu) + bombes_marquees(terrain_de_jeu),
+                     'drapeaux': drapeaux(terrain_de_jeu),
+                     'restantes': sum(1 for rangee in terrain_de_jeu for valeur in rangee
+                                      if valeur in [INCONNU, BOMBE]),
+                     'coups': 0}
+    DEPLACEMENTS = {'z': (-ecran['hauteur'] // 2, 0),
+                    's': (ecran['hauteur'] // 2, 0),
+                    'q': (0, -ecran['largeur'] // 2),
+                    'd': (0, ecran['largeur'] // 2)}
+    changements = []
+    message = ''
+    perdu = False
+    while compteurs['restantes'] > 0 and not perdu:
+        # Tout ce qu'il faut écrire est préparé à l'avance et écrit d'un coup
+        sys.stdout.write(
+            dessine(ecran, terrain_de_jeu, changements)
+            + ligne_sous_le_terrain(ecran, 0, f"Il y a {compteurs['bombes']} bombes et {compteurs['drapeaux']} drapeaux")
+            + ligne_sous_le_terrain(ecran, 1, message)
+            + ligne_sous_le_terrain(ecran, 2, ''))
+        sys.stdout.flush()
+        changements = []
+        message = ''
+        mots = input("Commande (p.ex. '5 7', 'f 5 7' ou z/q/s/d)? ").strip().lower().split()
+        if len(mots) == 1 and mots[0] in DEPLACEMENTS:
+            deplace_vue(ecran, terrain_de_jeu, *DEPLACEMENTS[mots[0]])
+            continue
+        planter_drapeau = len(mots) == 3 and mots[0] == 'f'
+        if planter_drapeau:
+            mots = mots[1:]
+        try:
+            rangee, colonne = [int(mot) for mot in mots]
+        except ValueError:
+            message = 'Commande inconnue'
+            continue
+        if not (0 <= rangee < rangees(terrain_de_jeu) and 0 <= colonne < colonnes(terrain_de_jeu)):
+            message = 'Case en dehors du terrain'
+            continue
+        # demine et plante_drapeau impriment parfois un message: nous
+        # l'attrapons pour l'afficher sous le terrain plutôt que par-dessus.
+        sortie = io.StringIO()
+        with contextlib.redirect_stdout(sortie):
+            if planter_drapeau:
+                plante_drapeau(terrain_de_jeu, rangee, colonne, changements)
+                compteurs['drapeaux'] += len(changements)
+            else:
+                perdu = not demine(terrain_de_jeu, rangee, colonne, changements)
+        message = sortie.getvalue().strip()
+        compteurs['restantes'] -= len(changements)
+        compteurs['coups'] += 1
+    sys.stdout.write(dessine(ecran, terrain_de_jeu, changements)
+                     + ligne_sous_le_terrain(ecran, 1, 'BOUM BOUM BOUM' if perdu else 'Bravo!')
+                     + '\n')
+    return not perdu
+
+if __name__ == "__main__":
+    jouer_dans_le_terminal(nouveau_jeu(40, 60, 300))
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import argparse
+import asyncio
+import random
+import time
+
+from serveur import PORT
+
+# Fait jouer beaucoup de joueurs en même temps contre serveur.py pour voir
+# combien de joueurs il peut supporter.  Chaque joueur joue au hasard (il ne
+# démine que des cases qu'il ne connaît pas encore) et mesure combien de
+# temps le serveur met à répondre.
+#
+# Exemple (après avoir démarré `python serveur.py' dans un autre terminal):
+#
+#    python client_de_charge.py --joueurs 2000 --parties 5
+
+async def joueur(adresse, port, parties, taille, hasard, attentes):
+    "Un joueur qui joue `parties' parties; ajoute la durée de chaque coup à `attentes'"
+    (nombre_de_rangees, nombre_de_colonnes, nombre_de_bombes) = taille
+    (lecteur, ecrivain) = await asyncio.open_connection(adresse, port)
+    victoires = 0
+    async def demande(ligne):
+        debut = time.perf_counter()
+        ecrivain.write(ligne.encode('utf-8') + b'\n')
+        await ecrivain.drain()
+        mots = (await lecteur.readline()).decode('utf-8').split()
+        attentes.append(time.perf_counter() - debut)
+        if not mots or mots[0] == 'ERREUR':
+            raise RuntimeError(f"{ligne} -> {' '.join(mots)}")
+        return mots
+    for _ in range(parties):
+        await demande(f'NOUVEAU {nombre_de_rangees} {nombre_de_colonnes} {nombre_de_bombes}')
+        inconnues = set((rangee, colonne)
+                        for rangee in range(nombre_de_rangees)
+                        for colonne in range(nombre_de_colonnes))
+        drapeaux_a_planter = nombre_de_bombes
+        while True:
+            if len(inconnues) == drapeaux_a_planter:
+                # toutes les cases inconnues sont des bombes: il faut y
+                # planter des drapeaux pour gagner (cf. jouer)
+                (rangee, colonne) = min(inconnues)
+                drapeaux_a_planter -= 1
+                mots = await demande(f'DRAPEAU {rangee} {colonne}')
+            else:
+                (rangee, colonne) = hasard.choice(sorted(inconnues))
+                mots = await demande(f'DEMINE {rangee} {colonne}')
+            for mot in mots[1:]:
+                if mot in ['PERDU', 'GAGNE']:
+                    continue
+                (autre_rangee, autre_colonne, _valeur) = [int(nombre) for nombre in mot.split(',')]
+                inconnues.discard((autre_rangee, autre_colonne))
+            if mots[-1] == 'GAGNE':
+                victoires += 1
+            if mots[-1] in ['PERDU', 'GAGNE']:
+                break
+    ecrivain.close()
+    return victoires
+
+async def charge(adresse, port, joueurs, parties, taille, graine):
+    "Lance tous les joueurs en même temps et imprime les statistiques"
+    attentes = []
+    debut = time.perf_counter()
+    victoires = await asyncio.gather(*[
+        joueur(adresse, port, parties, taille, random.Random(f'{graine}:{numero}'), attentes)
+        for numero in range(joueurs)])
+    duree = time.perf_counter() - debut
+    attentes.sort()
+    def centile(p):
+        return 1000 * attentes[min(len(attentes) - 1, int(p * len(attentes)))]
+    print(f'{joueurs} joueurs, {joueurs * parties} parties ({sum(victoires)} gagnées), '
+          f'{len(attentes)} requêtes en {duree:.2f} s ({len(attentes) / duree:.0f} par seconde)')
+    print(f'attente: médiane {centile(0.5):.2f} ms, 99% {centile(0.99):.2f} ms, '
+          f'maximum {1000 * attentes[-1]:.2f} ms')
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description='Beaucoup de joueurs contre serveur.py')
+    arguments.add_argument('--adresse', default='127.0.0.1')
+    arguments.add_argument('--port', type=int, default=PORT)
+    arguments.add_argument('--joueurs', type=int, default=500)
+    arguments.add_argument('--parties', type=int, default=3)
+    arguments.add_argument('--rangees', type=int, default=9)
+    arguments.add_argument('--colonnes', type=int, default=9)
+    arguments.add_argument('--bombes', type=int, default=10)
+    arguments.add_argument('--graine', default='0')
+    options = arguments.parse_args()
+    asyncio.run(charge(options.adresse, options.port, options.joueurs, options.parties,
+                       (options.rangees, options.colonnes, options.bombes), options.graine))
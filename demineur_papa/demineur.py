@@ -1,5 +1,11 @@
 # -*- coding: utf-8 -*-
+import array
+import copy
+import os
 import random
+import sys
+
+import topologies
 
 # Le but du jeu est de déminer chaque endroit, soit en plantant un drapeau
 # pour avertir qu'il pourrait y avoir une bombe, soit en "marchant" dessus:
@@ -33,6 +39,11 @@ import random
 # comprises, raison pour laquelle les constantes INCONNU, BOMBE, BOMBE_DRAPEAU
 # et DRAPEAU sont négatives).
 #
+# Les voisines d'une case sont celles que donne la forme du terrain (cf.
+# topologies.py): un terrain normal (une liste de rangées) est carré, mais un
+# TerrainTopologique peut aussi être un tore, des hexagones ou un cube.  Les
+# fonctions de ce fichier marchent pour toutes les formes.
+#
 # Améliorations possibles
 #
 # 1. Limiter le nombre de drapeaux: empêcher de planter plus de drapeaux qu'il
@@ -47,20 +58,180 @@ BOMBE = -2 # la case n'a pas encore été déminée, mais il y a une bombe!
 BOMBE_DRAPEAU = -3 # le joueur a planté un drapeau correctement (il y a une bombe en dessous)
 DRAPEAU = -4 # le joueur a planté un drapeau en erreur (il n'y a pas de bombe en dessous)
 
-def nouveau_jeu():
-    "Crée un nouveau jeu avec des bombes placées au hasard et toutes les autres cases vides"
+def nouveau_jeu(nombre_de_rangees=5, nombre_de_colonnes=5, nombre_de_bombes=5,
+                graine=None, cases_sures=()):
+    """Crée un nouveau jeu avec des bombes placées au hasard et toutes les autres cases vides
+
+    Il y a exactement `nombre_de_bombes' bombes et aucune dans les
+    `cases_sures' (une liste de (rangée, colonne), p.ex. autour(...) pour que
+    le premier coup du joueur ne tombe jamais sur une bombe).  Avec la même
+    `graine', on obtient toujours le même terrain.
+
+    Attention, choisir les bombes ne dépend pas de la taille du terrain (cf.
+    place_bombes), mais le terrain lui-même si: une liste de rangées garde
+    8 octets par case, quel que soit le nombre de bombes.  Un terrain de
+    10000x10000 prend donc environ 800 Mo et plusieurs secondes à remplir.
+    Pour de si grands terrains, mieux vaut une carte avec 1 bit par case
+    (carte_des_bombes), un fichier avec 2 cases par octet créé directement
+    depuis cette carte (sauvegarde.nouvelle_partie) ou un terrain généré au
+    fur et à mesure (cf. terrain_infini.py)."""
     # Nous commen‌çons par un tableau où toutes les cases sont vides ...
-    tableau = [[INCONNU, INCONNU, INCONNU, INCONNU, INCONNU]
-               for _rangee in range(5)]
-    # ... puis nous ajoutons les bombes.  Nous essayons de placer autant de
-    # bombes que de rangées, mais on peut avoir "pas de chance" et mettre une
-    # bombe dans une case où il y en avait déjà une: dans ce cas, c'est comme
-    # si il y avait une bombe en moins.
-    for bombe in range(len(tableau)):
-        # p.ex. random.randrange(5) peut être 0, 1, 2, 3 ou 4 (au hasard)
-        tableau[random.randrange(rangees(tableau))][random.randrange(colonnes(tableau))] = BOMBE
+    tableau = [[INCONNU] * nombre_de_colonnes for _rangee in range(nombre_de_rangees)]
+    # ... puis nous ajoutons les bombes aux places choisies par place_bombes.
+    for numero in place_bombes(nombre_de_rangees, nombre_de_colonnes, nombre_de_bombes,
+                               graine, cases_sures):
+        # p.ex. divmod(17, 5) = (3, 2) parce que 17 = 3 * 5 + 2
+        (rangee, colonne) = divmod(numero, nombre_de_colonnes)
+        tableau[rangee][colonne] = BOMBE
     return tableau
 
+class TerrainTopologique(list):
+    """Un terrain (une liste de rangées) qui connaît sa forme (cf. topologies.py)
+
+    Les niveaux d'un cube sont les uns en dessous des autres: la rangée r du
+    niveau n est la rangée n * rangees + r du terrain."""
+    def __init__(self, rangees, topo):
+        super().__init__(rangees)
+        self.topo = topo
+
+    def __deepcopy__(self, memo):
+        # les rangées sont recopiées, mais pas la forme: elle ne change
+        # jamais et ses tableaux sont partagés (cf. topologies.py)
+        return TerrainTopologique(copy.deepcopy(list(self), memo), self.topo)
+
+def nouveau_jeu_topologique(topo, nombre_de_bombes=5, graine=None, cases_sures=()):
+    "Comme nouveau_jeu, mais avec la forme `topo' (p.ex. topologies.tore(5, 5))"
+    nombre_de_colonnes = topo['forme'][-1]
+    return TerrainTopologique(nouveau_jeu(topo['cases'] // nombre_de_colonnes, nombre_de_colonnes,
+                                          nombre_de_bombes, graine, cases_sures), topo)
+
+def topologie_du_terrain(terrain_de_jeu):
+    "La forme du terrain: celle d'un TerrainTopologique, sinon un terrain carré"
+    # getattr(objet, 'nom', None) vaut None si l'objet n'a pas d'attribut `nom'
+    topo = getattr(terrain_de_jeu, 'topo', None)
+    if topo is None:
+        # topologies.carre se souvient des tableaux déjà préparés
+        topo = topologies.carre(rangees(terrain_de_jeu), colonnes(terrain_de_jeu))
+    return topo
+
+def place_bombes(nombre_de_rangees, nombre_de_colonnes, nombre_de_bombes,
+                 graine=None, cases_sures=()):
+    """Choisit au hasard où mettre les bombes
+
+    Le résultat est un ensemble (set) de numéros de case, la case (rangée,
+    colonne) ayant le numéro rangée * nombre_de_colonnes + colonne.  Il n'y a
+    jamais deux bombes dans la même case, et aucune dans les `cases_sures'.
+
+    Le temps et la mémoire utilisés dépendent du nombre de bombes (pas de la
+    taille du terrain), mais un ensemble garde environ 60 octets par numéro:
+    15 millions de bombes prennent déjà plus d'un Go.  Pour de si grands
+    terrains, carte_des_bombes choisit les mêmes cases avec 1 bit par case."""
+    # Sans graine, on utilise le hasard du module random (comme avant), avec
+    # une graine, un générateur à part qui donne toujours les mêmes nombres.
+    hasard = random if graine is None else random.Random(graine)
+    cases = nombre_de_rangees * nombre_de_colonnes
+    # set(...) enlève les doublons
+    sures = set(rangee * nombre_de_colonnes + colonne for (rangee, colonne) in cases_sures)
+    libres = cases - len(sures)
+    if not 0 <= nombre_de_bombes <= libres:
+        raise ValueError(f"Impossible de placer {nombre_de_bombes} bombes dans {libres} cases libres")
+    if 2 * nombre_de_bombes > libres:
+        # Plus de bombes que de cases vides: il est plus rapide de tirer au
+        # hasard les cases vides et de mettre des bombes partout ailleurs.
+        # Parcourir toutes les cases coûte alors au plus 2 fois le nombre de
+        # bombes.
+        vides = tire_sans_remise(hasard, cases, libres - nombre_de_bombes, sures)
+        return set(numero for numero in range(cases)
+                   if numero not in vides and numero not in sures)
+    return tire_sans_remise(hasard, cases, nombre_de_bombes, sures)
+
+def tire_sans_remise(hasard, cases, combien, interdites):
+    """Tire `combien' numéros différents entre 0 et cases - 1, sauf les `interdites'
+
+    Nous tirons d'un coup autant de numéros qu'il en manque, puis jetons les
+    doublons et les numéros interdits, et recommençons jusqu'à en avoir
+    assez.  Quand il faut moins de la moitié des numéros possibles, il y a
+    peu de doublons et il suffit de quelques tours."""
+    tires = set()
+    while len(tires) < combien:
+        # 8 octets au hasard par numéro (un nombre entre 0 et 2**64 - 1)
+        # ramenés entre 0 et cases - 1 avec le reste de la division: p.ex.
+        # 17 % 5 = 2.  Certains restes sont un tout petit peu plus probables
+        # que d'autres, mais avec des nombres aussi grands, la différence est
+        # invisible.
+        nombres = array.array('Q')
+        nombres.frombytes(hasard.randbytes(8 * (combien - len(tires))))
+        # map(cases.__rmod__, nombres) calcule nombre % cases pour chaque
+        # nombre, sans boucle en Python (c'est beaucoup plus rapide)
+        tires.update(map(cases.__rmod__, nombres))
+        tires.difference_update(interdites)
+    return tires
+
+TIRAGE = 1 << 20
+
+def carte_des_bombes(nombre_de_rangees, nombre_de_colonnes, nombre_de_bombes,
+                     graine=None, cases_sures=()):
+    """Comme place_bombes (avec la même graine, les mêmes cases), mais en "carte"
+
+    La carte est un bytearray avec 1 bit par case: la case numéro n a une
+    bombe si bombe_sur_la_carte(carte, n).  Un terrain de 10000x10000 cases
+    ne prend ainsi que 12,5 Mo, quel que soit le nombre de bombes (cf.
+    sauvegarde.nouvelle_partie)."""
+    hasard = random if graine is None else random.Random(graine)
+    cases = nombre_de_rangees * nombre_de_colonnes
+    sures = set(rangee * nombre_de_colonnes + colonne for (rangee, colonne) in cases_sures)
+    libres = cases - len(sures)
+    if not 0 <= nombre_de_bombes <= libres:
+        raise ValueError(f"Impossible de placer {nombre_de_bombes} bombes dans {libres} cases libres")
+    # Comme dans place_bombes: avec plus de bombes que de cases vides, nous
+    # tirons les cases vides et inversons la carte à la fin.
+    inverse = 2 * nombre_de_bombes > libres
+    combien = libres - nombre_de_bombes if inverse else nombre_de_bombes
+    # (cases + 7) // 8 octets: assez pour toutes les cases, 8 par octet
+    carte = bytearray((cases + 7) // 8)
+    # les cases sûres sont marquées d'avance: un numéro déjà marqué est
+    # simplement retiré (comme les doublons dans tire_sans_remise)
+    for numero in sures:
+        carte[numero >> 3] |= 1 << (numero & 7)
+    tires = 0
+    while tires < combien:
+        # au plus TIRAGE numéros à la fois: 8 octets chacun, c'est autant
+        # de mémoire que la carte de 500 millions de cases
+        nombres = array.array('Q')
+        nombres.frombytes(hasard.randbytes(8 * min(combien - tires, TIRAGE)))
+        for numero in map(cases.__rmod__, nombres):
+            # numero >> 3 = numero // 8 (l'octet), numero & 7 = numero % 8 (le bit)
+            octet = numero >> 3
+            bit = 1 << (numero & 7)
+            if not carte[octet] & bit:
+                carte[octet] |= bit
+                tires += 1
+    if inverse:
+        # translate remplace chaque octet o par 255 - o (tous ses bits
+        # inversés): les cases vides et sûres deviennent sans bombe, toutes
+        # les autres ont une bombe
+        carte = bytearray(carte.translate(bytes(range(255, -1, -1))))
+        if cases % 8:
+            # les bits après la dernière case ne sont pas des cases
+            carte[-1] &= (1 << (cases % 8)) - 1
+    else:
+        for numero in sures:
+            carte[numero >> 3] &= ~(1 << (numero & 7))
+    return carte
+
+def bombe_sur_la_carte(carte, numero):
+    "Vrai si la case numéro `numero' a une bombe (cf. carte_des_bombes)"
+    return carte[numero >> 3] >> (numero & 7) & 1 == 1
+
+def autour(nombre_de_rangees, nombre_de_colonnes, rangee, colonne):
+    """La case (rangée, colonne) et ses voisines (cf. cases_voisines)
+
+    Pratique pour nouveau_jeu(..., cases_sures=autour(...)): le premier coup
+    du joueur tombe alors sur une case sans bombe autour."""
+    return [(autre_rangee, autre_colonne)
+            for autre_rangee in range(max(0, rangee - 1), min(nombre_de_rangees, rangee + 2))
+            for autre_colonne in range(max(0, colonne - 1), min(nombre_de_colonnes, colonne + 2))]
+
 def case(terrain_de_jeu, rangee, colonne):
     return terrain_de_jeu[rangee][colonne]
 
@@ -96,9 +267,10 @@ def cases_voisines(terrain_de_jeu, rangee, colonne):
 
     Chaque case dans la liste est représentée par un tuple: (rangée, colonne).
 
-    Une case a au moins 3 voisins (pour les cases du coins), parfois 5 voisins
-    (celles qui sont sur le bord mais pas dans un coin), ou alors 8 voisins
-    (toutes celles qui ne sont pas sur le bord).
+    Sur un terrain carré, une case a au moins 3 voisins (pour les cases du
+    coins), parfois 5 voisins (celles qui sont sur le bord mais pas dans un
+    coin), ou alors 8 voisins (toutes celles qui ne sont pas sur le bord).
+    Sur les autres formes, c'est topologies.voisines qui décide.
 
              0   1   2   3   4
            +---+---+---+---+---+
@@ -112,12 +284,11 @@ def cases_voisines(terrain_de_jeu, rangee, colonne):
            +---+---+---+---+---+ (4,0),(4,1),(4,2)]
          4 | a | a | a |   |   |
            +---+---+---+---+---+"""
-    return [(autre_rangee, autre_colonne)
-            for autre_colonne in range(colonne - 1, colonne + 2)
-            for autre_rangee in range(rangee - 1, rangee + 2)
-            if (autre_colonne >= 0) and (autre_rangee >= 0) and
-               (autre_colonne < colonnes(terrain_de_jeu)) and (autre_rangee < rangees(terrain_de_jeu)) and
-               ((autre_colonne != colonne) or (autre_rangee != rangee))]
+    nombre_de_colonnes = colonnes(terrain_de_jeu)
+    # p.ex. divmod(17, 5) = (3, 2) parce que 17 = 3 * 5 + 2
+    return [divmod(numero, nombre_de_colonnes)
+            for numero in topologies.voisines(topologie_du_terrain(terrain_de_jeu),
+                                              rangee * nombre_de_colonnes + colonne)]
 
 def drapeaux(terrain_de_jeu):
     """Compte le nombre de drapeaux déjà placés
@@ -140,37 +311,71 @@ def bombes_voisines(terrain_de_jeu, rangee, colonne):
     # 0 in [0, 1] est vrai parce que 0 est dans la liste; 3 in [0, 4] est faux
     # par contre: 3 n'est pas un élément de la liste (en d'autres mots, 3
     # n'est ni 0, ni 4).
-    return sum(1 if case(terrain_de_jeu, autre_rangee, autre_colonne) in [BOMBE, BOMBE_DRAPEAU]
-               else 0
-               for (autre_rangee, autre_colonne) in cases_voisines(terrain_de_jeu, rangee, colonne))
+    nombre_de_colonnes = colonnes(terrain_de_jeu)
+    return sum(1 if terrain_de_jeu[numero // nombre_de_colonnes][numero % nombre_de_colonnes]
+               in [BOMBE, BOMBE_DRAPEAU] else 0
+               for numero in topologies.voisines(topologie_du_terrain(terrain_de_jeu),
+                                                 rangee * nombre_de_colonnes + colonne))
 
-def montre_le_terrain(terrain_de_jeu):
-    """Affiche le terrain"""
-    # 1. D'abord imprimer les coordonnées pour repérer les colonnes
+def symbole(valeur):
+    """Les 4 caractères qui représentent une case à l'écran
+
+    Une case déminée contient déjà le nombre de bombes voisines (cf. demine),
+    il n'y a donc pas besoin de les recompter."""
+    if valeur in [BOMBE, INCONNU]:
+        return " ?? "
+    elif valeur in [DRAPEAU, BOMBE_DRAPEAU]:
+        return " DD "
+    elif valeur >= 0:
+        return f"  {valeur} "
+    else:
+        return "PROBLEME, on ne devrait pas se retrouver ici"
+
+def dessine_le_terrain(terrain_de_jeu):
+    """Le terrain sous forme de texte, prêt à être imprimé (cf. montre_le_terrain)"""
+    # Plutôt que d'imprimer chaque case séparément, nous préparons une liste
+    # de morceaux de texte et les collons ensemble à la fin: p.ex.
+    # ''.join(['a', 'bc', 'd']) = 'abcd'.
+    morceaux = []
+    topo = topologie_du_terrain(terrain_de_jeu)
+    # 1. D'abord les coordonnées pour repérer les colonnes
     for colonne in range(0, colonnes(terrain_de_jeu)):
-        print(f' {colonne:2} ', end='') # end='' veut dire de ne pas aller à la ligne après
-    print('') # aller à la ligne une fois que tous les numéros de colonne ont été imprimés
+        morceaux.append(f' {colonne:2} ')
+    morceaux.append('\n') # aller à la ligne une fois que tous les numéros de colonne sont écrits
     # 2. Puis, pour chaque rangée, ...
     for rangee in range(0, rangees(terrain_de_jeu)):
-        # ... imprimer toutes les colonnes ...
+        if topo['nom'] == 'cube' and rangee % topo['forme'][1] == 0:
+            # un titre au début de chaque niveau du cube (les rangées gardent
+            # leur numéro dans tout le terrain, c'est celui que demande jouer)
+            morceaux.append(f"niveau {rangee // topo['forme'][1]}\n")
+        if topo['nom'] == 'hexagonal' and rangee % 2 == 1:
+            # les rangées impaires sont décalées d'une demi-case
+            morceaux.append('  ')
+        # ... toutes les colonnes ...
         for colonne in range(0, colonnes(terrain_de_jeu)):
-            if case(terrain_de_jeu, rangee, colonne) in [BOMBE, INCONNU]:
-                print(" ?? ", end='')
-            elif case(terrain_de_jeu, rangee, colonne) in [DRAPEAU, BOMBE_DRAPEAU]:
-                print(" DD ", end='')
-            elif case(terrain_de_jeu, rangee, colonne) >= 0:
-                print("  {} ".format(bombes_voisines(terrain_de_jeu, rangee, colonne)), end='')
-            else:
-                print("PROBLEME, on ne devrait pas se retrouver ici")
+            morceaux.append(symbole(case(terrain_de_jeu, rangee, colonne)))
+        if topo['nom'] == 'hexagonal' and rangee % 2 == 0:
+            # pour que les numéros de rangée restent alignés
+            morceaux.append('  ')
         # ... puis le numéro de la rangée pour aider le joueur à se
-        # repérer et aller à la ligne (pas de end='')
-        print(f"| rangee={rangee:2}")
+        # repérer et aller à la ligne
+        morceaux.append(f"| rangee={rangee:2}\n")
+    return ''.join(morceaux)
 
-def demine(terrain_de_jeu, rangee, colonne):
+def montre_le_terrain(terrain_de_jeu):
+    """Affiche le terrain"""
+    # Un seul print pour tout le terrain: c'est beaucoup plus rapide qu'un
+    # print par case quand le terrain est grand.
+    print(dessine_le_terrain(terrain_de_jeu), end='')
+
+def demine(terrain_de_jeu, rangee, colonne, changements=None):
     """Marcher dans une case
 
     La fonction retourne vrai (True) si le jeu peut continuer, et faux (False)
-    si le jeu doit s'arrêter parce que une bombe a explosé."""
+    si le jeu doit s'arrêter parce que une bombe a explosé.
+
+    Si `changements' est une liste, on y ajoute les (rangée, colonne) de
+    toutes les cases déminées (cf. affichage.py qui ne redessine qu'elles)."""
     if case(terrain_de_jeu, rangee, colonne) in [DRAPEAU, BOMBE_DRAPEAU]:
         # Protéger le joueur: si il a planté un drapeau, c'est qu'il croit
         # qu'il y a une bombe et donc ne pas le laisser marcher sur cette
@@ -182,36 +387,57 @@ def demine(terrain_de_jeu, rangee, colonne):
         print("BOUM BOUM BOUM")
         return False
     elif case(terrain_de_jeu, rangee, colonne) == INCONNU:
-        bombes_tout_pres = bombes_voisines(terrain_de_jeu, rangee, colonne)
-        # Marque la case comme étant déminée
-        terrain_de_jeu[rangee][colonne] = bombes_tout_pres
-        # Pour aider le joueur, si une case n'a pas de bombes autour, ...
-        if bombes_tout_pres == 0:
-            # ... nous déminons automatiquement toutes les cases voisines ...
-            for (autre_rangee, autre_colonne) in cases_voisines(
-                    terrain_de_jeu, rangee, colonne):
-                # ... qui n'ont pas encore été déminées, puisqu'il n'y a aucun
-                # danger.
-                #
-                # Note que ne déminer que les cases qui sont encore inconnues
-                # empêchent une boucle infinie parce que nous avons déjà
-                # marqué la première case comme déminée.
-                if case(terrain_de_jeu, autre_rangee, autre_colonne) == INCONNU:
-                    demine(terrain_de_jeu, autre_rangee, autre_colonne)
+        # La liste des cases qu'il reste à déminer.  Nous commençons avec la
+        # case choisie par le joueur, mais d'autres pourront s'y ajouter.
+        # (On pourrait aussi appeler demine pour chaque voisine, mais sur un
+        # grand terrain, Python refuse d'imbriquer plus de 1000 appels.)
+        a_deminer = [(rangee, colonne)]
+        while a_deminer:
+            # p.ex. l = [1, 2, 3]; l.pop() = 3 et l devient [1, 2]
+            (rangee, colonne) = a_deminer.pop()
+            if case(terrain_de_jeu, rangee, colonne) != INCONNU:
+                # déjà déminée entre-temps (elle était voisine de deux cases
+                # sans bombes autour)
+                continue
+            bombes_tout_pres = bombes_voisines(terrain_de_jeu, rangee, colonne)
+            # Marque la case comme étant déminée
+            terrain_de_jeu[rangee][colonne] = bombes_tout_pres
+            if changements is not None:
+                changements.append((rangee, colonne))
+            # Pour aider le joueur, si une case n'a pas de bombes autour, ...
+            if bombes_tout_pres == 0:
+                # ... nous déminons automatiquement toutes les cases voisines ...
+                for (autre_rangee, autre_colonne) in cases_voisines(
+                        terrain_de_jeu, rangee, colonne):
+                    # ... qui n'ont pas encore été déminées, puisqu'il n'y a aucun
+                    # danger.
+                    #
+                    # Note que ne déminer que les cases qui sont encore inconnues
+                    # empêchent une boucle infinie parce que nous avons déjà
+                    # marqué la première case comme déminée.
+                    if case(terrain_de_jeu, autre_rangee, autre_colonne) == INCONNU:
+                        a_deminer.append((autre_rangee, autre_colonne))
         return True
     else:
         # Le joueur avait déjà marché sur cette case, il n'y a rien à changer,
         # mais aucun danger non plus:
         return True
 
-def plante_drapeau(terrain_de_jeu, rangee, colonne):
-    "Met un drapeau sur une case donnée pour indiquer que le joueur soupçonne une bombe"
+def plante_drapeau(terrain_de_jeu, rangee, colonne, changements=None):
+    """Met un drapeau sur une case donnée pour indiquer que le joueur soupçonne une bombe
+
+    Si `changements' est une liste, on y ajoute (rangée, colonne) quand le
+    drapeau est planté (cf. demine)."""
     if case(terrain_de_jeu, rangee, colonne) in [DRAPEAU, BOMBE_DRAPEAU]:
         print("Il y a deja un drapeau")
     elif case(terrain_de_jeu, rangee, colonne) == BOMBE:
         terrain_de_jeu[rangee][colonne] = BOMBE_DRAPEAU
+        if changements is not None:
+            changements.append((rangee, colonne))
     elif case(terrain_de_jeu, rangee, colonne) == INCONNU:
         terrain_de_jeu[rangee][colonne] = DRAPEAU
+        if changements is not None:
+            changements.append((rangee, colonne))
     else:
         print("Endroit deja déminé")
 
@@ -268,10 +494,12 @@ def jouer(terrain_de_jeu):
         print("Il y a {} bombes et {} drapeaux".format(
             bombes_armees(terrain_de_jeu) + bombes_marquees(terrain_de_jeu),
             drapeaux(terrain_de_jeu)))
+        fin_du_tour()
         # 2. Demande au joueur ce qu'il veut faire
         planter_drapeau = oui_ou_non("Drapeau (O/N)? ")
         rangee = demande_nombre("Rangee? ", 0, rangees(terrain_de_jeu))
         colonne = demande_nombre("Colonne? ", 0, colonnes(terrain_de_jeu))
+        debut_du_tour()
         # 3. Fais ce qu'il t'a demandé
         if planter_drapeau:
             plante_drapeau(terrain_de_jeu, rangee, colonne)
@@ -283,6 +511,7 @@ def jouer(terrain_de_jeu):
         fini = not any(case(terrain_de_jeu, rangee, colonne) in [INCONNU, BOMBE]
                        for rangee in range(0, rangees(terrain_de_jeu))
                        for colonne in range(0, colonnes(terrain_de_jeu)))
+    fin_du_tour()
     if fini and not perdu:
         print("Bravo!")
 
@@ -290,3 +519,19 @@ def partie():
     "Crée une nouvelle partie et laisse le joueur jouer"
     terrain_de_jeu = nouveau_jeu()
     jouer(terrain_de_jeu)
+
+def debut_du_tour():
+    "Le joueur a choisi son coup: le tour commence (pour le chronomètre, ne fait rien sinon)"
+
+def fin_du_tour():
+    "Le tour est fini et montré au joueur (cf. debut_du_tour)"
+
+# Pour savoir où passe le temps pendant une partie: ces fonctions (et les
+# tours, entre debut_du_tour et fin_du_tour) sont chronométrées si la
+# variable d'environnement CHRONOMETRE est définie (cf. chronometre.py, à la
+# racine du dépôt).  Sinon, rien ne change.
+A_CHRONOMETRER = ['cases_voisines', 'bombes_voisines', 'demine', 'plante_drapeau', 'montre_le_terrain']
+if os.environ.get('CHRONOMETRE'):
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import chronometre
+    chronometre.active(sys.modules[__name__])
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+import argparse
+import time
+
+import numpy as np
+
+from demineur import INCONNU, BOMBE, BOMBE_DRAPEAU, DRAPEAU
+from simulation import nouvelles_statistiques, resume
+
+# Les mêmes règles que demineur.py, mais pour jouer des milliers de parties
+# en même temps (cf. simulation.py qui les joue une par une).
+#
+# Au lieu de listes de rangées, nous utilisons numpy:
+#
+# - K terrains de la même taille sont un seul tableau (K, rangées, colonnes)
+#   d'int8 (un octet par case), avec les mêmes valeurs que dans demineur.py
+#   (INCONNU, BOMBE, ..., ou le nombre de bombes voisines);
+# - le nombre de bombes voisines de chaque case est calculé une fois pour
+#   toutes au début (cf. voisines_numpy), puisque les bombes ne bougent pas;
+# - à chaque "tour", chaque terrain reçoit un coup (cf. joue_numpy), et tous
+#   les coups sont joués en même temps;
+# - demine découvre les cases voisines des cases sans bombe autour, puis leurs
+#   voisines, etc.  Ici, toutes les cases découvertes d'un terrain grandissent
+#   d'une case dans toutes les directions à chaque étape (une "dilatation"),
+#   mais seulement à partir des cases sans bombe autour, et seulement vers les
+#   cases INCONNU.  Après autant d'étapes que la zone découverte est large, le
+#   résultat est exactement celui de demine.
+#
+# Exemple (un million de parties de débutant, au hasard):
+#
+#    python demineur_numpy.py --parties 1000000 --rangees 9 --colonnes 9 --bombes 10
+
+def jeux_numpy(cases, nombre_de_bombes):
+    "Des jeux pour ce module: un dictionnaire avec les terrains et ce qui ne change pas"
+    return {'cases': cases,
+            'voisines': voisines_numpy((cases == BOMBE) | (cases == BOMBE_DRAPEAU)),
+            'bombes': nombre_de_bombes,
+            # une partie perdue ou gagnée ne change plus (cf. joue_numpy)
+            'perdu': np.zeros(len(cases), dtype=bool),
+            'fini': termines_numpy(cases)}
+
+def depuis_terrains(terrains):
+    "Transforme des terrains de demineur.py (tous de la même taille) en jeux pour ce module"
+    cases = np.array(terrains, dtype=np.int8)
+    nombre_de_bombes = ((cases == BOMBE) | (cases == BOMBE_DRAPEAU)).sum(axis=(1, 2))
+    return jeux_numpy(cases, nombre_de_bombes)
+
+def vers_terrains(jeux):
+    "Les terrains de demineur.py (listes de rangées) qui correspondent aux jeux"
+    return jeux['cases'].tolist()
+
+def nouveaux_jeux_numpy(combien, nombre_de_rangees=5, nombre_de_colonnes=5, nombre_de_bombes=5,
+                        graine=None):
+    """Crée `combien' nouveaux jeux (cf. nouveau_jeu) avec les bombes placées au hasard
+
+    Ce ne sont pas les mêmes terrains que nouveau_jeu avec la même graine."""
+    hasard = np.random.default_rng(graine)
+    cases = np.full((combien, nombre_de_rangees * nombre_de_colonnes), INCONNU, dtype=np.int8)
+    # un nombre au hasard par case: les `nombre_de_bombes' cases avec les
+    # plus petits nombres reçoivent une bombe (comme si on mélangeait les
+    # cases et prenait les premières)
+    choisies = np.argsort(hasard.random(cases.shape), axis=1)[:, :nombre_de_bombes]
+    cases[np.arange(combien)[:, np.newaxis], choisies] = BOMBE
+    return jeux_numpy(cases.reshape(combien, nombre_de_rangees, nombre_de_colonnes),
+                      np.full(combien, nombre_de_bombes))
+
+def voisines_numpy(bombes):
+    """Le nombre de bombes autour de chaque case (cf. bombes_voisines)
+
+    `bombes' est un tableau (K, rangées, colonnes) de booléens.  On additionne
+    d'abord chaque case avec celles du dessus et du dessous, puis le résultat
+    avec les cases de gauche et de droite: cela fait les 9 cases du carré
+    3x3, dont on enlève la case du milieu."""
+    bombes = bombes.astype(np.int8)
+    colonnes_de_3 = bombes.copy()
+    colonnes_de_3[:, 1:, :] += bombes[:, :-1, :]
+    colonnes_de_3[:, :-1, :] += bombes[:, 1:, :]
+    carres = colonnes_de_3.copy()
+    carres[:, :, 1:] += colonnes_de_3[:, :, :-1]
+    carres[:, :, :-1] += colonnes_de_3[:, :, 1:]
+    return carres - bombes
+
+def dilate(masque):
+    "Les cases de `masque' et toutes leurs voisines (même idée que voisines_numpy)"
+    colonnes_de_3 = masque.copy()
+    colonnes_de_3[:, 1:, :] |= masque[:, :-1, :]
+    colonnes_de_3[:, :-1, :] |= masque[:, 1:, :]
+    carres = colonnes_de_3.copy()
+    carres[:, :, 1:] |= colonnes_de_3[:, :, :-1]
+    carres[:, :, :-1] |= colonnes_de_3[:, :, 1:]
+    return carres
+
+def termines_numpy(cases):
+    "Pour chaque terrain, vrai s'il ne reste aucune case INCONNU ou BOMBE (cf. `fini' dans jouer)"
+    return ~((cases == INCONNU) | (cases == BOMBE)).any(axis=(1, 2))
+
+def joue_numpy(jeux, drapeaux, rangees, colonnes):
+    """Joue un coup dans chaque terrain (cf. demine et plante_drapeau)
+
+    `drapeaux', `rangees' et `colonnes' ont un élément par terrain: vrai pour
+    planter un drapeau, faux pour déminer la case (rangée, colonne).  Les
+    terrains des parties déjà perdues ou gagnées ne changent pas.
+
+    Le résultat est, pour chaque terrain, ce que demine ou plante_drapeau
+    aurait répondu: faux seulement si une bombe vient d'exploser."""
+    cases = jeux['cases']
+    drapeaux = np.asarray(drapeaux, dtype=bool)
+    rangees = np.asarray(rangees)
+    colonnes = np.asarray(colonnes)
+    actifs = ~(jeux['perdu'] | jeux['fini'])
+    tous = np.arange(len(cases))
+    valeurs = cases[tous, rangees, colonnes]
+    # 1. les drapeaux (sur les cases INCONNU ou BOMBE seulement)
+    plante = actifs & drapeaux
+    cases[tous, rangees, colonnes] = np.where(plante & (valeurs == BOMBE), BOMBE_DRAPEAU,
+                                              np.where(plante & (valeurs == INCONNU), DRAPEAU, valeurs))
+    # 2. les bombes qui explosent
+    boum = actifs & ~drapeaux & (valeurs == BOMBE)
+    jeux['perdu'] |= boum
+    # 3. les cases déminées, et la zone découverte autour d'elles.  Seuls les
+    # terrains où il y a quelque chose à découvrir sont traités.
+    lots = np.flatnonzero(actifs & ~drapeaux & (valeurs == INCONNU))
+    if len(lots) > 0:
+        inconnues = cases[lots] == INCONNU
+        sans_bombe_autour = jeux['voisines'][lots] == 0
+        decouvertes = np.zeros(inconnues.shape, dtype=bool)
+        decouvertes[np.arange(len(lots)), rangees[lots], colonnes[lots]] = True
+        # les cases découvertes à l'étape précédente: seules celles-là
+        # peuvent encore en découvrir d'autres
+        nouvelles = decouvertes
+        while True:
+            nouvelles = dilate(nouvelles & sans_bombe_autour) & inconnues & ~decouvertes
+            if not nouvelles.any():
+                break
+            decouvertes |= nouvelles
+        zone = cases[lots]
+        zone[decouvertes] = jeux['voisines'][lots][decouvertes]
+        cases[lots] = zone
+    jeux['fini'] |= ~jeux['perdu'] & termines_numpy(cases)
+    return ~boum
+
+def strategie_au_hasard_numpy(jeux, hasard):
+    """Le coup de strategie_au_hasard pour chaque terrain (drapeaux, rangées, colonnes)
+
+    Le même choix (une case inconnue au hasard, ou un drapeau quand il reste
+    autant de cases inconnues que de bombes), mais pas les mêmes nombres au
+    hasard que simulation.py."""
+    (combien, nombre_de_rangees, nombre_de_colonnes) = jeux['cases'].shape
+    cases = jeux['cases'].reshape(combien, -1)
+    inconnues = (cases == INCONNU) | (cases == BOMBE)
+    plantes = ((cases == DRAPEAU) | (cases == BOMBE_DRAPEAU)).sum(axis=1)
+    # cf. fin_evidente: un drapeau sur la première case inconnue
+    evidente = inconnues.sum(axis=1) == jeux['bombes'] - plantes
+    premiere = np.argmax(inconnues, axis=1)
+    # la case inconnue avec le plus grand nombre au hasard
+    au_hasard = np.argmax(np.where(inconnues, hasard.random(cases.shape), -1.0), axis=1)
+    (rangees, colonnes) = np.divmod(np.where(evidente, premiere, au_hasard), nombre_de_colonnes)
+    return (evidente, rangees, colonnes)
+
+def simule_numpy(parties, terrain=(5, 5, 5), lot=10000, graine=0, coups_maximum=10000):
+    """Joue beaucoup de parties au hasard, `lot' parties à la fois (cf. simule)
+
+    Le résultat a la même forme que celui de simule.  Les durées sont celles
+    d'un lot entier divisées par le nombre de parties du lot: 'duree_maximum'
+    est donc la durée moyenne d'une partie du lot le plus lent."""
+    hasard = np.random.default_rng(graine)
+    statistiques = nouvelles_statistiques()
+    for debut_du_lot in range(0, parties, lot):
+        combien = min(lot, parties - debut_du_lot)
+        debut = time.perf_counter()
+        jeux = nouveaux_jeux_numpy(combien, *terrain, graine=hasard)
+        coups = np.zeros(combien, dtype=np.int64)
+        en_cours = ~jeux['fini']
+        while en_cours.any() and coups.max() < coups_maximum:
+            (drapeaux, rangees, colonnes) = strategie_au_hasard_numpy(jeux, hasard)
+            joue_numpy(jeux, drapeaux, rangees, colonnes)
+            coups += en_cours
+            en_cours = ~(jeux['perdu'] | jeux['fini'])
+        duree = time.perf_counter() - debut
+        statistiques['parties'] += combien
+        statistiques['victoires'] += int(jeux['fini'].sum())
+        statistiques['coups'] += int(coups.sum())
+        if statistiques['coups_minimum'] is None or coups.min() < statistiques['coups_minimum']:
+            statistiques['coups_minimum'] = int(coups.min())
+        if statistiques['coups_maximum'] is None or coups.max() > statistiques['coups_maximum']:
+            statistiques['coups_maximum'] = int(coups.max())
+        statistiques['duree'] += duree
+        statistiques['duree_maximum'] = max(statistiques['duree_maximum'], duree / combien)
+    return statistiques
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description='Joue beaucoup de parties de démineur au hasard, par lots')
+    arguments.add_argument('--parties', type=int, default=100000)
+    arguments.add_argument('--lot', type=int, default=10000, help='nombre de parties jouées en même temps')
+    arguments.add_argument('--graine', type=int, default=0)
+    arguments.add_argument('--rangees', type=int, default=5)
+    arguments.add_argument('--colonnes', type=int, default=5)
+    arguments.add_argument('--bombes', type=int, default=5)
+    options = arguments.parse_args()
+    print(resume(simule_numpy(options.parties, (options.rangees, options.colonnes, options.bombes),
+                              options.lot, options.graine)))
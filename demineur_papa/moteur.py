@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+from demineur import *
+
+# Le "moteur" du jeu: les règles de demineur.py, sans input() ni print().
+#
+# Une partie est un dictionnaire qui contient le terrain et des compteurs mis
+# à jour à chaque coup.  joue_coup() fait un coup et renvoie immédiatement la
+# liste des cases qui ont changé, telles que le joueur doit les voir: c'est
+# tout ce qu'il faut envoyer à un joueur qui joue à distance (cf. serveur.py).
+
+EN_COURS = 'en cours'
+PERDU = 'perdu'
+GAGNE = 'gagné'
+
+def nouvelle_partie(nombre_de_rangees, nombre_de_colonnes, nombre_de_bombes, graine=None):
+    "Crée une partie (cf. nouveau_jeu)"
+    return {'terrain': nouveau_jeu(nombre_de_rangees, nombre_de_colonnes, nombre_de_bombes, graine),
+            'bombes': nombre_de_bombes,
+            'drapeaux': 0,
+            # le jeu est fini quand il n'y a plus de case INCONNU ou BOMBE
+            # (cf. jouer)
+            'restantes': nombre_de_rangees * nombre_de_colonnes,
+            'coups': 0,
+            'etat': EN_COURS}
+
+def visible(valeur):
+    "Ce que le joueur peut voir d'une case: les bombes restent cachées"
+    if valeur == BOMBE:
+        return INCONNU
+    elif valeur == BOMBE_DRAPEAU:
+        return DRAPEAU
+    else:
+        return valeur
+
+def joue_coup(partie, planter_drapeau, rangee, colonne):
+    """Démine une case ou y plante un drapeau
+
+    Le résultat est la liste des (rangée, colonne, valeur visible) des cases
+    qui ont changé.  Si le coup fait exploser une bombe, partie['etat']
+    devient PERDU; si c'était le dernier coup, il devient GAGNE."""
+    terrain_de_jeu = partie['terrain']
+    if partie['etat'] != EN_COURS:
+        return []
+    if not (0 <= rangee < rangees(terrain_de_jeu) and 0 <= colonne < colonnes(terrain_de_jeu)):
+        raise ValueError(f"La case ({rangee}, {colonne}) n'est pas sur le terrain")
+    partie['coups'] += 1
+    valeur = case(terrain_de_jeu, rangee, colonne)
+    changements = []
+    # Nous n'appelons demine et plante_drapeau que quand ils n'ont rien à
+    # imprimer: un drapeau sur une case déjà déminée, ou marcher sur un
+    # drapeau, ne fait simplement rien.
+    if planter_drapeau:
+        if valeur in [INCONNU, BOMBE]:
+            plante_drapeau(terrain_de_jeu, rangee, colonne, changements)
+            partie['drapeaux'] += 1
+    elif valeur == BOMBE:
+        partie['etat'] = PERDU
+        return [(rangee, colonne, BOMBE)]
+    elif valeur == INCONNU:
+        demine(terrain_de_jeu, rangee, colonne, changements)
+    partie['restantes'] -= len(changements)
+    if partie['restantes'] == 0:
+        partie['etat'] = GAGNE
+    return [(autre_rangee, autre_colonne,
+             visible(case(terrain_de_jeu, autre_rangee, autre_colonne)))
+            for (autre_rangee, autre_colonne) in changements]
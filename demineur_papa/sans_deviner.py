@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+import argparse
+import random
+import time
+
+from demineur import *
+from topologies import carre
+
+# Des terrains où l'on n'a jamais besoin de deviner: à partir du premier coup,
+# chaque case peut être déminée (ou marquée d'un drapeau) par raisonnement,
+# sans jamais devoir choisir au hasard entre deux cases.
+#
+# Nous préparons un terrain au hasard, puis un "résolveur" joue la partie en
+# ne faisant que des déductions sûres.  Quand il est bloqué, plutôt que de
+# tout recommencer, nous "réparons" le terrain: une des bombes qui bloquent
+# (une bombe inconnue juste à côté des cases déjà déminées) est déplacée loin
+# de là, dans une case que le résolveur n'a pas encore approchée.  Cela ne
+# change aucune des cases déjà déminées sauf ses voisines, dont le nombre de
+# bombes diminue, et le résolveur peut continuer là où il s'était arrêté.
+#
+# Exemple (mesure combien de terrains "expert" on prépare par seconde):
+#
+#    python sans_deviner.py --terrains 1000
+#
+# L'objectif est d'en préparer au moins OBJECTIF par seconde sur un seul coeur:
+# 100000 terrains expert prennent alors moins de 35 minutes.
+
+OBJECTIF = 50 # terrains 16x30 avec 99 bombes par seconde
+
+# ce que le résolveur sait de chaque case
+INCONNUE = 0
+DEMINEE = 1
+MINE = 2
+
+def nouveau_resolveur(topo, bombes, premiere_case):
+    """L'état du résolveur au début de la partie
+
+    `bombes' est l'ensemble des numéros des cases avec une bombe (cf.
+    place_bombes) et `premiere_case' le numéro de la case du premier coup.
+    Le résolveur a besoin des tableaux de `topo' (cf. topologies.topologie)."""
+    if topo['voisins'] is None:
+        raise ValueError("Le résolveur a besoin d'une topologie avec table (avec_table=True)")
+    debuts = topo['debuts']
+    voisins = topo['voisins']
+    nombre = [0] * topo['cases']
+    for bombe in bombes:
+        for position in range(debuts[bombe], debuts[bombe + 1]):
+            nombre[voisins[position]] += 1
+    resolveur = {'topo': topo,
+                 'bombes': bombes,
+                 'nombre': nombre, # le nombre de bombes voisines de chaque case
+                 'etat': bytearray(topo['cases']), # INCONNUE partout
+                 'inconnues': topo['cases'],
+                 'mines_connues': 0,
+                 # les cases déminées qui ont encore des voisines inconnues:
+                 # ce sont elles qui permettent de faire des déductions
+                 'actives': set()}
+    revele(resolveur, premiere_case)
+    return resolveur
+
+def revele(resolveur, numero):
+    "Démine une case sûre, et ses voisines si elle n'a pas de bombes autour (cf. demine)"
+    topo = resolveur['topo']
+    etat = resolveur['etat']
+    a_reveler = [numero]
+    while a_reveler:
+        numero = a_reveler.pop()
+        if etat[numero] != INCONNUE:
+            continue
+        etat[numero] = DEMINEE
+        resolveur['inconnues'] -= 1
+        if resolveur['nombre'][numero] == 0:
+            for voisine in range(topo['debuts'][numero], topo['debuts'][numero + 1]):
+                if etat[topo['voisins'][voisine]] == INCONNUE:
+                    a_reveler.append(topo['voisins'][voisine])
+        else:
+            resolveur['actives'].add(numero)
+
+def marque_mine(resolveur, numero):
+    "Le résolveur a compris que cette case contient une bombe"
+    if resolveur['etat'][numero] == INCONNUE:
+        resolveur['etat'][numero] = MINE
+        resolveur['inconnues'] -= 1
+        resolveur['mines_connues'] += 1
+
+def contrainte(resolveur, numero):
+    """(voisines inconnues, nombre de bombes parmi elles) pour une case déminée"""
+    topo = resolveur['topo']
+    etat = resolveur['etat']
+    inconnues = []
+    reste = resolveur['nombre'][numero]
+    for position in range(topo['debuts'][numero], topo['debuts'][numero + 1]):
+        voisine = topo['voisins'][position]
+        if etat[voisine] == INCONNUE:
+            inconnues.append(voisine)
+        elif etat[voisine] == MINE:
+            reste -= 1
+    return (inconnues, reste)
+
+def deductions_simples(resolveur):
+    """Une case déminée dont toutes les bombes voisines sont connues: les autres voisines sont sûres.
+    Une case déminée avec autant de voisines inconnues que de bombes restantes: ce sont des bombes.
+
+    Vrai si au moins une déduction a été faite."""
+    progres = False
+    for numero in list(resolveur['actives']):
+        (inconnues, reste) = contrainte(resolveur, numero)
+        if not inconnues:
+            resolveur['actives'].discard(numero)
+        elif reste == 0:
+            for voisine in inconnues:
+                revele(resolveur, voisine)
+            progres = True
+        elif reste == len(inconnues):
+            for voisine in inconnues:
+                marque_mine(resolveur, voisine)
+            progres = True
+    return progres
+
+def deductions_par_paires(resolveur):
+    """Compare deux cases déminées voisines A et B
+
+    Si les voisines inconnues de A sont toutes aussi voisines de B, les
+    autres voisines inconnues de B contiennent (bombes de B - bombes de A)
+    bombes: soit aucune, soit toutes.  Vrai si une déduction a été faite."""
+    contraintes = {}
+    par_case = {}
+    for numero in resolveur['actives']:
+        (inconnues, reste) = contrainte(resolveur, numero)
+        if inconnues:
+            contraintes[numero] = (frozenset(inconnues), reste)
+            for voisine in inconnues:
+                par_case.setdefault(voisine, []).append(numero)
+    for (a, (inconnues_a, reste_a)) in contraintes.items():
+        # les contraintes qui partagent au moins une case avec A
+        autres = set(b for voisine in inconnues_a for b in par_case[voisine])
+        for b in autres:
+            (inconnues_b, reste_b) = contraintes[b]
+            # `<' entre deux ensembles: "est inclus dans, sans être égal à"
+            if inconnues_a < inconnues_b:
+                difference = inconnues_b - inconnues_a
+                if reste_b == reste_a:
+                    for voisine in difference:
+                        revele(resolveur, voisine)
+                    return True
+                if reste_b - reste_a == len(difference):
+                    for voisine in difference:
+                        marque_mine(resolveur, voisine)
+                    return True
+    return False
+
+def deductions_globales(resolveur):
+    """Utilise le nombre total de bombes (que le joueur connaît)
+
+    Vrai si une déduction a été faite."""
+    bombes_restantes = len(resolveur['bombes']) - resolveur['mines_connues']
+    if bombes_restantes not in [0, resolveur['inconnues']] or resolveur['inconnues'] == 0:
+        return False
+    for numero in range(resolveur['topo']['cases']):
+        if resolveur['etat'][numero] == INCONNUE:
+            if bombes_restantes == 0:
+                revele(resolveur, numero)
+            else:
+                marque_mine(resolveur, numero)
+    return True
+
+def resout(resolveur):
+    """Fait toutes les déductions possibles
+
+    Vrai si toutes les cases sans bombe ont été déminées, faux si le
+    résolveur est bloqué (il faudrait deviner)."""
+    while resolveur['inconnues'] > len(resolveur['bombes']) - resolveur['mines_connues']:
+        if not (deductions_simples(resolveur)
+                or deductions_par_paires(resolveur)
+                or deductions_globales(resolveur)):
+            return False
+    return True
+
+def repare(resolveur, hasard):
+    """Déplace une bombe qui bloque le résolveur vers une case encore loin de tout
+
+    Faux si ce n'est pas possible (pas de bombe qui bloque ou pas de place
+    libre loin des cases déminées)."""
+    topo = resolveur['topo']
+    etat = resolveur['etat']
+    bombes = resolveur['bombes']
+    frontiere = set()
+    for numero in resolveur['actives']:
+        frontiere.update(contrainte(resolveur, numero)[0])
+    sources = sorted(numero for numero in frontiere if numero in bombes)
+    destinations = [numero for numero in range(topo['cases'])
+                    if etat[numero] == INCONNUE and numero not in frontiere and numero not in bombes]
+    if not sources or not destinations:
+        return False
+    source = hasard.choice(sources)
+    destination = hasard.choice(destinations)
+    bombes.remove(source)
+    bombes.add(destination)
+    debuts = topo['debuts']
+    voisins = topo['voisins']
+    for position in range(debuts[destination], debuts[destination + 1]):
+        # aucune de ces voisines n'est déminée (la destination est loin de tout)
+        resolveur['nombre'][voisins[position]] += 1
+    for position in range(debuts[source], debuts[source + 1]):
+        voisine = voisins[position]
+        resolveur['nombre'][voisine] -= 1
+        if etat[voisine] == DEMINEE:
+            if resolveur['nombre'][voisine] == 0:
+                # cette case déminée n'a plus de bombes autour: comme demine,
+                # nous déminons ses voisines
+                etat[voisine] = INCONNUE
+                resolveur['inconnues'] += 1
+                revele(resolveur, voisine)
+            else:
+                resolveur['actives'].add(voisine)
+    return True
+
+def terrain_sans_deviner(nombre_de_rangees, nombre_de_colonnes, nombre_de_bombes,
+                         premiere_case, graine=None, reparations_maximum=None, essais_maximum=100):
+    """Un terrain (cf. nouveau_jeu) qu'on peut résoudre sans deviner à partir de `premiere_case'
+
+    `premiere_case' est (rangée, colonne): elle et ses voisines n'ont pas de
+    bombe.  Si le terrain ne peut pas être réparé, on en essaie un autre,
+    mais au plus `essais_maximum' fois (ValueError ensuite)."""
+    hasard = random.Random(graine)
+    topo = carre(nombre_de_rangees, nombre_de_colonnes, avec_table=True)
+    (rangee, colonne) = premiere_case
+    sures = autour(nombre_de_rangees, nombre_de_colonnes, rangee, colonne)
+    if reparations_maximum is None:
+        reparations_maximum = 4 * nombre_de_bombes
+    for _ in range(essais_maximum):
+        bombes = place_bombes(nombre_de_rangees, nombre_de_colonnes, nombre_de_bombes,
+                              hasard.getrandbits(64), sures)
+        resolveur = nouveau_resolveur(topo, bombes, rangee * nombre_de_colonnes + colonne)
+        for _ in range(reparations_maximum):
+            if resout(resolveur):
+                terrain_de_jeu = [[INCONNU] * nombre_de_colonnes for _ in range(nombre_de_rangees)]
+                for bombe in bombes:
+                    (bombe_rangee, bombe_colonne) = divmod(bombe, nombre_de_colonnes)
+                    terrain_de_jeu[bombe_rangee][bombe_colonne] = BOMBE
+                return terrain_de_jeu
+            if not repare(resolveur, hasard):
+                break
+    raise ValueError("Impossible de préparer un terrain sans deviner avec ces paramètres")
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description='Mesure la vitesse de terrain_sans_deviner')
+    arguments.add_argument('--terrains', type=int, default=1000)
+    arguments.add_argument('--rangees', type=int, default=16)
+    arguments.add_argument('--colonnes', type=int, default=30)
+    arguments.add_argument('--bombes', type=int, default=99)
+    arguments.add_argument('--graine', default='0')
+    options = arguments.parse_args()
+    debut = time.perf_counter()
+    for numero in range(options.terrains):
+        terrain_sans_deviner(options.rangees, options.colonnes, options.bombes,
+                             (options.rangees // 2, options.colonnes // 2),
+                             graine=f'{options.graine}:{numero}')
+    duree = time.perf_counter() - debut
+    print(f'{options.terrains} terrains {options.rangees}x{options.colonnes} avec {options.bombes} bombes '
+          f'en {duree:.2f} s ({options.terrains / duree:.1f} par seconde, objectif {OBJECTIF} '
+          f'par seconde pour 16x30 avec 99 bombes)')
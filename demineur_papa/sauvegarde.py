@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+import mmap
+import struct
+
+from demineur import *
+from moteur import EN_COURS, GAGNE, PERDU
+
+# Sauvegarder une partie dans un fichier pour la continuer plus tard.
+#
+# Le fichier commence par un en-tête (ENTETE, toujours TAILLE_ENTETE octets)
+# qui donne les dimensions du terrain, l'état de la partie (en cours, gagnée
+# ou perdue) et quelques compteurs.  Puis vient la graine, de longueur
+# variable: un nombre entier ou un texte (p.ex. '3:17' dans simulation.py),
+# écrit en texte.  Et enfin viennent les cases.  Chaque case a une valeur entre -4 (DRAPEAU) et 8 (8
+# bombes autour): en ajoutant 4, on obtient un nombre entre 0 et 12, qui tient
+# dans 4 bits (un demi-octet).  On range donc 2 cases par octet: la case
+# numéro 2 * n dans les 4 bits "du bas" de l'octet n et la case 2 * n + 1 dans
+# les 4 bits "du haut".  La case (rangée, colonne) a le numéro
+# rangée * colonnes + colonne.
+#
+# Pour un très grand terrain, ouvre() ne lit pas le fichier: il est "projeté
+# en mémoire" (mmap).  Le système d'exploitation lit seulement les morceaux du
+# fichier dont on a besoin et, quand une case change, il ne réécrit que le
+# morceau du fichier qui la contient.  Le terrain renvoyé par ouvre()
+# s'utilise comme un terrain normal: case(terrain, 3, 4), demine(terrain, 3,
+# 4), montre_le_terrain(terrain), etc.
+#
+# Exemple:
+#
+#    nouvelle_partie('partie.demi', 1000, 1000, 150000, graine=3)
+#    terrain = ouvre('partie.demi')
+#    demine(terrain, 10, 10)
+#    ferme(terrain)
+
+MAGIQUE = b'DEMI' # pour reconnaître nos fichiers
+VERSION = 2
+# < = petit-boutiste (little endian), 4s = 4 octets, B = entier de 1 octet,
+# H = entier de 2 octets, I = entier de 4 octets, Q = entier de 8 octets,
+# x = octet inutilisé
+ENTETE = struct.Struct('<4sHBBIIIxxxxQQQQ')
+TAILLE_ENTETE = 64
+# l'état de la partie est gardé par sa place dans cette liste
+ETATS = [EN_COURS, GAGNE, PERDU]
+# les sortes de graine: random.Random(3) et random.Random('3') ne donnent pas
+# les mêmes nombres, il faut donc se souvenir de la sorte
+SANS_GRAINE = 0
+GRAINE_ENTIERE = 1
+GRAINE_TEXTE = 2
+
+def code(valeur):
+    "Valeur d'une case -> nombre entre 0 et 15"
+    return valeur - DRAPEAU
+
+def valeur(code):
+    "Nombre entre 0 et 15 -> valeur d'une case"
+    return code + DRAPEAU
+
+def compteurs(terrain_de_jeu):
+    """Compte les bombes, les drapeaux et les cases INCONNU ou BOMBE (cf. jouer)
+
+    Ces compteurs sont gardés dans l'en-tête: en continuant une partie, il
+    n'y a pas besoin de parcourir tout le terrain pour les retrouver."""
+    bombes = drapeaux = restantes = 0
+    for rangee in terrain_de_jeu:
+        for v in rangee:
+            if v in [BOMBE, BOMBE_DRAPEAU]:
+                bombes += 1
+            if v in [DRAPEAU, BOMBE_DRAPEAU]:
+                drapeaux += 1
+            if v in [INCONNU, BOMBE]:
+                restantes += 1
+    return {'bombes': bombes, 'drapeaux': drapeaux, 'restantes': restantes}
+
+def graine_en_octets(graine):
+    "(sorte, octets) pour écrire une graine dans le fichier (cf. graine_depuis_octets)"
+    if graine is None:
+        return (SANS_GRAINE, b'')
+    if isinstance(graine, int):
+        return (GRAINE_ENTIERE, str(graine).encode('ascii'))
+    if isinstance(graine, str):
+        return (GRAINE_TEXTE, graine.encode('utf-8'))
+    raise ValueError(f"Une graine doit être un nombre entier ou un texte, pas {graine!r}")
+
+def graine_depuis_octets(sorte, octets):
+    "La graine écrite par graine_en_octets"
+    if sorte == SANS_GRAINE:
+        return None
+    if sorte == GRAINE_ENTIERE:
+        return int(octets)
+    return octets.decode('utf-8')
+
+def debut_du_fichier(entete):
+    """L'en-tête (complété jusqu'à TAILLE_ENTETE octets) suivi de la graine
+
+    `entete' est un dictionnaire comme celui de lit_entete."""
+    (sorte, octets) = graine_en_octets(entete['graine'])
+    return ENTETE.pack(MAGIQUE, VERSION, ETATS.index(entete['etat']), sorte,
+                       entete['rangees'], entete['colonnes'], len(octets),
+                       entete['coups'], entete['bombes'], entete['drapeaux'],
+                       entete['restantes']).ljust(TAILLE_ENTETE, b'\0') + octets
+
+def sauve(fichier, terrain_de_jeu, graine=None, coups=0, etat=EN_COURS):
+    """Écrit tout le terrain dans un fichier
+
+    `graine' (un nombre entier, un texte ou None) est celle donnée à
+    nouveau_jeu, `coups' le nombre de coups déjà joués et `etat' celui de la
+    partie (EN_COURS, GAGNE ou PERDU)."""
+    entete = dict(compteurs(terrain_de_jeu),
+                  rangees=rangees(terrain_de_jeu), colonnes=colonnes(terrain_de_jeu),
+                  graine=graine, coups=coups, etat=etat)
+    # toutes les cases, l'une après l'autre, rangée par rangée
+    codes = [code(v) for rangee in terrain_de_jeu for v in rangee]
+    if len(codes) % 2 == 1:
+        codes.append(0) # pour avoir un nombre pair de cases
+    # p.ex. [1, 2, 3, 4][0::2] = [1, 3] et [1, 2, 3, 4][1::2] = [2, 4];
+    # `<< 4' décale de 4 bits vers le haut: 2 << 4 = 32 = 2 * 16
+    octets = bytes(bas | (haut << 4) for (bas, haut) in zip(codes[0::2], codes[1::2]))
+    with open(fichier, 'wb') as f:
+        f.write(debut_du_fichier(entete))
+        f.write(octets)
+
+# Pour chaque octet d'une carte des bombes (8 cases, cf. carte_des_bombes),
+# les 4 octets du fichier (2 cases par octet): BOMBE ou INCONNU.
+DEPUIS_LA_CARTE = [bytes(code(BOMBE if octet >> bit & 1 else INCONNU)
+                         | code(BOMBE if octet >> (bit + 1) & 1 else INCONNU) << 4
+                         for bit in range(0, 8, 2))
+                   for octet in range(256)]
+# le nombre d'octets de la carte traduits à la fois
+MORCEAU = 1 << 20
+
+def nouvelle_partie(fichier, nombre_de_rangees, nombre_de_colonnes, nombre_de_bombes,
+                    graine=None, cases_sures=()):
+    """Écrit directement dans un fichier le terrain que donnerait nouveau_jeu(...)
+
+    Le terrain n'est jamais gardé en liste de listes (8 octets par case):
+    seulement en carte (1 bit par case, cf. carte_des_bombes), traduite
+    morceau par morceau.  Un terrain de 10000x10000 prend ainsi 12,5 Mo de
+    mémoire et 50 Mo sur le disque.  On le joue ensuite avec ouvre()."""
+    carte = carte_des_bombes(nombre_de_rangees, nombre_de_colonnes, nombre_de_bombes,
+                             graine, cases_sures)
+    cases = nombre_de_rangees * nombre_de_colonnes
+    en_tete = debut_du_fichier({'rangees': nombre_de_rangees, 'colonnes': nombre_de_colonnes,
+                                'graine': graine, 'etat': EN_COURS, 'coups': 0,
+                                'bombes': nombre_de_bombes, 'drapeaux': 0, 'restantes': cases})
+    with open(fichier, 'wb') as f:
+        f.write(en_tete)
+        for debut in range(0, len(carte), MORCEAU):
+            f.write(b''.join(map(DEPUIS_LA_CARTE.__getitem__, carte[debut:debut + MORCEAU])))
+        # la dernière carte traduite peut dépasser la dernière case: comme
+        # sauve(), on garde (cases + 1) // 2 octets, complétés par un code 0
+        f.truncate(len(en_tete) + (cases + 1) // 2)
+        if cases % 2 == 1:
+            f.seek(len(en_tete) + cases // 2)
+            f.write(bytes([code(BOMBE if bombe_sur_la_carte(carte, cases - 1) else INCONNU)]))
+
+def lit_entete(donnees):
+    """Dictionnaire avec le contenu de l'en-tête et la graine
+
+    'debut' est la place de la première case dans le fichier."""
+    (magique, version, etat, sorte_de_graine, nombre_de_rangees, nombre_de_colonnes,
+     longueur_graine, coups, bombes, nombre_de_drapeaux, restantes) = ENTETE.unpack_from(donnees)
+    if magique != MAGIQUE:
+        raise ValueError("Ce n'est pas une partie de démineur sauvegardée")
+    if version != VERSION:
+        raise ValueError(f"Partie sauvegardée en version {version}, je ne sais lire que la version {VERSION}")
+    debut = TAILLE_ENTETE + longueur_graine
+    return {'rangees': nombre_de_rangees,
+            'colonnes': nombre_de_colonnes,
+            'graine': graine_depuis_octets(sorte_de_graine, bytes(donnees[TAILLE_ENTETE:debut])),
+            'etat': ETATS[etat],
+            'coups': coups,
+            'bombes': bombes,
+            'drapeaux': nombre_de_drapeaux,
+            'restantes': restantes,
+            'debut': debut}
+
+def charge(fichier):
+    """Relit tout un terrain (en liste de listes, comme nouveau_jeu) et son en-tête
+
+    Pour un très grand terrain, ouvre est plus rapide."""
+    with open(fichier, 'rb') as f:
+        donnees = f.read()
+    entete = lit_entete(donnees)
+    cases = donnees[entete['debut']:]
+    terrain_de_jeu = []
+    for rangee in range(entete['rangees']):
+        debut = rangee * entete['colonnes']
+        # `& 15' garde les 4 bits du bas, `>> 4' décale de 4 bits vers le bas
+        terrain_de_jeu.append([valeur((cases[numero // 2] >> (4 * (numero % 2))) & 15)
+                               for numero in range(debut, debut + entete['colonnes'])])
+    return terrain_de_jeu, entete
+
+class RangeeSurDisque:
+    "Une rangée d'un TerrainSurDisque: rangee[colonne] lit ou change une case"
+    def __init__(self, terrain, debut):
+        self.terrain = terrain
+        self.debut = debut # le numéro de la première case de la rangée
+
+    def __len__(self):
+        return self.terrain.entete['colonnes']
+
+    def __getitem__(self, colonne):
+        if not 0 <= colonne < len(self):
+            raise IndexError(colonne)
+        numero = self.debut + colonne
+        octet = self.terrain.memoire[self.terrain.debut + numero // 2]
+        return valeur((octet >> (4 * (numero % 2))) & 15)
+
+    def __setitem__(self, colonne, v):
+        if not 0 <= colonne < len(self):
+            raise IndexError(colonne)
+        if self.terrain.entete['etat'] != EN_COURS:
+            raise ValueError(f"La partie est finie ({self.terrain.entete['etat']}): "
+                             "on ne peut plus y jouer")
+        numero = self.debut + colonne
+        position = self.terrain.debut + numero // 2
+        decalage = 4 * (numero % 2)
+        octet = self.terrain.memoire[position]
+        # efface les 4 bits de la case (~(15 << 4) = ...00001111) puis met le
+        # nouveau code à la place
+        self.terrain.memoire[position] = (octet & ~(15 << decalage) & 255) | (code(v) << decalage)
+
+    def __iter__(self):
+        return (self[colonne] for colonne in range(len(self)))
+
+class TerrainSurDisque:
+    """Un terrain dont les cases restent dans le fichier (cf. ouvre)
+
+    terrain[rangee][colonne] fonctionne comme pour une liste de listes, donc
+    toutes les fonctions de demineur.py l'acceptent."""
+    def __init__(self, fichier):
+        self.fichier = open(fichier, 'r+b')
+        self.memoire = mmap.mmap(self.fichier.fileno(), 0)
+        self.entete = lit_entete(self.memoire)
+        self.debut = self.entete['debut'] # la place de la première case
+
+    def __len__(self):
+        return self.entete['rangees']
+
+    def __getitem__(self, rangee):
+        if not 0 <= rangee < len(self):
+            raise IndexError(rangee)
+        return RangeeSurDisque(self, rangee * self.entete['colonnes'])
+
+    def __iter__(self):
+        return (self[rangee] for rangee in range(len(self)))
+
+def ouvre(fichier):
+    """Ouvre une partie sauvegardée sans la lire en entier
+
+    Chaque case changée est écrite directement dans le fichier, il n'y a pas
+    besoin de sauver à nouveau toute la partie.  L'en-tête (terrain.entete)
+    est mis à jour avec ecrit_entete."""
+    return TerrainSurDisque(fichier)
+
+def ecrit_entete(terrain):
+    """Écrit l'état et les compteurs de terrain.entete (p.ex. après un coup) dans le fichier
+
+    La graine ne change jamais: seuls les TAILLE_ENTETE premiers octets sont
+    réécrits."""
+    terrain.memoire[:TAILLE_ENTETE] = debut_du_fichier(terrain.entete)[:TAILLE_ENTETE]
+
+def ferme(terrain):
+    "Termine l'utilisation d'un terrain ouvert avec ouvre (les changements sont écrits sur le disque)"
+    terrain.memoire.flush()
+    terrain.memoire.close()
+    terrain.fichier.close()
+
+if __name__ == "__main__":
+    # python sauvegarde.py partie.demi: continue (ou commence) une longue partie
+    import os
+    import sys
+    import affichage
+    fichier = sys.argv[1]
+    if not os.path.exists(fichier):
+        nouvelle_partie(fichier, 1000, 1000, 150000, graine=0)
+    terrain = ouvre(fichier)
+    if terrain.entete['etat'] != EN_COURS:
+        ferme(terrain)
+        sys.exit(f"Cette partie est finie ({terrain.entete['etat']}), on ne peut plus y jouer")
+    try:
+        gagne = affichage.jouer_dans_le_terminal(terrain, compteurs=terrain.entete)
+        terrain.entete['etat'] = GAGNE if gagne else PERDU
+    finally:
+        # même si le joueur arrête avec Ctrl-C, les compteurs sont sauvés
+        ecrit_entete(terrain)
+        ferme(terrain)
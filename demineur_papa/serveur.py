@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import argparse
+import asyncio
+
+from moteur import *
+
+# Un serveur qui permet à beaucoup de joueurs de jouer en même temps, chacun
+# sa partie, sur le même ordinateur.
+#
+# Avec asyncio, un seul programme s'occupe de tous les joueurs: pendant qu'il
+# attend qu'un joueur tape son coup, il s'occupe des autres.  Chaque coup est
+# très rapide (cf. moteur.py), donc personne n'attend longtemps.
+#
+# Les joueurs se connectent (p.ex. avec `telnet localhost 8765' ou avec
+# client_de_charge.py) et envoient des lignes de texte:
+#
+#    NOUVEAU 9 9 10    commence une partie de 9 rangées, 9 colonnes et 10 bombes
+#    DEMINE 3 4        démine la case à la rangée 3, colonne 4
+#    DRAPEAU 3 4       plante un drapeau à la rangée 3, colonne 4
+#
+# Le serveur répond par une ligne:
+#
+#    PARTIE 9 9 10                 la partie est prête
+#    CASES 3,4,0 3,5,1 ...         les cases qui ont changé: rangée,colonne,valeur
+#                                  (valeur comme dans demineur.py)
+#    CASES 3,4,-2 PERDU            une bombe a explosé
+#    CASES 8,8,2 GAGNE             la partie est gagnée
+#    ERREUR explication            la commande n'a pas été comprise
+
+PORT = 8765
+# pour qu'un joueur ne bloque pas le serveur avec un terrain gigantesque
+CASES_MAXIMUM = 100 * 100
+
+def reponse(ligne, partie):
+    """La réponse du serveur à une ligne envoyée par un joueur
+
+    Le résultat est (texte de la réponse, partie) car NOUVEAU remplace la
+    partie du joueur."""
+    mots = ligne.split()
+    if not mots:
+        return ('ERREUR ligne vide', partie)
+    commande = mots[0].upper()
+    try:
+        nombres = [int(mot) for mot in mots[1:]]
+    except ValueError:
+        return ('ERREUR il faut des nombres entiers', partie)
+    if commande == 'NOUVEAU' and len(nombres) == 3:
+        (nombre_de_rangees, nombre_de_colonnes, nombre_de_bombes) = nombres
+        if not (0 < nombre_de_rangees * nombre_de_colonnes <= CASES_MAXIMUM
+                and nombre_de_rangees > 0 and 0 <= nombre_de_bombes < nombre_de_rangees * nombre_de_colonnes):
+            return ('ERREUR terrain impossible', partie)
+        partie = nouvelle_partie(nombre_de_rangees, nombre_de_colonnes, nombre_de_bombes)
+        return (f'PARTIE {nombre_de_rangees} {nombre_de_colonnes} {nombre_de_bombes}', partie)
+    if commande in ['DEMINE', 'DRAPEAU'] and len(nombres) == 2:
+        if partie is None:
+            return ('ERREUR pas de partie en cours (NOUVEAU d\'abord)', partie)
+        try:
+            changements = joue_coup(partie, commande == 'DRAPEAU', *nombres)
+        except ValueError as erreur:
+            return (f'ERREUR {erreur}', partie)
+        morceaux = ['CASES']
+        morceaux.extend(f'{rangee},{colonne},{valeur}' for (rangee, colonne, valeur) in changements)
+        if partie['etat'] == PERDU:
+            morceaux.append('PERDU')
+        elif partie['etat'] == GAGNE:
+            morceaux.append('GAGNE')
+        return (' '.join(morceaux), partie)
+    return (f'ERREUR commande inconnue: {ligne.strip()}', partie)
+
+async def joueur(lecteur, ecrivain):
+    "S'occupe d'un joueur connecté, jusqu'à ce qu'il se déconnecte"
+    partie = None
+    try:
+        # `await' laisse le serveur s'occuper des autres joueurs en attendant
+        # la prochaine ligne de celui-ci
+        while ligne := await lecteur.readline():
+            (texte, partie) = reponse(ligne.decode('utf-8', 'replace'), partie)
+            ecrivain.write(texte.encode('utf-8') + b'\n')
+            await ecrivain.drain()
+    except ConnectionError:
+        pass # le joueur est parti sans dire au revoir
+    finally:
+        ecrivain.close()
+
+async def serveur(adresse='127.0.0.1', port=PORT):
+    "Attend les joueurs (ne s'arrête jamais)"
+    serveur = await asyncio.start_server(joueur, adresse, port, limit=2 ** 16)
+    async with serveur:
+        await serveur.serve_forever()
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description='Serveur de parties de démineur')
+    arguments.add_argument('--adresse', default='127.0.0.1')
+    arguments.add_argument('--port', type=int, default=PORT)
+    options = arguments.parse_args()
+    asyncio.run(serveur(options.adresse, options.port))
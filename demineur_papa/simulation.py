@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+import argparse
+import contextlib
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from demineur import *
+
+# Ce module joue des parties de démineur "sans écran": au lieu de demander au
+# joueur ce qu'il veut faire (avec input) et de lui montrer le terrain (avec
+# print), c'est une stratégie (une fonction) qui choisit chaque coup.  Cela
+# permet de jouer des milliers de parties pour savoir, par exemple, combien de
+# parties on gagne en moyenne avec un certain nombre de bombes.
+#
+# Les parties sont réparties sur plusieurs processus (un par coeur du
+# processeur) et chaque partie reçoit sa propre graine (cf. graine_de_partie)
+# pour que le même numéro de partie donne toujours le même terrain et les mêmes
+# coups, même si les processus ne finissent pas dans le même ordre.
+#
+# Exemple (depuis une ligne de commande):
+#
+#    python simulation.py --parties 100000 --strategie logique
+
+def vue(terrain_de_jeu, rangee, colonne):
+    """Ce que le joueur peut voir d'une case
+
+    Une stratégie ne doit pas tricher: elle ne voit pas la différence entre
+    INCONNU et BOMBE ni entre DRAPEAU et BOMBE_DRAPEAU."""
+    valeur = case(terrain_de_jeu, rangee, colonne)
+    if valeur == BOMBE:
+        return INCONNU
+    elif valeur == BOMBE_DRAPEAU:
+        return DRAPEAU
+    else:
+        return valeur
+
+def cases_inconnues(terrain_de_jeu):
+    "Liste des cases (rangée, colonne) qui ne sont ni déminées ni marquées d'un drapeau"
+    return [(rangee, colonne)
+            for rangee in range(rangees(terrain_de_jeu))
+            for colonne in range(colonnes(terrain_de_jeu))
+            if vue(terrain_de_jeu, rangee, colonne) == INCONNU]
+
+def fin_evidente(terrain_de_jeu, inconnues):
+    """Propose un drapeau quand il reste autant de cases inconnues que de bombes
+
+    Le joueur connaît le nombre total de bombes (jouer l'affiche), donc ce
+    n'est pas tricher.  Sans cela, une stratégie qui ne plante jamais de
+    drapeau ne pourrait jamais gagner (cf. `fini' dans jouer)."""
+    bombes = bombes_armees(terrain_de_jeu) + bombes_marquees(terrain_de_jeu)
+    if len(inconnues) == bombes - drapeaux(terrain_de_jeu):
+        (rangee, colonne) = inconnues[0]
+        return (True, rangee, colonne)
+    return None
+
+def strategie_au_hasard(terrain_de_jeu, hasard):
+    "Démine une case inconnue choisie au hasard"
+    inconnues = cases_inconnues(terrain_de_jeu)
+    coup = fin_evidente(terrain_de_jeu, inconnues)
+    if coup is not None:
+        return coup
+    (rangee, colonne) = hasard.choice(inconnues)
+    return (False, rangee, colonne)
+
+def strategie_logique(terrain_de_jeu, hasard):
+    """Joue comme un joueur prudent, au hasard seulement quand il n'y a pas le choix
+
+    Pour chaque case déjà déminée, si le nombre de bombes voisines est égal
+    au nombre de drapeaux voisins, toutes les autres voisines sont sûres.  Si
+    le nombre de bombes voisines est égal au nombre de drapeaux et de cases
+    inconnues voisines, toutes les voisines inconnues sont des bombes."""
+    inconnues = cases_inconnues(terrain_de_jeu)
+    coup = fin_evidente(terrain_de_jeu, inconnues)
+    if coup is not None:
+        return coup
+    for rangee in range(rangees(terrain_de_jeu)):
+        for colonne in range(colonnes(terrain_de_jeu)):
+            nombre = vue(terrain_de_jeu, rangee, colonne)
+            if nombre <= 0:
+                # inconnue, drapeau ou case sans bombe autour: rien à déduire
+                continue
+            voisines_inconnues = []
+            voisins_drapeaux = 0
+            for (autre_rangee, autre_colonne) in cases_voisines(terrain_de_jeu, rangee, colonne):
+                valeur = vue(terrain_de_jeu, autre_rangee, autre_colonne)
+                if valeur == INCONNU:
+                    voisines_inconnues.append((autre_rangee, autre_colonne))
+                elif valeur == DRAPEAU:
+                    voisins_drapeaux += 1
+            if not voisines_inconnues:
+                continue
+            if nombre == voisins_drapeaux:
+                return (False, *voisines_inconnues[0])
+            if nombre == voisins_drapeaux + len(voisines_inconnues):
+                return (True, *voisines_inconnues[0])
+    (rangee, colonne) = hasard.choice(inconnues)
+    return (False, rangee, colonne)
+
+# Les stratégies sont désignées par leur nom pour pouvoir les envoyer
+# facilement aux autres processus.
+STRATEGIES = {'hasard': strategie_au_hasard,
+              'logique': strategie_logique}
+
+def partie_sans_ecran(terrain_de_jeu, strategie, hasard, coups_maximum=10000):
+    """Joue une partie en laissant la stratégie choisir les coups (cf. jouer)
+
+    Le résultat est un dictionnaire avec les clés 'gagne' (vrai ou faux) et
+    'coups' (le nombre de coups joués)."""
+    fini = False
+    perdu = False
+    coups = 0
+    while not (fini or perdu) and coups < coups_maximum:
+        (planter_drapeau, rangee, colonne) = strategie(terrain_de_jeu, hasard)
+        debut_du_tour()
+        coups += 1
+        if planter_drapeau:
+            plante_drapeau(terrain_de_jeu, rangee, colonne)
+        else:
+            perdu = not demine(terrain_de_jeu, rangee, colonne)
+        fini = not any(case(terrain_de_jeu, rangee, colonne) in [INCONNU, BOMBE]
+                       for rangee in range(0, rangees(terrain_de_jeu))
+                       for colonne in range(0, colonnes(terrain_de_jeu)))
+        fin_du_tour()
+    return {'gagne': fini and not perdu, 'coups': coups}
+
+def graine_de_partie(graine, numero):
+    """Graine d'une partie donnée
+
+    La graine ne dépend que de la graine de la simulation et du numéro de la
+    partie, pas du processus qui la joue: les résultats sont reproductibles."""
+    return f'{graine}:{numero}'
+
+def joue_une_partie(travail):
+    "Crée un terrain et joue une partie (cette fonction tourne dans un des processus)"
+    (graine, numero, nom_strategie, terrain) = travail
+    graine = graine_de_partie(graine, numero)
+    terrain_de_jeu = nouveau_jeu(*terrain, graine=graine)
+    hasard = random.Random(graine + ':strategie')
+    debut = time.perf_counter()
+    # demine et plante_drapeau impriment des messages pour le joueur: il n'y
+    # a personne pour les lire, donc on les jette.
+    with open(os.devnull, 'w') as poubelle, contextlib.redirect_stdout(poubelle):
+        resultat = partie_sans_ecran(terrain_de_jeu, STRATEGIES[nom_strategie], hasard)
+    resultat['duree'] = time.perf_counter() - debut
+    mesures_du_chronometre(resultat)
+    return resultat
+
+def mesures_du_chronometre(resultat):
+    """Joint au résultat les mesures du chronomètre de ce processus (s'il est actif)
+
+    Les parties sont jouées dans d'autres processus: sans cela, leurs mesures
+    seraient perdues (cf. chronometre.envoie et ajoute_mesures)."""
+    chronometre = sys.modules.get('chronometre')
+    if chronometre is not None:
+        resultat['chronometre'] = chronometre.envoie()
+
+def ajoute_mesures(resultat):
+    "Ajoute au chronomètre de ce processus les mesures jointes au résultat"
+    mesures = resultat.pop('chronometre', None)
+    if mesures is not None:
+        sys.modules['chronometre'].recoit(mesures)
+
+def commence_les_mesures():
+    "Au début de chaque processus: oublie les mesures copiées du processus principal"
+    chronometre = sys.modules.get('chronometre')
+    if chronometre is not None:
+        chronometre.remet_a_zero()
+
+def nouvelles_statistiques():
+    "Statistiques vides, à remplir avec ajoute_resultat"
+    return {'parties': 0,
+            'victoires': 0,
+            'coups': 0,
+            'coups_minimum': None,
+            'coups_maximum': None,
+            'duree': 0.0,
+            'duree_maximum': 0.0}
+
+def ajoute_resultat(statistiques, resultat):
+    """Ajoute le résultat d'une partie aux statistiques
+
+    Seuls des totaux sont gardés, pas les parties elles-mêmes: la mémoire
+    utilisée ne dépend pas du nombre de parties."""
+    statistiques['parties'] += 1
+    if resultat['gagne']:
+        statistiques['victoires'] += 1
+    statistiques['coups'] += resultat['coups']
+    if statistiques['coups_minimum'] is None or resultat['coups'] < statistiques['coups_minimum']:
+        statistiques['coups_minimum'] = resultat['coups']
+    if statistiques['coups_maximum'] is None or resultat['coups'] > statistiques['coups_maximum']:
+        statistiques['coups_maximum'] = resultat['coups']
+    statistiques['duree'] += resultat['duree']
+    statistiques['duree_maximum'] = max(statistiques['duree_maximum'], resultat['duree'])
+
+def resume(statistiques):
+    "Texte résumant les statistiques"
+    parties = max(1, statistiques['parties'])
+    return ('{} parties, {:.2%} gagnées, {:.2f} coups par partie (min {}, max {}), '
+            '{:.1f} µs par partie (max {:.1f} µs)').format(
+                statistiques['parties'],
+                statistiques['victoires'] / parties,
+                statistiques['coups'] / parties,
+                statistiques['coups_minimum'],
+                statistiques['coups_maximum'],
+                1e6 * statistiques['duree'] / parties,
+                1e6 * statistiques['duree_maximum'])
+
+def simule(parties, nom_strategie='hasard', graine=0, processus=None, paquet=256,
+           terrain=(5, 5, 5)):
+    """Joue beaucoup de parties en parallèle et renvoie les statistiques
+
+    `terrain' donne le nombre de rangées, de colonnes et de bombes (cf.
+    nouveau_jeu), `processus' le nombre de processus (None = autant que de
+    coeurs) et `paquet' le nombre de parties envoyées d'un coup à chaque
+    processus."""
+    # Un générateur (pas une liste) pour ne pas créer tout le travail à
+    # l'avance:
+    travail = ((graine, numero, nom_strategie, terrain) for numero in range(parties))
+    statistiques = nouvelles_statistiques()
+    with multiprocessing.Pool(processus, initializer=commence_les_mesures) as pool:
+        # imap_unordered donne les résultats dès qu'ils sont prêts, dans
+        # n'importe quel ordre: ce n'est pas grave puisque nous ne faisons
+        # que des totaux.
+        for resultat in pool.imap_unordered(joue_une_partie, travail, chunksize=paquet):
+            ajoute_mesures(resultat)
+            ajoute_resultat(statistiques, resultat)
+    return statistiques
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description='Joue beaucoup de parties de démineur sans écran')
+    arguments.add_argument('--parties', type=int, default=10000)
+    arguments.add_argument('--strategie', choices=sorted(STRATEGIES.keys()), default='hasard')
+    arguments.add_argument('--graine', default='0')
+    arguments.add_argument('--processus', type=int, default=None)
+    arguments.add_argument('--rangees', type=int, default=5)
+    arguments.add_argument('--colonnes', type=int, default=5)
+    arguments.add_argument('--bombes', type=int, default=5)
+    options = arguments.parse_args()
+    print(resume(simule(options.parties, options.strategie, options.graine, options.processus,
+                        terrain=(options.rangees, options.colonnes, options.bombes))))
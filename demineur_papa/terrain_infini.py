@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+import collections
+import os
+import random
+
+from demineur import *
+
+# Un terrain de démineur sans bord: on peut aller aussi loin qu'on veut dans
+# toutes les directions (même vers les rangées et les colonnes négatives).
+#
+# Bien sûr, on ne peut pas préparer un terrain infini à l'avance.  Le terrain
+# est découpé en "morceaux" carrés de TAILLE x TAILLE cases, et un morceau
+# n'est créé que la première fois qu'on regarde une de ses cases.  Les bombes
+# d'un morceau sont choisies au hasard, mais avec une graine qui ne dépend que
+# de la graine du terrain et de la position du morceau: si on jette un morceau
+# auquel le joueur n'a pas touché, on peut le recréer exactement pareil plus
+# tard.  Les morceaux que le joueur a changés sont gardés en mémoire, ou
+# écrits dans un répertoire quand il y en a trop en mémoire.
+#
+# Comme dans sauvegarde.py, une case est gardée sous forme de code: sa valeur
+# + 4, un nombre entre 0 et 12, et un morceau est un bytearray (une liste
+# d'octets qu'on peut changer) de TAILLE * TAILLE codes, rangée par rangée.
+#
+# Exemple:
+#
+#    terrain = nouveau_terrain_infini(graine=7)
+#    demine_infini(terrain, 0, 0)
+#    print(dessine_infini(terrain, -10, -20, 20, 40))
+
+TAILLE = 32
+# demine_infini découvre d'un coup toute la région de cases "0" (sans bombe
+# autour) qui touche la case choisie.  Une case est un 0 quand elle et ses 8
+# voisines n'ont pas de bombe: avec une densité p, cela arrive avec la
+# probabilité (1 - p) ** 9.  Les cases 0 se touchent par les coins aussi
+# (8 voisines), et dès qu'environ 41% des cases sont des 0 (le "seuil de
+# percolation"), il existe des régions de 0 infinies.  Un peu en dessous de
+# ce seuil, les régions sont finies mais déjà gigantesques: avec p = 0.1,
+# 0.9 ** 9 = 39% des cases sont des 0 et un seul clic peut découvrir des
+# centaines de milliers de cases (des centaines de morceaux).  Avec p = 0.15,
+# 0.85 ** 9 = 23%: bien en dessous du seuil, les régions restent petites et
+# un clic ne crée que les quelques morceaux autour de la case choisie.
+DENSITE_MINIMUM = 0.15
+
+def nouveau_terrain_infini(graine, densite=0.2, morceaux_en_memoire=4096, repertoire=None):
+    """Un nouveau terrain sans bord
+
+    `densite' est la proportion de cases avec une bombe, `morceaux_en_memoire'
+    le nombre de morceaux gardés en mémoire au maximum et `repertoire' un
+    répertoire où écrire les morceaux changés quand il y en a trop en mémoire
+    (sans répertoire, ils restent tous en mémoire)."""
+    if densite < DENSITE_MINIMUM:
+        raise ValueError(f"Il faut au moins {DENSITE_MINIMUM:.0%} de bombes")
+    if morceaux_en_memoire < 1:
+        raise ValueError("Il faut garder au moins un morceau en mémoire")
+    return {'graine': graine,
+            'densite': densite,
+            'maximum': morceaux_en_memoire,
+            'repertoire': repertoire,
+            # OrderedDict se souvient de l'ordre dans lequel les morceaux ont
+            # été utilisés: le premier est celui qui a servi il y a le plus
+            # longtemps.
+            'morceaux': collections.OrderedDict(),
+            # sans répertoire, les morceaux changés par le joueur sont gardés
+            # ici, pour toujours
+            'gardes': {},
+            # les positions des morceaux changés par le joueur
+            'modifies': set()}
+
+def cree_morceau(terrain, position):
+    "Les cases d'un morceau tout neuf (toujours les mêmes pour la même position)"
+    hasard = random.Random(f"{terrain['graine']}:{position[0]}:{position[1]}")
+    return bytearray(BOMBE - DRAPEAU if hasard.random() < terrain['densite'] else INCONNU - DRAPEAU
+                     for _ in range(TAILLE * TAILLE))
+
+def fichier_du_morceau(terrain, position):
+    return os.path.join(terrain['repertoire'], f'{position[0]}_{position[1]}.morceau')
+
+def morceau(terrain, position):
+    """Les cases du morceau à la position donnée (rangée // TAILLE, colonne // TAILLE)
+
+    Le morceau est créé (ou relu sur le disque) si nécessaire."""
+    if position in terrain['gardes']:
+        return terrain['gardes'][position]
+    morceaux = terrain['morceaux']
+    if position in morceaux:
+        # le morceau vient de servir, il passe en dernier
+        morceaux.move_to_end(position)
+        return morceaux[position]
+    if position in terrain['modifies']:
+        with open(fichier_du_morceau(terrain, position), 'rb') as f:
+            cases = bytearray(f.read())
+    else:
+        cases = cree_morceau(terrain, position)
+    morceaux[position] = cases
+    range_les_morceaux(terrain)
+    return cases
+
+def range_les_morceaux(terrain):
+    "Retire de la mémoire les morceaux qui n'ont pas servi depuis longtemps"
+    morceaux = terrain['morceaux']
+    while len(morceaux) > terrain['maximum']:
+        # le premier est celui qui a servi il y a le plus longtemps
+        (position, cases) = morceaux.popitem(last=False)
+        if position in terrain['modifies']:
+            with open(fichier_du_morceau(terrain, position), 'wb') as f:
+                f.write(cases)
+        # sinon, rien à faire: cree_morceau le recréera exactement pareil
+
+def case_infinie(terrain, rangee, colonne):
+    "Valeur de la case (cf. case dans demineur.py)"
+    # p.ex. divmod(-1, 32) = (-1, 31): la case -1 est la dernière du morceau -1
+    (rangee_du_morceau, rangee_dans_le_morceau) = divmod(rangee, TAILLE)
+    (colonne_du_morceau, colonne_dans_le_morceau) = divmod(colonne, TAILLE)
+    cases = morceau(terrain, (rangee_du_morceau, colonne_du_morceau))
+    return cases[rangee_dans_le_morceau * TAILLE + colonne_dans_le_morceau] + DRAPEAU
+
+def change_case_infinie(terrain, rangee, colonne, valeur):
+    "Change la valeur d'une case (et se souvient que son morceau a changé)"
+    (rangee_du_morceau, rangee_dans_le_morceau) = divmod(rangee, TAILLE)
+    (colonne_du_morceau, colonne_dans_le_morceau) = divmod(colonne, TAILLE)
+    position = (rangee_du_morceau, colonne_du_morceau)
+    cases = morceau(terrain, position)
+    cases[rangee_dans_le_morceau * TAILLE + colonne_dans_le_morceau] = valeur - DRAPEAU
+    terrain['modifies'].add(position)
+    if terrain['repertoire'] is None and position not in terrain['gardes']:
+        # impossible de l'oublier, il n'y a nulle part où l'écrire
+        terrain['gardes'][position] = terrain['morceaux'].pop(position)
+
+def cases_voisines_infinies(rangee, colonne):
+    "Les 8 cases voisines: sans bord, il y en a toujours 8 (cf. cases_voisines)"
+    return [(rangee + dr, colonne + dc)
+            for dr in (-1, 0, 1)
+            for dc in (-1, 0, 1)
+            if dr != 0 or dc != 0]
+
+def bombes_voisines_infinies(terrain, rangee, colonne):
+    "Compte le nombre de bombes autour d'une case donnée (cf. bombes_voisines)"
+    return sum(1 if case_infinie(terrain, autre_rangee, autre_colonne) in [BOMBE, BOMBE_DRAPEAU]
+               else 0
+               for (autre_rangee, autre_colonne) in cases_voisines_infinies(rangee, colonne))
+
+def demine_infini(terrain, rangee, colonne, changements=None):
+    """Marcher dans une case (cf. demine)
+
+    Vrai (True) si le jeu peut continuer, faux (False) si une bombe a explosé.
+    Les régions sans bombes sont déminées d'un coup, même si elles
+    s'étendent sur plusieurs morceaux."""
+    valeur = case_infinie(terrain, rangee, colonne)
+    if valeur == BOMBE:
+        return False
+    if valeur != INCONNU:
+        # drapeau ou case déjà déminée
+        return True
+    a_deminer = [(rangee, colonne)]
+    while a_deminer:
+        (rangee, colonne) = a_deminer.pop()
+        if case_infinie(terrain, rangee, colonne) != INCONNU:
+            continue
+        bombes_tout_pres = bombes_voisines_infinies(terrain, rangee, colonne)
+        change_case_infinie(terrain, rangee, colonne, bombes_tout_pres)
+        if changements is not None:
+            changements.append((rangee, colonne))
+        if bombes_tout_pres == 0:
+            for (autre_rangee, autre_colonne) in cases_voisines_infinies(rangee, colonne):
+                if case_infinie(terrain, autre_rangee, autre_colonne) == INCONNU:
+                    a_deminer.append((autre_rangee, autre_colonne))
+    return True
+
+def plante_drapeau_infini(terrain, rangee, colonne):
+    "Met un drapeau sur une case (cf. plante_drapeau)"
+    valeur = case_infinie(terrain, rangee, colonne)
+    if valeur == BOMBE:
+        change_case_infinie(terrain, rangee, colonne, BOMBE_DRAPEAU)
+    elif valeur == INCONNU:
+        change_case_infinie(terrain, rangee, colonne, DRAPEAU)
+
+def dessine_infini(terrain, haut, gauche, hauteur, largeur):
+    """Le texte d'une partie du terrain (cf. dessine_le_terrain)
+
+    Seuls les morceaux visibles sont créés."""
+    morceaux = [''.join(f'{colonne:4}' for colonne in range(gauche, gauche + largeur)), '\n']
+    for rangee in range(haut, haut + hauteur):
+        for colonne in range(gauche, gauche + largeur):
+            morceaux.append(symbole(case_infinie(terrain, rangee, colonne)))
+        morceaux.append(f"| rangee={rangee}\n")
+    return ''.join(morceaux)
+
+def jouer_infini(terrain, hauteur=20, largeur=15):
+    """Joue sur un terrain sans bord (commandes comme dans affichage.py)
+
+    La partie ne s'arrête que quand une bombe explose."""
+    haut = -hauteur // 2
+    gauche = -largeur // 2
+    DEPLACEMENTS = {'z': (-hauteur // 2, 0),
+                    's': (hauteur // 2, 0),
+                    'q': (0, -largeur // 2),
+                    'd': (0, largeur // 2)}
+    deminees = 0
+    while True:
+        print(dessine_infini(terrain, haut, gauche, hauteur, largeur), end='')
+        mots = input("Commande (p.ex. '5 7', 'f 5 7' ou z/q/s/d)? ").strip().lower().split()
+        if len(mots) == 1 and mots[0] in DEPLACEMENTS:
+            haut += DEPLACEMENTS[mots[0]][0]
+            gauche += DEPLACEMENTS[mots[0]][1]
+            continue
+        planter_drapeau = len(mots) == 3 and mots[0] == 'f'
+        if planter_drapeau:
+            mots = mots[1:]
+        try:
+            rangee, colonne = [int(mot) for mot in mots]
+        except ValueError:
+            continue
+        if planter_drapeau:
+            plante_drapeau_infini(terrain, rangee, colonne)
+        else:
+            changements = []
+            if not demine_infini(terrain, rangee, colonne, changements):
+                print(f"BOUM BOUM BOUM, après avoir déminé {deminees} cases")
+                return deminees
+            deminees += len(changements)
+
+if __name__ == "__main__":
+    jouer_infini(nouveau_terrain_infini(random.randrange(1000000)))
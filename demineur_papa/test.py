@@ -1,5 +1,14 @@
 # -*- coding: utf-8 -*-
+import collections
+
 from demineur import *
+import topologies
+
+try:
+    import demineur_numpy
+except ImportError:
+    # numpy n'est pas installé: ce moteur-là n'est pas testé
+    demineur_numpy = None
 
 # Ces tests automatiques doivent aider à modifier demineur.py en ayant un peu
 # moins peur de casser quelque chose.  Plus il est facile de tester que tout
@@ -64,12 +73,416 @@ def test_bombes_armees():
 def test_drapeaux():
     verifie(drapeaux(TABLEAU), 3, "erreur dans drapeaux(TABLEAU)")
 
+def test_nouveau_jeu():
+    def compte_bombes(terrain_de_jeu):
+        return sum(1 for rangee in terrain_de_jeu for valeur in rangee if valeur == BOMBE)
+    for graine in range(50):
+        terrain_de_jeu = nouveau_jeu(6, 7, graine % 30, graine=graine,
+                                     cases_sures=autour(6, 7, 0, 0))
+        verifie(compte_bombes(terrain_de_jeu), graine % 30,
+                f"erreur dans le nombre de bombes de nouveau_jeu(..., graine={graine})")
+        verifie([case(terrain_de_jeu, rangee, colonne) for (rangee, colonne) in autour(6, 7, 0, 0)],
+                [INCONNU] * 4,
+                f"erreur dans les cases sûres de nouveau_jeu(..., graine={graine})")
+        verifie(nouveau_jeu(6, 7, graine % 30, graine=graine, cases_sures=autour(6, 7, 0, 0)),
+                terrain_de_jeu,
+                f"erreur: nouveau_jeu(..., graine={graine}) change d'un appel à l'autre")
+    # un terrain presque plein de bombes:
+    verifie(compte_bombes(nouveau_jeu(3, 3, 8, graine=1, cases_sures=[(1, 1)])), 8,
+            "erreur dans nouveau_jeu(3, 3, 8, ...)")
+    # la carte des bombes choisit les mêmes cases que place_bombes, qu'il y
+    # ait peu de bombes ou beaucoup (les cases vides sont alors tirées)
+    for (nombre_de_bombes, graine) in [(0, 0), (12, 1), (37, 2), (54, 3)]:
+        carte = carte_des_bombes(7, 9, nombre_de_bombes, graine, autour(7, 9, 3, 3))
+        verifie(set(numero for numero in range(7 * 9) if bombe_sur_la_carte(carte, numero)),
+                place_bombes(7, 9, nombre_de_bombes, graine, autour(7, 9, 3, 3)),
+                f"erreur dans carte_des_bombes(7, 9, {nombre_de_bombes}, {graine}, ...)")
+
+def test_simulation_reproductible():
+    from simulation import joue_une_partie
+    def sans_duree(resultat):
+        del resultat['duree']
+        return resultat
+    for numero in range(20):
+        verifie(sans_duree(joue_une_partie((7, numero, 'logique', (6, 6, 5)))),
+                sans_duree(joue_une_partie((7, numero, 'logique', (6, 6, 5)))),
+                f"erreur dans joue_une_partie((7, {numero}, 'logique', (6, 6, 5)))")
+
+def test_sauvegarde():
+    import copy
+    import os
+    import tempfile
+    import sauvegarde
+    terrain_de_jeu = nouveau_jeu(7, 9, 10, graine=4)
+    plante_drapeau(terrain_de_jeu, 0, 0)
+    demine(terrain_de_jeu, 3, 3)
+    (descripteur, fichier) = tempfile.mkstemp()
+    os.close(descripteur)
+    try:
+        sauvegarde.sauve(fichier, terrain_de_jeu, graine=4, coups=2)
+        (relu, entete) = sauvegarde.charge(fichier)
+        verifie(relu, terrain_de_jeu, "erreur dans sauvegarde.charge")
+        verifie(entete['graine'], 4, "erreur dans la graine de sauvegarde.charge")
+        # les mêmes coups sur le terrain en mémoire et sur le terrain ouvert
+        # directement dans le fichier doivent donner le même résultat
+        attendu = copy.deepcopy(terrain_de_jeu)
+        sur_disque = sauvegarde.ouvre(fichier)
+        for (rangee, colonne) in [(6, 8), (0, 8), (6, 0)]:
+            verifie(demine(sur_disque, rangee, colonne), demine(attendu, rangee, colonne),
+                    f"erreur dans demine(sauvegarde.ouvre(...), {rangee}, {colonne})")
+        plante_drapeau(sur_disque, 1, 1)
+        plante_drapeau(attendu, 1, 1)
+        sauvegarde.ferme(sur_disque)
+        verifie(sauvegarde.charge(fichier)[0], attendu, "erreur dans sauvegarde.ouvre")
+        # une partie finie est gardée comme telle, et on ne peut plus y jouer
+        sur_disque = sauvegarde.ouvre(fichier)
+        verifie(sur_disque.entete['etat'], sauvegarde.EN_COURS, "erreur dans l'état de sauvegarde.ouvre")
+        sur_disque.entete['etat'] = sauvegarde.PERDU
+        sauvegarde.ecrit_entete(sur_disque)
+        try:
+            demine(sur_disque, *next((rangee, colonne) for rangee in range(7) for colonne in range(9)
+                                     if attendu[rangee][colonne] == INCONNU))
+            verifie('demine a joué', 'ValueError', "erreur: une partie finie n'est pas refusée")
+        except ValueError:
+            pass
+        sauvegarde.ferme(sur_disque)
+        verifie(sauvegarde.charge(fichier), (attendu, dict(entete, etat=sauvegarde.PERDU)),
+                "erreur dans l'état écrit par sauvegarde.ecrit_entete")
+        # les graines en texte (cf. simulation.graine_de_partie) sont gardées
+        # telles quelles, et une graine d'une autre sorte est refusée
+        terrain_de_jeu = nouveau_jeu(4, 5, 3, graine='4:17')
+        sauvegarde.sauve(fichier, terrain_de_jeu, graine='4:17', etat=sauvegarde.GAGNE)
+        (relu, entete) = sauvegarde.charge(fichier)
+        verifie((relu, entete['graine'], entete['etat']), (terrain_de_jeu, '4:17', sauvegarde.GAGNE),
+                "erreur dans sauvegarde.sauve(..., graine='4:17')")
+        try:
+            sauvegarde.sauve(fichier, terrain_de_jeu, graine=4.5)
+            verifie('graine 4.5 acceptée', 'ValueError', "erreur: sauvegarde.sauve(..., graine=4.5)")
+        except ValueError:
+            pass
+        # nouvelle_partie écrit le même fichier que sauve(nouveau_jeu(...)),
+        # aussi avec un nombre impair de cases
+        for (nombre_de_rangees, nombre_de_colonnes, nombre_de_bombes) in [(7, 9, 10), (6, 8, 40)]:
+            sauvegarde.sauve(fichier, nouveau_jeu(nombre_de_rangees, nombre_de_colonnes,
+                                                  nombre_de_bombes, graine=5), graine=5)
+            with open(fichier, 'rb') as f:
+                attendu = f.read()
+            sauvegarde.nouvelle_partie(fichier, nombre_de_rangees, nombre_de_colonnes,
+                                       nombre_de_bombes, graine=5)
+            with open(fichier, 'rb') as f:
+                verifie(f.read(), attendu,
+                        f"erreur dans sauvegarde.nouvelle_partie(..., {nombre_de_rangees}, "
+                        f"{nombre_de_colonnes}, {nombre_de_bombes}, graine=5)")
+    finally:
+        os.remove(fichier)
+
+def test_affichage():
+    import affichage
+    # une fenêtre de 3 rangées et 2 colonnes, déplacée sur le terrain de 5x5
+    # (sans jamais en sortir)
+    ecran = affichage.nouvel_ecran(3, 2)
+    affichage.deplace_vue(ecran, TABLEAU, 1, 10)
+    verifie((ecran['haut'], ecran['gauche']), (1, 3), "erreur dans affichage.deplace_vue")
+    verifie([(rangee, colonne) for rangee in range(5) for colonne in range(5)
+             if affichage.dans_la_vue(ecran, rangee, colonne)],
+            [(1, 3), (1, 4), (2, 3), (2, 4), (3, 3), (3, 4)], "erreur dans affichage.dans_la_vue")
+    verifie(affichage.place_de_la_case(ecran, 2, 4), '\x1b[3;5H', "erreur dans affichage.place_de_la_case")
+    # tout est dessiné la première fois après un déplacement ...
+    verifie(affichage.dessine(ecran, TABLEAU, []),
+            '\x1b[2J\x1b[1;1H  3   4 '
+            '\x1b[2;1H ??  DD | rangee=1\x1b[3;1H ??  ?? | rangee=2\x1b[4;1H ??  ?? | rangee=3',
+            "erreur dans affichage.dessine (tout le terrain)")
+    # ... puis seulement les cases changées qui sont dans la fenêtre
+    verifie(affichage.dessine(ecran, TABLEAU, [(2, 4), (0, 0), (3, 3)]),
+            '\x1b[3;5H ?? \x1b[4;1H ?? ', "erreur dans affichage.dessine (les changements)")
+    verifie(affichage.dessine(ecran, TABLEAU, []), '', "erreur dans affichage.dessine (rien n'a changé)")
+    # les rangées impaires d'un terrain hexagonal sont décalées d'une
+    # demi-case, et chaque niveau d'un cube a un titre
+    terrain_de_jeu = nouveau_jeu_topologique(topologies.hexagonal(3, 3), 0)
+    ecran = affichage.nouvel_ecran(3, 3, terrain_de_jeu.topo)
+    verifie(affichage.place_de_la_case(ecran, 1, 0), '\x1b[3;3H', "erreur dans la place d'une case hexagonale")
+    verifie(affichage.dessine(ecran, terrain_de_jeu, []),
+            '\x1b[2J\x1b[1;1H  0   1   2 \x1b[2;1H ??  ??  ??   | rangee=0'
+            '\x1b[3;3H ??  ??  ?? | rangee=1\x1b[4;1H ??  ??  ??   | rangee=2',
+            "erreur dans affichage.dessine (terrain hexagonal)")
+    terrain_de_jeu = nouveau_jeu_topologique(topologies.cube(3, 2, 2), 0)
+    ecran = affichage.nouvel_ecran(3, 2, terrain_de_jeu.topo)
+    affichage.deplace_vue(ecran, terrain_de_jeu, 1, 0)
+    verifie(affichage.dessine(ecran, terrain_de_jeu, []),
+            '\x1b[2J\x1b[1;1H  0   1 \x1b[2;1Hniveau 0\x1b[3;1H ??  ?? | rangee=1'
+            '\x1b[4;1Hniveau 1\x1b[5;1H ??  ?? | rangee=2\x1b[6;1H ??  ?? | rangee=3',
+            "erreur dans affichage.dessine (cube)")
+    verifie(affichage.ligne_sous_le_terrain(ecran, 0, 'Bravo!'), '\x1b[7;1H\x1b[KBravo!',
+            "erreur: le texte sous un cube recouvre le terrain")
+
+def test_terrain_infini():
+    import tempfile
+    import terrain_infini
+    with tempfile.TemporaryDirectory() as repertoire:
+        # très peu de morceaux en mémoire pour qu'ils passent par le disque
+        terrain = terrain_infini.nouveau_terrain_infini(
+            7, densite=0.15, morceaux_en_memoire=2, repertoire=repertoire)
+        reference = terrain_infini.nouveau_terrain_infini(7, densite=0.15)
+        for (rangee, colonne) in [(0, 0), (100, -300), (-50, 7), (33, 33)]:
+            verifie(terrain_infini.demine_infini(terrain, rangee, colonne),
+                    terrain_infini.demine_infini(reference, rangee, colonne),
+                    f"erreur dans demine_infini(terrain, {rangee}, {colonne})")
+        verifie(terrain_infini.dessine_infini(terrain, -40, -40, 80, 80),
+                terrain_infini.dessine_infini(reference, -40, -40, 80, 80),
+                "erreur dans les morceaux relus depuis le disque")
+    try:
+        terrain_infini.nouveau_terrain_infini(7, densite=0.1)
+    except ValueError:
+        pass
+    else:
+        raise Exception("une densité de 10% devrait être refusée (cf. DENSITE_MINIMUM)")
+
+def test_moteur():
+    import copy
+    import moteur
+    partie = moteur.nouvelle_partie(5, 5, 1, graine=2)
+    attendu = copy.deepcopy(partie['terrain'])
+    demine(attendu, 4, 4)
+    changements = moteur.joue_coup(partie, False, 4, 4)
+    verifie(partie['terrain'], attendu, "erreur dans joue_coup(partie, False, 4, 4)")
+    verifie(sorted(changements),
+            sorted((rangee, colonne, case(attendu, rangee, colonne))
+                   for rangee in range(5) for colonne in range(5)
+                   if case(attendu, rangee, colonne) >= 0),
+            "erreur dans les cases changées par joue_coup(partie, False, 4, 4)")
+    verifie(partie['etat'], moteur.EN_COURS, "erreur dans l'état de la partie")
+    verifie(moteur.joue_coup(partie, True, 1, 2), [(1, 2, DRAPEAU)],
+            "erreur dans joue_coup(partie, True, 1, 2): la bombe doit rester cachée")
+    verifie(moteur.joue_coup(partie, False, 0, 2), [(0, 2, 1)],
+            "erreur dans joue_coup(partie, False, 0, 2)")
+    verifie(partie['etat'], moteur.GAGNE, "erreur: la partie devrait être gagnée")
+
+def test_topologies():
+    import copy
+    import topologies
+    topo = topologies.carre(5, 5)
+    for rangee in range(5):
+        for colonne in range(5):
+            verifie(sorted(divmod(numero, 5) for numero in topologies.voisines(topo, rangee * 5 + colonne)),
+                    sorted(cases_voisines(TABLEAU, rangee, colonne)),
+                    f"erreur dans topologies.voisines(carre(5, 5), {rangee * 5 + colonne})")
+    verifie(len(topologies.voisines(topologies.tore(5, 5), 0)), 8, "erreur dans topologies.tore")
+    verifie(len(topologies.voisines(topologies.hexagonal(5, 5), 12)), 6, "erreur dans topologies.hexagonal")
+    verifie(len(topologies.voisines(topologies.cube(3, 3, 3), 13)), 26, "erreur dans topologies.cube")
+    # une copie d'un terrain topologique a ses propres rangées, mais la même forme
+    terrain_de_jeu = nouveau_jeu_topologique(topologies.tore(4, 4), 3, graine=1)
+    copie = copy.deepcopy(terrain_de_jeu)
+    demine(copie, *next(divmod(numero, 4) for numero in range(16)
+                        if case(copie, *divmod(numero, 4)) == INCONNU))
+    verifie((copie.topo is terrain_de_jeu.topo, copie == terrain_de_jeu), (True, False),
+            "erreur dans copy.deepcopy(TerrainTopologique(...))")
+    # les autres formes se jouent avec demine et plante_drapeau, comme un
+    # terrain normal
+    for topo in [topologies.tore(6, 7), topologies.hexagonal(6, 7), topologies.cube(3, 4, 5),
+                 topologies.carre(6, 7, avec_table=False)]:
+        for graine in range(10):
+            terrain_de_jeu = nouveau_jeu_topologique(topo, 6, graine=graine)
+            nombre_de_colonnes = colonnes(terrain_de_jeu)
+            bombes = set(numero for numero in range(topo['cases'])
+                         if case(terrain_de_jeu, *divmod(numero, nombre_de_colonnes)) == BOMBE)
+            for numero in range(0, topo['cases'], 5):
+                if numero not in bombes:
+                    demine(terrain_de_jeu, *divmod(numero, nombre_de_colonnes))
+            for numero in range(topo['cases']):
+                valeur = case(terrain_de_jeu, *divmod(numero, nombre_de_colonnes))
+                if valeur >= 0:
+                    autour_de_la_case = list(topologies.voisines(topo, numero))
+                    verifie(valeur, len(bombes.intersection(autour_de_la_case)),
+                            f"erreur dans demine sur {topo['nom']}: case {numero} (graine={graine})")
+                    if valeur == 0:
+                        verifie([voisine for voisine in autour_de_la_case
+                                 if case(terrain_de_jeu, *divmod(voisine, nombre_de_colonnes)) < 0], [],
+                                f"erreur dans demine sur {topo['nom']}: voisines de {numero} pas déminées")
+            verifie(len(dessine_le_terrain(terrain_de_jeu).split('\n')),
+                    rangees(terrain_de_jeu) + 2 + (topo['forme'][0] if topo['nom'] == 'cube' else 0),
+                    f"erreur dans dessine_le_terrain sur {topo['nom']}")
+
+def test_sans_deviner():
+    import sans_deviner
+    import topologies
+    for graine in range(10):
+        terrain_de_jeu = sans_deviner.terrain_sans_deviner(9, 9, 10, (4, 4), graine=graine)
+        bombes = set(rangee * 9 + colonne for rangee in range(9) for colonne in range(9)
+                     if case(terrain_de_jeu, rangee, colonne) == BOMBE)
+        verifie(len(bombes), 10, f"erreur dans le nombre de bombes de terrain_sans_deviner (graine={graine})")
+        # un résolveur tout neuf doit pouvoir finir la partie sans deviner
+        resolveur = sans_deviner.nouveau_resolveur(topologies.carre(9, 9), bombes, 4 * 9 + 4)
+        verifie(sans_deviner.resout(resolveur), True,
+                f"erreur: terrain_sans_deviner(..., graine={graine}) oblige à deviner")
+
+# Test "différentiel" (cf. robots_papa/test.py): des parties au hasard sont
+# jouées coup par coup avec demine/plante_drapeau (la référence) et avec
+# chaque autre moteur, et après chaque coup les terrains doivent être
+# exactement les mêmes.  Pour tester un nouveau moteur (plus rapide), il
+# suffit de l'ajouter dans MOTEURS: 'prepare' transforme un terrain de
+# référence en jeu pour ce moteur, 'demine' et 'plante_drapeau' jouent un
+# coup en (rangée, colonne) et 'terrain' redonne une liste de rangées.
+
+# Un moteur de référence qui ne partage rien avec demineur.py ni
+# topologies.py: les voisines sont les 8 directions autour de la case, et la
+# région sans bombes autour est parcourue en largeur (avec une file
+# d'attente) plutôt qu'avec la pile de demine.  Si demine et lui donnent
+# toujours le même terrain, ce n'est pas parce qu'ils ont la même erreur.
+DIRECTIONS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+def voisines_a_la_main(terrain_de_jeu, rangee, colonne):
+    return [(rangee + dr, colonne + dc) for (dr, dc) in DIRECTIONS
+            if 0 <= rangee + dr < len(terrain_de_jeu) and 0 <= colonne + dc < len(terrain_de_jeu[0])]
+
+def demine_a_la_main(terrain_de_jeu, rangee, colonne):
+    if terrain_de_jeu[rangee][colonne] == BOMBE:
+        return False
+    if terrain_de_jeu[rangee][colonne] != INCONNU:
+        # un drapeau ou une case déjà déminée: rien ne change
+        return True
+    file_d_attente = collections.deque([(rangee, colonne)])
+    deja_vues = {(rangee, colonne)}
+    while file_d_attente:
+        (rangee, colonne) = file_d_attente.popleft()
+        voisines = voisines_a_la_main(terrain_de_jeu, rangee, colonne)
+        bombes = 0
+        for (autre_rangee, autre_colonne) in voisines:
+            if terrain_de_jeu[autre_rangee][autre_colonne] in [BOMBE, BOMBE_DRAPEAU]:
+                bombes += 1
+        terrain_de_jeu[rangee][colonne] = bombes
+        if bombes == 0:
+            for (autre_rangee, autre_colonne) in voisines:
+                if ((autre_rangee, autre_colonne) not in deja_vues
+                        and terrain_de_jeu[autre_rangee][autre_colonne] == INCONNU):
+                    deja_vues.add((autre_rangee, autre_colonne))
+                    file_d_attente.append((autre_rangee, autre_colonne))
+    return True
+
+def plante_drapeau_a_la_main(terrain_de_jeu, rangee, colonne):
+    if terrain_de_jeu[rangee][colonne] == BOMBE:
+        terrain_de_jeu[rangee][colonne] = BOMBE_DRAPEAU
+    elif terrain_de_jeu[rangee][colonne] == INCONNU:
+        terrain_de_jeu[rangee][colonne] = DRAPEAU
+
+MOTEURS = {'a_la_main': {'prepare': lambda terrain_de_jeu: [rangee[:] for rangee in terrain_de_jeu],
+                         'demine': demine_a_la_main,
+                         'plante_drapeau': plante_drapeau_a_la_main,
+                         'terrain': lambda terrain_de_jeu: terrain_de_jeu}}
+# un terrain carré sans les tableaux de topologies.py: les voisines sont
+# calculées à chaque fois (comme sur un très grand terrain)
+MOTEURS['sans_table'] = {'prepare': lambda terrain_de_jeu: TerrainTopologique(
+                             [rangee[:] for rangee in terrain_de_jeu],
+                             topologies.carre(rangees(terrain_de_jeu), colonnes(terrain_de_jeu),
+                                              avec_table=False)),
+                         'demine': demine,
+                         'plante_drapeau': plante_drapeau,
+                         'terrain': list}
+if demineur_numpy is not None:
+    # un lot d'un seul terrain (cf. test_demineur_numpy pour de vrais lots)
+    MOTEURS['numpy'] = {'prepare': lambda terrain_de_jeu: demineur_numpy.depuis_terrains([terrain_de_jeu]),
+                        'demine': lambda jeu, rangee, colonne: bool(
+                            demineur_numpy.joue_numpy(jeu, [False], [rangee], [colonne])[0]),
+                        'plante_drapeau': lambda jeu, rangee, colonne: demineur_numpy.joue_numpy(
+                            jeu, [True], [rangee], [colonne]),
+                        'terrain': lambda jeu: demineur_numpy.vers_terrains(jeu)[0]}
+
+def test_moteurs_differentiel(parties=200, graine=0):
+    import contextlib
+    import copy
+    import io
+    import random
+    hasard = random.Random(graine)
+    for numero in range(parties):
+        (nombre_de_rangees, nombre_de_colonnes) = (hasard.randint(1, 20), hasard.randint(1, 30))
+        reference = nouveau_jeu(nombre_de_rangees, nombre_de_colonnes,
+                                hasard.randint(0, nombre_de_rangees * nombre_de_colonnes // 4),
+                                graine=hasard.getrandbits(32))
+        jeux = {nom: moteur['prepare'](copy.deepcopy(reference)) for (nom, moteur) in MOTEURS.items()}
+        for (nom, moteur) in MOTEURS.items():
+            verifie(moteur['terrain'](jeux[nom]), reference, f"erreur dans le moteur {nom} (partie {numero})")
+        en_cours = True
+        while en_cours and any(INCONNU in rangee for rangee in reference):
+            if hasard.random() < 0.9:
+                # le plus souvent une case sans bombe, sinon la partie ne dure pas
+                (rangee, colonne) = hasard.choice([(rangee, colonne)
+                                                   for rangee in range(nombre_de_rangees)
+                                                   for colonne in range(nombre_de_colonnes)
+                                                   if case(reference, rangee, colonne) == INCONNU])
+            else:
+                (rangee, colonne) = (hasard.randrange(nombre_de_rangees), hasard.randrange(nombre_de_colonnes))
+            drapeau = hasard.random() < 0.2
+            # demine et plante_drapeau parlent au joueur ("BOUM BOUM BOUM"):
+            # redirect_stdout les fait taire
+            with contextlib.redirect_stdout(io.StringIO()):
+                if drapeau:
+                    plante_drapeau(reference, rangee, colonne)
+                else:
+                    en_cours = demine(reference, rangee, colonne)
+                for (nom, moteur) in MOTEURS.items():
+                    s = f"erreur dans le moteur {nom} (partie {numero}, coup en {rangee}, {colonne})"
+                    if drapeau:
+                        moteur['plante_drapeau'](jeux[nom], rangee, colonne)
+                    else:
+                        verifie(moteur['demine'](jeux[nom], rangee, colonne), en_cours, s)
+                    verifie(moteur['terrain'](jeux[nom]), reference, s)
+
+def test_demineur_numpy(parties=50, graine=0):
+    "Beaucoup de terrains joués en même temps, chacun comparé à demine et plante_drapeau"
+    if demineur_numpy is None:
+        return
+    import contextlib
+    import io
+    import random
+    import numpy as np
+    hasard = random.Random(graine)
+    for numero in range(parties):
+        (nombre_de_rangees, nombre_de_colonnes) = (hasard.randint(1, 12), hasard.randint(1, 12))
+        terrains = [nouveau_jeu(nombre_de_rangees, nombre_de_colonnes,
+                                hasard.randint(0, nombre_de_rangees * nombre_de_colonnes // 4),
+                                graine=hasard.getrandbits(32))
+                    for _ in range(hasard.randint(1, 20))]
+        jeux = demineur_numpy.depuis_terrains(terrains)
+        en_cours = [True] * len(terrains)
+        for tour in range(3 * nombre_de_rangees * nombre_de_colonnes):
+            # un coup au hasard par terrain, même pour les parties terminées
+            # (joue_numpy doit les ignorer)
+            coups = [(hasard.random() < 0.2, hasard.randrange(nombre_de_rangees),
+                      hasard.randrange(nombre_de_colonnes)) for _ in terrains]
+            (drapeaux, rangees, colonnes) = (np.array(valeurs) for valeurs in zip(*coups))
+            resultats = demineur_numpy.joue_numpy(jeux, drapeaux, rangees, colonnes)
+            with contextlib.redirect_stdout(io.StringIO()):
+                for (i, (drapeau, rangee, colonne)) in enumerate(coups):
+                    s = f"erreur dans le terrain {i} (partie {numero}, tour {tour})"
+                    fini = not any(valeur in [INCONNU, BOMBE] for ligne in terrains[i] for valeur in ligne)
+                    if not en_cours[i] or fini:
+                        verifie(bool(resultats[i]), True, s)
+                    elif drapeau:
+                        plante_drapeau(terrains[i], rangee, colonne)
+                        verifie(bool(resultats[i]), True, s)
+                    else:
+                        en_cours[i] = demine(terrains[i], rangee, colonne)
+                        verifie(bool(resultats[i]), en_cours[i], s)
+                    fini = not any(valeur in [INCONNU, BOMBE] for ligne in terrains[i] for valeur in ligne)
+                    verifie(bool(jeux['perdu'][i]), not en_cours[i], s)
+                    verifie(bool(jeux['fini'][i]), fini and en_cours[i], s)
+            verifie(demineur_numpy.vers_terrains(jeux), terrains, f"erreur dans la partie {numero}, tour {tour}")
+
 def tout_tester():
     test_bombes_marquees()
     test_bombes_armees()
     test_cases_voisines()
     test_bombes_voisines()
     test_drapeaux()
+    test_nouveau_jeu()
+    test_simulation_reproductible()
+    test_sauvegarde()
+    test_affichage()
+    test_terrain_infini()
+    test_moteur()
+    test_topologies()
+    test_sans_deviner()
+    test_moteurs_differentiel()
+    test_demineur_numpy()
 
 if __name__ == "__main__":
     tout_tester()
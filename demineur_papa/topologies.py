@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+import array
+import functools
+
+# Les formes de terrain du démineur:
+#
+# - carre(rangees, colonnes): le terrain habituel (celui de demineur.py quand
+#   on ne demande rien d'autre)
+# - tore(rangees, colonnes): ce qui sort à droite rentre à gauche et ce qui
+#   sort en haut rentre en bas (comme sur un beignet), il n'y a plus de bord
+# - hexagonal(rangees, colonnes): des cases à 6 côtés, une rangée sur deux est
+#   décalée d'une demi-case vers la droite
+# - cube(niveaux, rangees, colonnes): plusieurs terrains empilés, chaque case
+#   a jusqu'à 26 voisines (au-dessus, en dessous et à côté)
+#
+# Dans tous les cas, les cases sont numérotées de 0 à cases - 1, rangée par
+# rangée (et niveau par niveau pour le cube): la case numéro n est dans la
+# rangée n // colonnes et la colonne n % colonnes d'un terrain de demineur.py
+# (cf. TerrainTopologique), les niveaux d'un cube étant les uns en dessous
+# des autres.  demineur.py ne cherche les voisines d'une case que par
+# voisines(): c'est la forme du terrain qui décide, pas le jeu.
+#
+# Plutôt que de calculer les voisines d'une case chaque fois qu'on en a
+# besoin (cf. cases_voisines), nous les calculons une fois pour toutes, pour
+# toutes les cases, et les rangeons l'une après l'autre dans un seul grand
+# tableau `voisins'.  Les voisines de la case i sont
+#
+#    voisins[debuts[i]], voisins[debuts[i] + 1], ..., voisins[debuts[i + 1] - 1]
+#
+# Par exemple, pour un terrain carré de 1 rangée et 3 colonnes:
+#
+#    case 0: voisine 1; case 1: voisines 0 et 2; case 2: voisine 1
+#    voisins = [1, 0, 2, 1]   debuts = [0, 1, 3, 4]
+#
+# Chercher les voisines d'une case ne demande donc plus aucun calcul, quelle
+# que soit la forme du terrain.  Mais les tableaux prennent de la place (8
+# voisines par case sur un terrain carré): pour un terrain de plus de
+# CASES_AVEC_TABLE cases, ils ne sont pas préparés et voisines() calcule les
+# voisines à chaque fois avec `voisines_de'.
+
+CASES_AVEC_TABLE = 256 * 256
+
+def topologie(nom, forme, voisines_de, avec_table=None):
+    """Prépare les tableaux debuts et voisins
+
+    `forme' donne les dimensions (p.ex. (rangees, colonnes)) et
+    `voisines_de(numero)' les numéros des voisines d'une case (triés, sans
+    la case elle-même).  Sans table (avec_table=False, ou par défaut pour
+    plus de CASES_AVEC_TABLE cases), 'debuts' et 'voisins' sont None."""
+    cases = 1
+    for dimension in forme:
+        cases *= dimension
+    if avec_table is None:
+        avec_table = cases <= CASES_AVEC_TABLE
+    if not avec_table:
+        return {'nom': nom, 'forme': forme, 'cases': cases, 'voisines_de': voisines_de,
+                'debuts': None, 'voisins': None, 'vue': None}
+    # array('i') est une liste qui ne contient que des nombres entiers, plus
+    # compacte qu'une liste normale
+    debuts = array.array('i', [0])
+    voisins = array.array('i')
+    for numero in range(cases):
+        voisins.extend(voisines_de(numero))
+        debuts.append(len(voisins))
+    # une seule "vue" (memoryview) sur le tableau des voisins, pour toutes les
+    # cases (cf. voisines)
+    return {'nom': nom, 'forme': forme, 'cases': cases, 'voisines_de': voisines_de,
+            'debuts': debuts, 'voisins': voisins, 'vue': memoryview(voisins)}
+
+# functools.lru_cache se souvient du résultat: la deuxième fois qu'on demande
+# la même forme, les tableaux ne sont pas recalculés.  Il ne se souvient que
+# des FORMES_GARDEES dernières formes de chaque sorte: un programme qui tourne
+# longtemps (p.ex. serveur.py) et voit passer beaucoup de tailles différentes
+# ne garde pas tous leurs tableaux.
+FORMES_GARDEES = 32
+
+@functools.lru_cache(maxsize=FORMES_GARDEES)
+def carre(nombre_de_rangees, nombre_de_colonnes, avec_table=None):
+    "Le terrain rectangulaire de demineur.py: la case (r, c) a le numéro r * colonnes + c"
+    def voisines_de(numero):
+        (rangee, colonne) = divmod(numero, nombre_de_colonnes)
+        return [autre_rangee * nombre_de_colonnes + autre_colonne
+                for autre_rangee in range(max(0, rangee - 1), min(nombre_de_rangees, rangee + 2))
+                for autre_colonne in range(max(0, colonne - 1), min(nombre_de_colonnes, colonne + 2))
+                if autre_rangee != rangee or autre_colonne != colonne]
+    return topologie('carre', (nombre_de_rangees, nombre_de_colonnes), voisines_de, avec_table)
+
+@functools.lru_cache(maxsize=FORMES_GARDEES)
+def tore(nombre_de_rangees, nombre_de_colonnes):
+    "Comme carre, mais sans bord: toutes les cases ont 8 voisines"
+    def voisines_de(numero):
+        (rangee, colonne) = divmod(numero, nombre_de_colonnes)
+        # p.ex. -1 % 5 = 4: à gauche de la colonne 0, il y a la colonne 4.
+        # sorted(set(...)): sur un tout petit tore, la même voisine peut
+        # apparaître deux fois, et la case peut être sa propre voisine
+        return sorted(set(((rangee + dr) % nombre_de_rangees) * nombre_de_colonnes
+                          + (colonne + dc) % nombre_de_colonnes
+                          for dr in (-1, 0, 1) for dc in (-1, 0, 1)) - {numero})
+    return topologie('tore', (nombre_de_rangees, nombre_de_colonnes), voisines_de)
+
+@functools.lru_cache(maxsize=FORMES_GARDEES)
+def hexagonal(nombre_de_rangees, nombre_de_colonnes):
+    """Des cases à 6 côtés, les rangées impaires décalées vers la droite
+
+         / \\ / \\ / \\
+        |0,0|0,1|0,2|      la case (1, 0) touche (0, 0), (0, 1), (1, 1),
+         \\ / \\ / \\ / \\     (2, 0) et (2, 1)
+          |1,0|1,1|1,2|
+         / \\ / \\ / \\ /
+        |2,0|2,1|2,2|"""
+    def voisines_de(numero):
+        (rangee, colonne) = divmod(numero, nombre_de_colonnes)
+        # dans une rangée impaire, les voisines du dessus et du dessous sont
+        # décalées d'une colonne vers la droite
+        decalage = rangee % 2
+        deplacements = [(-1, decalage - 1), (-1, decalage), (0, -1), (0, 1),
+                        (1, decalage - 1), (1, decalage)]
+        return [(rangee + dr) * nombre_de_colonnes + colonne + dc
+                for (dr, dc) in deplacements
+                if 0 <= rangee + dr < nombre_de_rangees and 0 <= colonne + dc < nombre_de_colonnes]
+    return topologie('hexagonal', (nombre_de_rangees, nombre_de_colonnes), voisines_de)
+
+@functools.lru_cache(maxsize=FORMES_GARDEES)
+def cube(nombre_de_niveaux, nombre_de_rangees, nombre_de_colonnes):
+    "Plusieurs terrains empilés: la case (n, r, c) a le numéro (n * rangees + r) * colonnes + c"
+    def voisines_de(numero):
+        (niveau_et_rangee, colonne) = divmod(numero, nombre_de_colonnes)
+        (niveau, rangee) = divmod(niveau_et_rangee, nombre_de_rangees)
+        return [(autre_niveau * nombre_de_rangees + autre_rangee) * nombre_de_colonnes + autre_colonne
+                for autre_niveau in range(max(0, niveau - 1), min(nombre_de_niveaux, niveau + 2))
+                for autre_rangee in range(max(0, rangee - 1), min(nombre_de_rangees, rangee + 2))
+                for autre_colonne in range(max(0, colonne - 1), min(nombre_de_colonnes, colonne + 2))
+                if (autre_niveau, autre_rangee, autre_colonne) != (niveau, rangee, colonne)]
+    return topologie('cube', (nombre_de_niveaux, nombre_de_rangees, nombre_de_colonnes), voisines_de)
+
+def voisines(topo, numero):
+    """Les numéros des voisines d'une case, du plus petit au plus grand
+
+    Un morceau de la vue sur le tableau des voisins préparée par topologie():
+    rien n'est recopié.  Sans table, les voisines sont calculées."""
+    if topo['vue'] is None:
+        return topo['voisines_de'](numero)
+    debuts = topo['debuts']
+    return topo['vue'][debuts[numero]:debuts[numero + 1]]
@@ -4,24 +4,58 @@
 # from matplotlib import pyplot as plt
 # from matplotlib import image
 
+import collections
+import hashlib
 import math
+import os
+import struct
+import zlib
 import numpy as np
-from matplotlib import pyplot as plt
-from matplotlib import image
+# matplotlib n'est importé que quand on en a besoin (cf. montre, sauve et
+# image_pixelisee): l'importer prend presque une seconde et il lui faut un
+# écran pour pyplot, alors que construire une image ou la projeter dans un
+# tableau numpy n'en a pas besoin.
 
 BLANC_TRANSPARENT = [1.0, 1.0, 1.0, 0.0]
 
+def fige(valeur):
+    """Une copie qu'on ne peut plus modifier: les listes deviennent des tuples
+
+    p.ex. fige([[0, 1], [2, 3]]) = ((0, 1), (2, 3)).  Une image garde ses
+    paramètres (cf. decrit): si c'étaient les listes de celui qui l'a
+    construite, il pourrait les modifier après coup, et l'image et son
+    empreinte ne correspondraient plus."""
+    if isinstance(valeur, (list, tuple)):
+        return tuple(fige(v) for v in valeur)
+    if isinstance(valeur, dict):
+        return {k: fige(v) for (k, v) in valeur.items()}
+    if isinstance(valeur, np.ndarray) and valeur.flags.writeable:
+        copie = valeur.copy()
+        copie.setflags(write=False)
+        return copie
+    return valeur
+
+def decrit(image, nom, enfants=(), **parametres):
+    """Note sur l'image comment elle a été construite, puis la renvoie
+
+    `nom' est le nom de la fonction qui l'a construite, `enfants' les images
+    à partir desquelles elle a été construite et `parametres' le reste
+    (des copies, cf. fige).  Cela ne change pas l'image, mais permet de la
+    parcourir comme un arbre (p.ex. svg.py la transforme en dessin
+    vectoriel)."""
+    image.noeud = {'nom': nom, 'enfants': list(enfants), 'parametres': fige(parametres)}
+    return image
+
 def image_vide(_x, _y):
     "Une image transparente"
     return BLANC_TRANSPARENT
+decrit(image_vide, 'image_vide')
 
 def superpose(*images):
     "Superpose plusieurs images (la première image est au-dessus)"
     if images == []:
         return image_vide
     images = list(images) # une copie pour être sûr que personne ne la modifie
-    def moyenne_ponderee(xs, idx, somme):
-        return sum(v[idx] * v[3] for v in xs) / somme
     def images_superposees(x, y):
         valeurs = []
         for img in images:
@@ -29,15 +63,21 @@ def superpose(*images):
             if valeurs[-1][3] > 0.9999:
                 # l'image est tellement opaque qu'on ne regarde pas derrière
                 break
-        somme_opacite = sum(v[3] for v in valeurs)
-        if somme_opacite < 1e-6:
-            return BLANC_TRANSPARENT
-        else:
-            return [moyenne_ponderee(valeurs, 0, somme_opacite)
-                   , moyenne_ponderee(valeurs, 1, somme_opacite)
-                   , moyenne_ponderee(valeurs, 2, somme_opacite)
-                   , max(v[3] for v in valeurs)]
-    return images_superposees
+        return melange(valeurs)
+    return decrit(images_superposees, 'superpose', images)
+
+def melange(valeurs):
+    "Mélange des couleurs superposées (cf. superpose), en tenant compte de leur opacité"
+    def moyenne_ponderee(xs, idx, somme):
+        return sum(v[idx] * v[3] for v in xs) / somme
+    somme_opacite = sum(v[3] for v in valeurs)
+    if somme_opacite < 1e-6:
+        return BLANC_TRANSPARENT
+    else:
+        return [moyenne_ponderee(valeurs, 0, somme_opacite)
+               , moyenne_ponderee(valeurs, 1, somme_opacite)
+               , moyenne_ponderee(valeurs, 2, somme_opacite)
+               , max(v[3] for v in valeurs)]
 
 def longueur_au_carre(v):
     "Calcule le carré de la longueur d'un vecteur"
@@ -61,6 +101,7 @@ def pavage_parallelogramme(image, coin_1, coin_2, coin_3):
             \        \
              .________+____.
             c1             c2"""
+    coin_1 = fige(coin_1)
     #  _     ___     ___
     #  x = a c   + b c
     #         21      32
@@ -91,14 +132,15 @@ def pavage_parallelogramme(image, coin_1, coin_2, coin_3):
         vy = b % 1.0
         return image(coin_1[0] + vx * v1[0] + vy * v2[0],
                      coin_1[1] + vx * v1[1] + vy * v2[1])
-    return image_pavee
+    return decrit(image_pavee, 'pavage_parallelogramme', [image],
+                  coin_1=coin_1, coin_2=coin_2, coin_3=coin_3)
 
 def translation(image, v):
     "Effectue une translation d'une image: l'origine est envoyée sur le point v"
     dx, dy = v
     def apres_translation(x, y):
         return image(x - dx, y - dy)
-    return apres_translation
+    return decrit(apres_translation, 'translation', [image], v=v)
 
 def rotation(image, angle_degres, cx=0, cy=0):
     "Effectue un rotation d'une image autour du centre ((0, 0) par défaut)"
@@ -110,10 +152,11 @@ def rotation(image, angle_degres, cx=0, cy=0):
         dx = x - cx
         dy = y - cy
         return image(cx + c * dx + s * dy, cy - s * dx + c * dy)
-    return image_tournee
+    return decrit(image_tournee, 'rotation', [image], angle_degres=angle_degres, cx=cx, cy=cy)
 
 def decoupe_rectangulaire(image, coin_1, coin_2, couleur_autour=BLANC_TRANSPARENT):
     "Masque toute l'image autour du rectangle et remplace l'extérieur par une couleur constante"
+    couleur_autour = fige(couleur_autour)
     bbox = [[min(coin_1[0], coin_2[0]), min(coin_1[1], coin_2[1])],
             [max(coin_1[0], coin_2[0]), max(coin_1[1], coin_2[1])]]
     def image_tronquee(x, y):
@@ -121,11 +164,16 @@ def decoupe_rectangulaire(image, coin_1, coin_2, couleur_autour=BLANC_TRANSPAREN
             return image(x, y)
         else:
             return couleur_autour
-    return image_tronquee
+    return decrit(image_tronquee, 'decoupe_rectangulaire', [image],
+                  coin_1=coin_1, coin_2=coin_2, couleur_autour=couleur_autour)
 
 def image_pixelisee(fichier, coin_1, coin_2, couleur_autour=BLANC_TRANSPARENT, opacite=1.0):
     "Image à partir d'un fichier, insérée dans le rectangle donné, entouré de blanc transparent"
+    couleur_autour = fige(couleur_autour)
+    from matplotlib import image
     data = image.imread(fichier)
+    # personne d'autre n'a ces pixels: inutile de les copier (cf. fige)
+    data.setflags(write=False)
     hauteur_px, largeur_px, _ = data.shape
     bbox = [[min(coin_1[0], coin_2[0]), min(coin_1[1], coin_2[1])],
             [max(coin_1[0], coin_2[0]), max(coin_1[1], coin_2[1])]]
@@ -144,10 +192,14 @@ def image_pixelisee(fichier, coin_1, coin_2, couleur_autour=BLANC_TRANSPARENT, o
             return [p[0], p[1], p[2], opacite]
         else:
             return couleur_autour
-    return pixelise
+    # les pixels eux-mêmes font partie de la description: si le fichier
+    # change, l'empreinte (cf. empreinte) change aussi
+    return decrit(pixelise, 'image_pixelisee', fichier=fichier, coin_1=coin_1, coin_2=coin_2,
+                  couleur_autour=couleur_autour, opacite=opacite, pixels=data)
 
 def decoupe_polygone_convexe(image, coins, couleur_autour=BLANC_TRANSPARENT):
     "Masque toute l'image autour du polygone et remplace l'extérieur par une couleur constante"
+    couleur_autour = fige(couleur_autour)
     cotes = zip(coins, [coins[-1], *coins[:-1]])
     milieu = [sum([c[0] for c in coins]) / len(coins),
               sum([c[1] for c in coins]) / len(coins)]
@@ -170,10 +222,12 @@ def decoupe_polygone_convexe(image, coins, couleur_autour=BLANC_TRANSPARENT):
             if a * x + b * y + c > 0:
                 return couleur_autour
         return image(x, y)
-    return image_tronquee
+    return decrit(image_tronquee, 'decoupe_polygone_convexe', [image],
+                  coins=coins, couleur_autour=couleur_autour)
 
 def decoupe_circulaire(image, centre, rayon, couleur_autour=BLANC_TRANSPARENT):
     "Masque toute l'image autour du cercle et remplace l'extérieur par une couleur constante"
+    (centre, couleur_autour) = (fige(centre), fige(couleur_autour))
     rayon_carre = rayon * rayon
     def image_tronquee(x, y):
         dx = x - centre[0]
@@ -182,7 +236,8 @@ def decoupe_circulaire(image, centre, rayon, couleur_autour=BLANC_TRANSPARENT):
             return image(x, y)
         else:
             return couleur_autour
-    return image_tronquee
+    return decrit(image_tronquee, 'decoupe_circulaire', [image],
+                  centre=centre, rayon=rayon, couleur_autour=couleur_autour)
 
 def deforme_rectangle_en_trapeze(image, largeur, hauteur, petite_largeur, couleur_autour=BLANC_TRANSPARENT):
     """Reserre le haut d'un rectangle pour en faire un trapèze symétrique, déformant l'image à l'intérieur
@@ -194,6 +249,7 @@ def deforme_rectangle_en_trapeze(image, largeur, hauteur, petite_largeur, couleu
            |           | |                 /         \  |
            +-----------+ v                +-----------+ v
            <--largeur-->                  <--largeur-->"""
+    couleur_autour = fige(couleur_autour)
     def image_deformee(x, y):
         if (0 <= x <= largeur) and (0 <= y <= hauteur):
             ma_largeur = petite_largeur + (largeur - petite_largeur) * (hauteur - y) / hauteur
@@ -204,12 +260,197 @@ def deforme_rectangle_en_trapeze(image, largeur, hauteur, petite_largeur, couleu
                 return image(mon_x, y)
         else:
             return image(x, y)
-    return image_deformee
+    return decrit(image_deformee, 'deforme_rectangle_en_trapeze', [image], largeur=largeur,
+                  hauteur=hauteur, petite_largeur=petite_largeur, couleur_autour=couleur_autour)
+
+# Un cache de pixels devant projette.
+#
+# Les mêmes images (un logo, un fond, ...) sont souvent projetées encore et
+# encore.  Chaque image décrite (cf. decrit) a une "empreinte": un résumé
+# (sha256) de son nom, de ses paramètres et des empreintes de ses enfants.
+# Deux images construites de la même façon ont la même empreinte, même dans
+# deux sessions différentes; si un seul paramètre change, l'empreinte change.
+#
+# projette garde les pixels calculés, rangés par (empreinte, rectangle,
+# pixels_par_unite, type des nombres).  Quand il n'y a plus de place, ce sont
+# les pixels qui n'ont pas servi depuis le plus longtemps qui sont oubliés
+# ("LRU": least recently used).  Avec un répertoire (cf. configure_cache), les
+# pixels sont aussi écrits sur le disque et resservent la fois suivante.
+#
+# Même quand une image n'est pas dans le cache, certaines de ses parties
+# peuvent y être: p.ex. superpose(texte, logo) où le logo a déjà été projeté
+# à la même résolution, sur une grille de pixels qui tombe juste (les centres
+# des pixels sont aux mêmes endroits).  Alors, pour les points de ces
+# parties, on lit simplement les pixels déjà calculés.  Cela ne marche qu'à
+# travers les images qui ne déplacent pas les points (superpose, decoupe_...,
+# opaque): après une rotation, les pixels ne tombent plus juste.
+
+CACHE_DE_PIXELS = {'pixels': collections.OrderedDict(), # clé -> tableau, du plus ancien au plus récent
+                   'par_empreinte': {}, # empreinte -> clés de cette empreinte
+                   'octets': 0,
+                   'octets_maximum': 256 * 1024 * 1024,
+                   'repertoire': None,
+                   'trouves': 0,
+                   'calcules': 0}
+
+def configure_cache(octets_maximum=None, repertoire=None):
+    """Change la taille du cache en mémoire (0 pour ne plus rien garder) et/ou son répertoire sur le disque"""
+    if octets_maximum is not None:
+        CACHE_DE_PIXELS['octets_maximum'] = octets_maximum
+        fais_de_la_place(0)
+    if repertoire is not None:
+        os.makedirs(repertoire, exist_ok=True)
+        CACHE_DE_PIXELS['repertoire'] = repertoire
+
+def vide_cache():
+    "Oublie tous les pixels gardés en mémoire (pas ceux sur le disque)"
+    CACHE_DE_PIXELS['pixels'].clear()
+    CACHE_DE_PIXELS['par_empreinte'].clear()
+    CACHE_DE_PIXELS['octets'] = 0
+
+def canonique(valeur):
+    "Un texte qui représente un paramètre, toujours le même pour la même valeur"
+    if valeur is None or isinstance(valeur, str):
+        return repr(valeur)
+    if isinstance(valeur, (int, float, np.number)):
+        # 1 et 1.0 donnent la même image
+        return repr(float(valeur))
+    if isinstance(valeur, np.ndarray):
+        return f'array({valeur.dtype},{valeur.shape},{hashlib.sha256(np.ascontiguousarray(valeur).tobytes()).hexdigest()})'
+    if isinstance(valeur, (list, tuple)):
+        return '[' + ','.join(canonique(v) for v in valeur) + ']'
+    if isinstance(valeur, dict):
+        return '{' + ','.join(f'{k!r}:{canonique(valeur[k])}' for k in sorted(valeur)) + '}'
+    if callable(valeur):
+        e = empreinte(valeur)
+        if e is not None:
+            return e
+    raise ValueError(f"Impossible de résumer {valeur!r}")
+
+def empreinte(image):
+    """L'empreinte (texte) d'une image, None si elle n'est pas entièrement décrite
+
+    p.ex. une fonction écrite à la main (comme im1) n'a pas d'empreinte, ni
+    aucune image construite à partir d'elle."""
+    noeud = getattr(image, 'noeud', None)
+    if noeud is None:
+        return None
+    if 'empreinte' not in noeud:
+        # calculée une seule fois par image
+        try:
+            enfants = [empreinte(enfant) for enfant in noeud['enfants']]
+            if None in enfants:
+                resultat = None
+            else:
+                resultat = hashlib.sha256(f'{noeud["nom"]}({canonique(noeud["parametres"])};{",".join(enfants)})'
+                                          .encode('utf-8')).hexdigest()
+        except ValueError:
+            resultat = None
+        noeud['empreinte'] = resultat
+    return noeud['empreinte']
+
+def fais_de_la_place(octets):
+    "Oublie les pixels les plus anciens jusqu'à ce qu'il y ait la place pour `octets' de plus"
+    pixels = CACHE_DE_PIXELS['pixels']
+    while pixels and CACHE_DE_PIXELS['octets'] + octets > CACHE_DE_PIXELS['octets_maximum']:
+        (cle, data) = pixels.popitem(last=False)
+        CACHE_DE_PIXELS['octets'] -= data.nbytes
+        CACHE_DE_PIXELS['par_empreinte'][cle[0]].discard(cle)
+
+def garde(cle, data):
+    "Range des pixels dans le cache en mémoire"
+    if data.nbytes > CACHE_DE_PIXELS['octets_maximum']:
+        return
+    fais_de_la_place(data.nbytes)
+    CACHE_DE_PIXELS['pixels'][cle] = data
+    CACHE_DE_PIXELS['octets'] += data.nbytes
+    CACHE_DE_PIXELS['par_empreinte'].setdefault(cle[0], set()).add(cle)
+
+def fichier_du_cache(cle):
+    return os.path.join(CACHE_DE_PIXELS['repertoire'],
+                        hashlib.sha256(repr(cle).encode('utf-8')).hexdigest() + '.npy')
+
+def cherche_dans_le_cache(cle):
+    "Les pixels rangés sous cette clé (None s'il n'y en a pas)"
+    pixels = CACHE_DE_PIXELS['pixels']
+    if cle in pixels:
+        pixels.move_to_end(cle) # c'est maintenant le plus récent
+        return pixels[cle]
+    if CACHE_DE_PIXELS['repertoire'] is not None and os.path.exists(fichier_du_cache(cle)):
+        data = np.load(fichier_du_cache(cle))
+        garde(cle, data)
+        return data
+    return None
+
+def range_dans_le_cache(cle, data):
+    garde(cle, data)
+    if CACHE_DE_PIXELS['repertoire'] is not None:
+        # d'abord dans un fichier temporaire: un autre processus ne doit
+        # jamais lire un fichier à moitié écrit
+        temporaire = fichier_du_cache(cle) + f'.{os.getpid()}.tmp'
+        with open(temporaire, 'wb') as f:
+            np.save(f, data)
+        os.replace(temporaire, fichier_du_cache(cle))
+
+# les images dont les enfants sont vus exactement aux mêmes points qu'elles
+MEME_GRILLE = ['superpose', 'decoupe_rectangulaire', 'decoupe_polygone_convexe', 'decoupe_circulaire',
+               'opaque']
+
+def lit_les_pixels(image, data, bbox, pixels_par_unite):
+    "Une image qui lit les pixels déjà calculés, et demande à `image' en dehors"
+    hauteur_px, largeur_px = data.shape[:2]
+    gauche = bbox[0][0]
+    haut = bbox[1][1]
+    def image_en_cache(x, y):
+        colonne = round((x - gauche) * pixels_par_unite - 0.5)
+        rangee = round((haut - y) * pixels_par_unite - 0.5)
+        if 0 <= rangee < hauteur_px and 0 <= colonne < largeur_px:
+            return data[rangee, colonne]
+        return image(x, y)
+    return image_en_cache
+
+def reutilise_les_pixels(image, bbox, pixels_par_unite):
+    """La même image, mais où les parties déjà dans le cache (sur la même grille) lisent leurs pixels"""
+    cles = CACHE_DE_PIXELS['par_empreinte'].get(empreinte(image), ())
+    for cle in list(cles):
+        (_, autre_bbox, autres_pixels_par_unite, _) = cle
+        decalages = [(bbox[0][0] - autre_bbox[0][0]) * pixels_par_unite,
+                     (bbox[1][1] - autre_bbox[1][1]) * pixels_par_unite]
+        if autres_pixels_par_unite == pixels_par_unite and all(abs(d - round(d)) < 1e-6 for d in decalages):
+            return lit_les_pixels(image, cherche_dans_le_cache(cle), autre_bbox, pixels_par_unite)
+    noeud = getattr(image, 'noeud', None)
+    if noeud is None or noeud['nom'] not in MEME_GRILLE:
+        return image
+    enfants = [reutilise_les_pixels(enfant, bbox, pixels_par_unite) for enfant in noeud['enfants']]
+    if all(nouveau is ancien for (nouveau, ancien) in zip(enfants, noeud['enfants'])):
+        return image
+    # reconstruit l'image avec les nouveaux enfants
+    if noeud['nom'] == 'superpose':
+        return superpose(*enfants)
+    return globals()[noeud['nom']](enfants[0], **noeud['parametres'])
 
 def projette(image, coin_1, coin_2, pixels_par_unite):
-    "Rend l'image visible, limité au rectangle défini par les coins et à la résolution donnée"
-    bbox = [[min(coin_1[0], coin_2[0]), min(coin_1[1], coin_2[1])],
-            [max(coin_1[0], coin_2[0]), max(coin_1[1], coin_2[1])]]
+    """Rend l'image visible, limité au rectangle défini par les coins et à la résolution donnée
+
+    Le résultat peut venir du cache (cf. CACHE_DE_PIXELS): c'est une copie,
+    on peut la modifier sans risque."""
+    bbox = ((min(coin_1[0], coin_2[0]), min(coin_1[1], coin_2[1])),
+            (max(coin_1[0], coin_2[0]), max(coin_1[1], coin_2[1])))
+    e = empreinte(image)
+    if e is None or CACHE_DE_PIXELS['octets_maximum'] <= 0:
+        return projette_sans_cache(image, bbox, pixels_par_unite)
+    cle = (e, tuple(tuple(float(c) for c in coin) for coin in bbox), float(pixels_par_unite), 'float64')
+    data = cherche_dans_le_cache(cle)
+    if data is not None:
+        CACHE_DE_PIXELS['trouves'] += 1
+        return data.copy()
+    CACHE_DE_PIXELS['calcules'] += 1
+    data = projette_sans_cache(reutilise_les_pixels(image, bbox, pixels_par_unite), bbox, pixels_par_unite)
+    range_dans_le_cache(cle, data.copy())
+    return data
+
+def projette_sans_cache(image, bbox, pixels_par_unite):
+    "Calcule la couleur de chaque pixel dans le rectangle `bbox' ((gauche, bas), (droite, haut))"
     w = bbox[1][0] - bbox[0][0]
     h = bbox[1][1] - bbox[0][1]
     pw = round(w * pixels_par_unite)
@@ -226,21 +467,59 @@ def projette(image, coin_1, coin_2, pixels_par_unite):
 
 def montre(image, coin_1, coin_2, pixels_par_unite):
     "Affiche la partie l'image limité au rectangle défini par les coins"
+    from matplotlib import pyplot as plt
     plt.imshow(projette(image, coin_1, coin_2, pixels_par_unite))
 
+def png_en_octets(data, compression=6):
+    """Les octets d'un fichier PNG pour un tableau de pixels (cf. projette), sans matplotlib
+
+    Un fichier PNG est une signature suivie de "morceaux" (chunks): IHDR
+    (taille et sorte de pixels), IDAT (les pixels compressés avec zlib) et
+    IEND.  Chaque morceau est: sa longueur, son nom, son contenu et un
+    CRC32 pour vérifier que rien n'a été abîmé."""
+    hauteur, largeur, _ = data.shape
+    pixels = np.clip(np.round(np.asarray(data) * 255), 0, 255).astype(np.uint8).reshape(hauteur, largeur * 4)
+    # chaque rangée commence par le numéro du "filtre" utilisé: 0 = aucun
+    rangees = np.concatenate([np.zeros((hauteur, 1), dtype=np.uint8), pixels], axis=1)
+    def morceau(nom, contenu):
+        return (struct.pack('>I', len(contenu)) + nom + contenu
+                + struct.pack('>I', zlib.crc32(nom + contenu) & 0xffffffff))
+    # 8 bits par couleur, 6 = rouge, vert, bleu et opacité
+    entete = struct.pack('>IIBBBBB', largeur, hauteur, 8, 6, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + morceau(b'IHDR', entete)
+            + morceau(b'IDAT', zlib.compress(rangees.tobytes(), compression))
+            + morceau(b'IEND', b''))
+
 def sauve(fichier, image, coin_1, coin_2, pixels_par_unite):
-    "Sauve la partie l'image limité au rectangle défini par les coins dans un fichier"
-    plt.imsave(fichier, projette(image, coin_1, coin_2, pixels_par_unite))
+    """Sauve la partie l'image limité au rectangle défini par les coins dans un fichier
+
+    Un fichier .svg est un dessin vectoriel (cf. svg.py): seules les parties
+    de l'image qui ne sont pas faites de lignes, cercles, etc. deviennent des
+    pixels."""
+    if fichier.endswith('.svg'):
+        import svg
+        svg.sauve_svg(fichier, image, coin_1, coin_2, pixels_par_unite)
+    elif fichier.endswith('.png'):
+        # pas besoin de matplotlib pour un PNG
+        with open(fichier, 'wb') as f:
+            f.write(png_en_octets(projette(image, coin_1, coin_2, pixels_par_unite)))
+    elif fichier.endswith('.npy'):
+        # le tableau de pixels lui-même (cf. numpy.load)
+        np.save(fichier, projette(image, coin_1, coin_2, pixels_par_unite))
+    else:
+        from matplotlib import pyplot as plt
+        plt.imsave(fichier, projette(image, coin_1, coin_2, pixels_par_unite))
 
 def opaque(image, opacite=1.0):
     "Rend l'image opaque (vois aussi superpose)"
     def opacifie(x, y):
         p = image(x, y)
         return [p[0], p[1], p[2], opacite]
-    return opacifie
+    return decrit(opacifie, 'opaque', [image], opacite=opacite)
 
 def ligne(point_1, point_2, epaisseur, rgba):
     "Dessine un ligne passant par les 2 points donnés"
+    (point_1, rgba) = (fige(point_1), fige(rgba))
     dx = point_2[0] - point_1[0]
     dy = point_2[1] - point_1[1]
     longueur = math.sqrt(dx * dx + dy * dy)
@@ -254,10 +533,11 @@ def ligne(point_1, point_2, epaisseur, rgba):
             return rgba
         else:
             return BLANC_TRANSPARENT
-    return image_ligne
+    return decrit(image_ligne, 'ligne', point_1=point_1, point_2=point_2, epaisseur=epaisseur, rgba=rgba)
 
 def cercle(centre, rayon, epaisseur, rgba):
     "Dessine un cercle"
+    (centre, rgba) = (fige(centre), fige(rgba))
     rayon_2_minimum = (rayon - epaisseur / 2) * (rayon - epaisseur / 2)
     rayon_2_maximum = (rayon + epaisseur / 2) * (rayon + epaisseur / 2)
     def image_cercle(x, y):
@@ -267,10 +547,11 @@ def cercle(centre, rayon, epaisseur, rgba):
             return rgba
         else:
             return BLANC_TRANSPARENT
-    return image_cercle
+    return decrit(image_cercle, 'cercle', centre=centre, rayon=rayon, epaisseur=epaisseur, rgba=rgba)
 
 def disque(centre, rayon, rgba):
     "Dessine un cercle rempli"
+    (centre, rgba) = (fige(centre), fige(rgba))
     rayon_2 = rayon * rayon
     def image_disque(x, y):
         dx = x - centre[0]
@@ -279,20 +560,22 @@ def disque(centre, rayon, rgba):
             return rgba
         else:
             return BLANC_TRANSPARENT
-    return image_disque
+    return decrit(image_disque, 'disque', centre=centre, rayon=rayon, rgba=rgba)
 
 def homothetie(image, centre, facteur):
     "Déforme l'image par homothétie"
+    centre = fige(centre)
     # (ax, ay) est transforme en (cx + (ax - cx) * f, cy + (ay - cy) * f)
     # donc
     # x = cx + (ax - cx) * f <=> ax = cx + (x - cx) / f
     def image_agrandie(x, y):
         return image(centre[0] + (x - centre[0]) / facteur,
                      centre[1] + (y - centre[1]) / facteur)
-    return image_agrandie
+    return decrit(image_agrandie, 'homothetie', [image], centre=centre, facteur=facteur)
 
 def segment(point_1, point_2, epaisseur, rgba):
     "Dessine un segment de droite reliant deux points"
+    (point_1, rgba) = (fige(point_1), fige(rgba))
     dx = point_2[0] - point_1[0]
     dy = point_2[1] - point_1[1]
     longueur_carre = dx * dx + dy * dy
@@ -315,10 +598,11 @@ def segment(point_1, point_2, epaisseur, rgba):
                 return BLANC_TRANSPARENT
         else:
             return BLANC_TRANSPARENT
-    return image_ligne
+    return decrit(image_ligne, 'segment', point_1=point_1, point_2=point_2, epaisseur=epaisseur, rgba=rgba)
 
 def multi_segments(segments, epaisseur, rgba):
     "Plus efficace que superpose(segment(...), segment(...), ...)"
+    rgba = fige(rgba)
     images_segments = [segment(c[0], c[1], epaisseur, rgba) for c in segments]
     def image(x, y):
         for s in images_segments:
@@ -326,7 +610,8 @@ def multi_segments(segments, epaisseur, rgba):
             if v == rgba:
                 return v
         return BLANC_TRANSPARENT
-    return image
+    # les segments sont des enfants: chacun a sa propre description
+    return decrit(image, 'multi_segments', images_segments, epaisseur=epaisseur, rgba=rgba)
 
 def polygone(coins, epaisseur, rgba):
     "Dessine un polygone reliant les coins"
@@ -351,6 +636,7 @@ def trapezes_empiles_en_triangle(base, limite=0.01):
     return trapezes
 
 def comprime_dans_un_cercle(image, rayon, couleur_autour=BLANC_TRANSPARENT):
+    couleur_autour = fige(couleur_autour)
     rayon_carre = rayon * rayon
     def image_comprimee(x, y):
         r_carre = x * x + y * y
@@ -364,7 +650,90 @@ def comprime_dans_un_cercle(image, rayon, couleur_autour=BLANC_TRANSPARENT):
         r = math.sqrt(r_carre)
         s = r / (rayon - r)
         return image(x / r * s, y / r * s)
-    return image_comprimee
+    return decrit(image_comprimee, 'comprime_dans_un_cercle', [image],
+                  rayon=rayon, couleur_autour=couleur_autour)
+
+def instances(image, coin_1, coin_2, placements, pixels_par_unite, couleur_autour=BLANC_TRANSPARENT):
+    """Place beaucoup de copies du rectangle (coin_1, coin_2) de l'image
+
+    Chaque placement est (v, angle_degres, facteur): la copie est agrandie
+    par `facteur' et tournée de `angle_degres' autour de l'origine, puis
+    l'origine est envoyée sur le point v.  C'est la même chose que
+    superpose(translation(rotation(homothetie(decoupe_rectangulaire(image,
+    coin_1, coin_2), [0, 0], facteur), angle_degres), v), ...) avec une
+    copie par placement (la première au-dessus), sauf que l'image n'est
+    calculée qu'une fois, en pixels, assez fins pour la plus grande copie
+    projetée avec `pixels_par_unite'.
+
+    ValueError si un facteur est nul (ou infini): la copie n'aurait pas de
+    taille."""
+    for (numero, (_, _, facteur)) in enumerate(placements):
+        if facteur == 0 or not math.isfinite(facteur):
+            raise ValueError(f"instances: le facteur du placement {numero} vaut {facteur!r}, "
+                             "il doit être un nombre non nul")
+    couleur_autour = fige(couleur_autour)
+    bbox = [[min(coin_1[0], coin_2[0]), min(coin_1[1], coin_2[1])],
+            [max(coin_1[0], coin_2[0]), max(coin_1[1], coin_2[1])]]
+    # la plus grande copie a besoin de plus de pixels par unité de l'image
+    # d'origine (et au moins d'un pixel en tout)
+    resolution = pixels_par_unite * max([abs(facteur) for (_, _, facteur) in placements] + [1e-6])
+    resolution = max(resolution, 1 / min(bbox[1][0] - bbox[0][0], bbox[1][1] - bbox[0][1]))
+    # pour chaque copie: ce qu'il faut pour revenir d'un point du dessin au
+    # point correspondant de l'image d'origine (cf. rotation et homothetie),
+    # et le rectangle du dessin qui contient la copie
+    copies = []
+    for (v, angle_degres, facteur) in placements:
+        c = math.cos(math.pi * angle_degres / 180)
+        s = math.sin(math.pi * angle_degres / 180)
+        coins = [[v[0] + facteur * (c * x - s * y), v[1] + facteur * (s * x + c * y)]
+                 for x in (bbox[0][0], bbox[1][0]) for y in (bbox[0][1], bbox[1][1])]
+        copies.append((v[0], v[1], c / facteur, s / facteur,
+                       min(x for (x, _) in coins), min(y for (_, y) in coins),
+                       max(x for (x, _) in coins), max(y for (_, y) in coins)))
+    # Une grille pour trouver vite les copies qui recouvrent un point: chaque
+    # case de la grille connaît les copies qui la touchent (dans l'ordre des
+    # placements).  Les cases ont à peu près la taille d'une copie, pour
+    # qu'une copie ne touche que quelques cases.
+    if copies:
+        taille_case = max(sum(max(c[6] - c[4], c[7] - c[5]) for c in copies) / len(copies), 1e-6)
+    else:
+        taille_case = 1.0
+    grille = {}
+    for (numero, copie) in enumerate(copies):
+        for i in range(math.floor(copie[4] / taille_case), math.floor(copie[6] / taille_case) + 1):
+            for j in range(math.floor(copie[5] / taille_case), math.floor(copie[7] / taille_case) + 1):
+                grille.setdefault((i, j), []).append(copie)
+    # les pixels de l'image d'origine, calculés la première fois qu'on en a
+    # besoin (p.ex. pas du tout pour svg.py)
+    pixels = []
+    def image_instanciee(x, y):
+        candidates = grille.get((math.floor(x / taille_case), math.floor(y / taille_case)))
+        if candidates is None:
+            return couleur_autour
+        if not pixels:
+            pixels.append(projette(image, bbox[0], bbox[1], resolution))
+        data = pixels[0]
+        hauteur_px, largeur_px = data.shape[:2]
+        valeurs = []
+        for (vx, vy, c, s, x_min, y_min, x_max, y_max) in candidates:
+            if not ((x_min <= x <= x_max) and (y_min <= y <= y_max)):
+                continue
+            dx = x - vx
+            dy = y - vy
+            # le point de l'image d'origine
+            ox = c * dx + s * dy
+            oy = -s * dx + c * dy
+            if (bbox[0][0] <= ox <= bbox[1][0]) and (bbox[0][1] <= oy <= bbox[1][1]):
+                valeurs.append(data[min(math.floor((bbox[1][1] - oy) * resolution), hauteur_px - 1),
+                                    min(math.floor((ox - bbox[0][0]) * resolution), largeur_px - 1)])
+                if valeurs[-1][3] > 0.9999:
+                    break
+        if not valeurs:
+            return couleur_autour
+        return melange(valeurs)
+    return decrit(image_instanciee, 'instances', [image], coin_1=coin_1, coin_2=coin_2,
+                  placements=placements, pixels_par_unite=pixels_par_unite,
+                  couleur_autour=couleur_autour)
 
 def im1(x, y):
     return [max(0, min(1, (x + 1) / 1.5)), 0, 0, 0.99]
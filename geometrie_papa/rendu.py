@@ -0,0 +1,102 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import premier_jet
+
+# Dessiner beaucoup d'images d'un coup, sans Jupyter et sans écran.
+#
+# Chaque image est décrite dans un fichier JSON (ou YAML si le module yaml est
+# installé) avec les mêmes fonctions et les mêmes paramètres qu'en Python.
+# Par exemple
+#
+#    superpose(disque([0, 0], 0.5, [1, 0, 0, 1]),
+#              rotation(ligne([0, 0], [1, 0], 0.1, [0, 0, 1, 1]), 30))
+#
+# s'écrit
+#
+#    {"sortie": "exemple.png",
+#     "coin_1": [-1, -1], "coin_2": [1, 1], "pixels_par_unite": 100,
+#     "image": {"fonction": "superpose",
+#               "images": [{"fonction": "disque", "centre": [0, 0], "rayon": 0.5,
+#                           "rgba": [1, 0, 0, 1]},
+#                          {"fonction": "rotation", "angle_degres": 30,
+#                           "image": {"fonction": "ligne", "point_1": [0, 0],
+#                                     "point_2": [1, 0], "epaisseur": 0.1,
+#                                     "rgba": [0, 0, 1, 1]}}]}}
+#
+# Un fichier peut aussi contenir une liste de dessins.  La sortie est écrite
+# par premier_jet.sauve: .png, .svg, .npy (le tableau numpy), ou un autre
+# format connu de matplotlib.  Tous les dessins sont faits dans le même
+# processus: Python (et matplotlib, s'il faut) ne démarrent qu'une fois.
+#
+#    python rendu.py scenes/*.json --repertoire images
+
+# les fonctions qu'on peut utiliser dans une description
+CONSTRUCTEURS = {nom: getattr(premier_jet, nom) for nom in [
+    'superpose', 'pavage_parallelogramme', 'translation', 'rotation', 'decoupe_rectangulaire',
+    'image_pixelisee', 'decoupe_polygone_convexe', 'decoupe_circulaire',
+    'deforme_rectangle_en_trapeze', 'opaque', 'ligne', 'cercle', 'disque', 'homothetie',
+    'segment', 'multi_segments', 'polygone', 'polygone_regulier', 'comprime_dans_un_cercle',
+    'instances']}
+
+def construit(description, repertoire='.'):
+    """L'image décrite par `description' (cf. plus haut)
+
+    Les noms de fichiers (image_pixelisee) sont relatifs à `repertoire'."""
+    if description == 'image_vide':
+        return premier_jet.image_vide
+    description = dict(description)
+    nom = description.pop('fonction')
+    if nom not in CONSTRUCTEURS:
+        raise ValueError(f"Fonction inconnue: {nom}")
+    if nom == 'superpose':
+        return premier_jet.superpose(*[construit(image, repertoire) for image in description['images']])
+    if 'image' in description:
+        description['image'] = construit(description['image'], repertoire)
+    if 'fichier' in description:
+        description['fichier'] = os.path.join(repertoire, description['fichier'])
+    return CONSTRUCTEURS[nom](**description)
+
+def lit_descriptions(fichier):
+    "La liste des dessins décrits dans un fichier JSON ou YAML"
+    with open(fichier) as f:
+        if fichier.endswith(('.yaml', '.yml')):
+            import yaml # seulement pour ces fichiers-là: il n'est pas toujours installé
+            contenu = yaml.safe_load(f)
+        else:
+            contenu = json.load(f)
+    return contenu if isinstance(contenu, list) else [contenu]
+
+def dessine(dessin, repertoire_des_scenes, repertoire_des_images):
+    "Fait un dessin et le sauve; le résultat est le nom du fichier"
+    sortie = os.path.join(repertoire_des_images, dessin['sortie'])
+    premier_jet.sauve(sortie, construit(dessin['image'], repertoire_des_scenes),
+                      dessin['coin_1'], dessin['coin_2'], dessin['pixels_par_unite'])
+    return sortie
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description='Dessine les images décrites dans des fichiers JSON ou YAML')
+    arguments.add_argument('scenes', nargs='+', help='fichiers de description')
+    arguments.add_argument('--repertoire', default=None,
+                           help='où écrire les images (par défaut, à côté de leur description)')
+    options = arguments.parse_args()
+    debut = time.perf_counter()
+    dessins = 0
+    erreurs = 0
+    for fichier in options.scenes:
+        repertoire_des_scenes = os.path.dirname(fichier)
+        repertoire_des_images = options.repertoire or repertoire_des_scenes
+        os.makedirs(repertoire_des_images or '.', exist_ok=True)
+        try:
+            for dessin in lit_descriptions(fichier):
+                dessine(dessin, repertoire_des_scenes, repertoire_des_images)
+                dessins += 1
+        except (OSError, ValueError, KeyError, TypeError) as erreur:
+            # une description fausse ne doit pas arrêter les autres
+            print(f'{fichier}: {erreur!r}', file=sys.stderr)
+            erreurs += 1
+    print(f'{dessins} images en {time.perf_counter() - debut:.1f} s, {erreurs} fichiers avec des erreurs')
+    sys.exit(1 if erreurs else 0)
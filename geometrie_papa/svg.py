@@ -0,0 +1,321 @@
+import base64
+import math
+import os
+
+from premier_jet import projette, png_en_octets
+
+# Exporter une image en SVG (un dessin "vectoriel": des lignes, des cercles,
+# etc. plutôt que des pixels).
+#
+# Les images de premier_jet.py sont des fonctions: on ne peut que leur
+# demander la couleur d'un point.  Mais chaque fonction qui construit une
+# image note comment elle l'a construite (cf. decrit): p.ex. une rotation de
+# 30 degrés d'un disque de rayon 2.  Nous parcourons cet "arbre" et écrivons
+# pour chaque noeud l'élément SVG équivalent:
+#
+#    ligne, segment, polygone, ...  -> <path> (un polygone)
+#    cercle, disque                 -> <circle>
+#    translation, rotation, ...     -> <g transform="matrix(...)">
+#    decoupe_...                    -> <clipPath>
+#    pavage_parallelogramme         -> <pattern>
+#    image_pixelisee                -> <image> (le fichier lui-même)
+#
+# Les autres images (p.ex. comprime_dans_un_cercle, ou une fonction écrite à
+# la main) deviennent des pixels, mais seulement pour la partie visible, à la
+# résolution demandée.  Le reste du dessin ne dépend pas de la résolution:
+# le fichier est aussi petit (et aussi vite écrit) pour une affiche que pour
+# une vignette.
+#
+# Différence avec projette: superpose mélange des images transparentes en
+# faisant une moyenne, SVG les peint l'une sur l'autre.  Pour des images
+# opaques, ou qui ne se recouvrent pas, c'est exactement la même chose.
+
+# Une transformation affine est (a, b, c, d, e, f), comme dans SVG:
+# le point (x, y) devient (a * x + c * y + e, b * x + d * y + f)
+IDENTITE = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+def compose(m1, m2):
+    "La transformation qui fait d'abord m2, puis m1"
+    (a1, b1, c1, d1, e1, f1) = m1
+    (a2, b2, c2, d2, e2, f2) = m2
+    return (a1 * a2 + c1 * b2, b1 * a2 + d1 * b2,
+            a1 * c2 + c1 * d2, b1 * c2 + d1 * d2,
+            a1 * e2 + c1 * f2 + e1, b1 * e2 + d1 * f2 + f1)
+
+def inverse(m):
+    "La transformation qui défait m"
+    (a, b, c, d, e, f) = m
+    det = a * d - b * c
+    return (d / det, -b / det, -c / det, a / det, (c * f - d * e) / det, (b * e - a * f) / det)
+
+def applique(m, point):
+    (a, b, c, d, e, f) = m
+    return (a * point[0] + c * point[1] + e, b * point[0] + d * point[1] + f)
+
+def boite_transformee(m, boite):
+    "Le plus petit rectangle qui contient le rectangle `boite' transformé par m"
+    coins = [applique(m, (x, y)) for x in (boite[0][0], boite[1][0]) for y in (boite[0][1], boite[1][1])]
+    return [[min(x for (x, _) in coins), min(y for (_, y) in coins)],
+            [max(x for (x, _) in coins), max(y for (_, y) in coins)]]
+
+def intersection(boite_1, boite_2):
+    "La partie commune de deux rectangles (None s'il n'y en a pas)"
+    boite = [[max(boite_1[0][0], boite_2[0][0]), max(boite_1[0][1], boite_2[0][1])],
+             [min(boite_1[1][0], boite_2[1][0]), min(boite_1[1][1], boite_2[1][1])]]
+    if boite[0][0] >= boite[1][0] or boite[0][1] >= boite[1][1]:
+        return None
+    return boite
+
+def matrice(noeud):
+    "La transformation qui envoie les points de l'enfant sur ceux de l'image (cf. translation, ...)"
+    p = noeud['parametres']
+    if noeud['nom'] == 'translation':
+        return (1.0, 0.0, 0.0, 1.0, p['v'][0], p['v'][1])
+    if noeud['nom'] == 'rotation':
+        c = math.cos(math.pi * p['angle_degres'] / 180)
+        s = math.sin(math.pi * p['angle_degres'] / 180)
+        return (c, s, -s, c, p['cx'] - c * p['cx'] + s * p['cy'], p['cy'] - s * p['cx'] - c * p['cy'])
+    # homothetie
+    f = p['facteur']
+    return (f, 0.0, 0.0, f, p['centre'][0] * (1 - f), p['centre'][1] * (1 - f))
+
+def nombre(x):
+    "Un nombre écrit assez court pour SVG"
+    return f'{float(x):.6g}'
+
+def couleur(rgba, quoi='fill'):
+    "Les attributs SVG pour une couleur [rouge, vert, bleu, opacité] (de 0 à 1)"
+    (r, v, b) = (min(255, max(0, round(255 * float(composante)))) for composante in rgba[:3])
+    return f'{quoi}="#{r:02x}{v:02x}{b:02x}" {quoi}-opacity="{nombre(rgba[3])}"'
+
+def chemin(points):
+    "Un polygone fermé pour l'attribut d de <path>"
+    return 'M' + ' L'.join(f'{nombre(x)} {nombre(y)}' for (x, y) in points) + ' Z'
+
+def aire(points):
+    "L'aire du polygone, positive si les coins tournent dans le sens inverse des aiguilles d'une montre"
+    return sum(x1 * y2 - x2 * y1 for ((x1, y1), (x2, y2)) in zip(points, points[1:] + points[:1])) / 2
+
+def coupe(points, boite):
+    """La partie du polygone convexe `points' qui est dans le rectangle `boite'
+
+    (algorithme de Sutherland-Hodgman: on coupe par chaque bord l'un après l'autre)"""
+    for (axe, limite, garde_dessous) in [(0, boite[0][0], False), (0, boite[1][0], True),
+                                         (1, boite[0][1], False), (1, boite[1][1], True)]:
+        def dedans(p):
+            return p[axe] <= limite if garde_dessous else p[axe] >= limite
+        resultat = []
+        for (p, q) in zip(points, points[1:] + points[:1]):
+            if dedans(p):
+                resultat.append(p)
+            if dedans(p) != dedans(q):
+                t = (limite - p[axe]) / (q[axe] - p[axe])
+                resultat.append((p[0] + t * (q[0] - p[0]), p[1] + t * (q[1] - p[1])))
+        points = resultat
+        if not points:
+            break
+    return points
+
+def bande(point_1, point_2, epaisseur, debut, fin):
+    "Le rectangle autour de la droite point_1-point_2, de `debut' à `fin' le long de la droite"
+    dx = point_2[0] - point_1[0]
+    dy = point_2[1] - point_1[1]
+    longueur = math.sqrt(dx * dx + dy * dy)
+    (dx, dy) = (dx / longueur, dy / longueur)
+    h = epaisseur / 2.0
+    return [(point_1[0] + t * dx - s * h * dy, point_1[1] + t * dy + s * h * dx)
+            for (t, s) in [(debut, -1), (fin, -1), (fin, 1), (debut, 1)]]
+
+def polygone_du_segment(p, visible, est_un_segment):
+    "La zone couverte par segment(...) (ou ligne(...) si pas `est_un_segment'), limitée à ce qui est visible"
+    (point_1, point_2) = (p['point_1'], p['point_2'])
+    dx = point_2[0] - point_1[0]
+    dy = point_2[1] - point_1[1]
+    longueur = math.sqrt(dx * dx + dy * dy)
+    h = p['epaisseur'] / 2.0
+    if est_un_segment:
+        # comme dans segment(): un peu plus long que le segment, et coupé
+        # par le rectangle autour des deux points
+        points = bande(point_1, point_2, p['epaisseur'], -h, longueur + h)
+        boite = [[min(point_1[0], point_2[0]) - h, min(point_1[1], point_2[1]) - h],
+                 [max(point_1[0], point_2[0]) + h, max(point_1[1], point_2[1]) + h]]
+        boite = intersection(boite, visible)
+        return coupe(points, boite) if boite is not None else []
+    # une ligne est infinie: elle s'arrête au bord de ce qui est visible
+    positions = [((x - point_1[0]) * dx + (y - point_1[1]) * dy) / longueur
+                 for x in (visible[0][0], visible[1][0]) for y in (visible[0][1], visible[1][1])]
+    return coupe(bande(point_1, point_2, p['epaisseur'], min(positions) - h, max(positions) + h), visible)
+
+def contour(noeud):
+    "Le bord d'une découpe (cf. decoupe_rectangulaire, ...) pour l'attribut d de <path>"
+    p = noeud['parametres']
+    if noeud['nom'] == 'decoupe_rectangulaire' or noeud['nom'] == 'image_pixelisee':
+        ((x1, y1), (x2, y2)) = (p['coin_1'], p['coin_2'])
+        return chemin([(x1, y1), (x2, y1), (x2, y2), (x1, y2)])
+    if noeud['nom'] == 'decoupe_polygone_convexe':
+        return chemin(p['coins'])
+    # decoupe_circulaire: deux demi-cercles
+    ((cx, cy), r) = (p['centre'], p['rayon'])
+    return (f'M{nombre(cx - r)} {nombre(cy)} A{nombre(r)} {nombre(r)} 0 1 0 {nombre(cx + r)} {nombre(cy)} '
+            f'A{nombre(r)} {nombre(r)} 0 1 0 {nombre(cx - r)} {nombre(cy)} Z')
+
+def boite_du_contour(noeud):
+    "Le rectangle autour d'une découpe"
+    p = noeud['parametres']
+    if noeud['nom'] == 'decoupe_polygone_convexe':
+        return [[min(x for (x, _) in p['coins']), min(y for (_, y) in p['coins'])],
+                [max(x for (x, _) in p['coins']), max(y for (_, y) in p['coins'])]]
+    if noeud['nom'] == 'decoupe_circulaire':
+        ((cx, cy), r) = (p['centre'], p['rayon'])
+        return [[cx - r, cy - r], [cx + r, cy + r]]
+    ((x1, y1), (x2, y2)) = (p['coin_1'], p['coin_2'])
+    return [[min(x1, x2), min(y1, y2)], [max(x1, x2), max(y1, y2)]]
+
+def autour(noeud, visible):
+    "Peint couleur_autour partout sauf dans la découpe (rien si elle est transparente)"
+    couleur_autour = noeud['parametres']['couleur_autour']
+    if couleur_autour[3] <= 0:
+        return ''
+    # evenodd: ce qui est à l'intérieur des deux contours n'est pas peint
+    ((x1, y1), (x2, y2)) = visible
+    return (f'<path fill-rule="evenodd" {couleur(couleur_autour)} '
+            f'd="{chemin([(x1, y1), (x2, y1), (x2, y2), (x1, y2)])} {contour(noeud)}"/>')
+
+# les images que nous savons dessiner sans pixels (si leurs enfants le sont
+# aussi)
+VECTORIELLES = ['image_vide', 'superpose', 'translation', 'rotation', 'homothetie',
+                'decoupe_rectangulaire', 'decoupe_polygone_convexe', 'decoupe_circulaire',
+                'ligne', 'segment', 'multi_segments', 'cercle', 'disque', 'pavage_parallelogramme']
+
+def vectorielle(image):
+    "Vrai si toute l'image peut être dessinée sans pixels"
+    noeud = getattr(image, 'noeud', None)
+    return (noeud is not None and noeud['nom'] in VECTORIELLES
+            and all(vectorielle(enfant) for enfant in noeud['enfants']))
+
+def nouvel_identifiant(contexte):
+    contexte['numero'] += 1
+    return f'g{contexte["numero"]}'
+
+def image_svg(x1, y1, x2, y2, type_mime, octets, attributs=''):
+    """Un <image> qui remplit le rectangle (x1, y1)-(x2, y2)
+
+    La première rangée de pixels est en haut (y le plus grand): comme tout le
+    dessin est retourné (cf. svg), il faut retourner l'image aussi."""
+    return (f'<image x="{nombre(x1)}" y="{nombre(-y2)}" width="{nombre(x2 - x1)}" height="{nombre(y2 - y1)}" '
+            f'transform="scale(1 -1)" preserveAspectRatio="none" {attributs}'
+            f'xlink:href="data:{type_mime};base64,{base64.b64encode(octets).decode("ascii")}"/>')
+
+def en_pixels(image, contexte, visible, m):
+    "La partie visible de l'image, en pixels, à la même résolution que projette l'aurait fait"
+    (a, b, c, d, _, _) = m
+    # un carré de côté 1 de l'image a une surface |ad - bc| dans le dessin
+    pixels_par_unite = contexte['pixels_par_unite'] * math.sqrt(abs(a * d - b * c))
+    if round((visible[1][0] - visible[0][0]) * pixels_par_unite) < 1 or \
+       round((visible[1][1] - visible[0][1]) * pixels_par_unite) < 1:
+        return ''
+    data = projette(image, visible[0], visible[1], pixels_par_unite)
+    (hauteur_px, largeur_px) = data.shape[:2]
+    return image_svg(visible[0][0], visible[1][1] - hauteur_px / pixels_par_unite,
+                     visible[0][0] + largeur_px / pixels_par_unite, visible[1][1],
+                     'image/png', png_en_octets(data))
+
+TYPES_MIME = {'.png': 'image/png', '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.gif': 'image/gif'}
+
+def dessine(image, contexte, visible, m):
+    """Les éléments SVG pour l'image
+
+    `visible' est le rectangle (dans les coordonnées de l'image) qui peut
+    apparaître dans le dessin et `m' la transformation des coordonnées de
+    l'image vers celles du dessin."""
+    noeud = getattr(image, 'noeud', None)
+    if noeud is None:
+        return en_pixels(image, contexte, visible, m)
+    nom = noeud['nom']
+    p = noeud['parametres']
+    enfants = noeud['enfants']
+    if nom == 'image_vide':
+        return ''
+    if nom == 'superpose':
+        # la première image est au-dessus, donc dessinée en dernier
+        return ''.join(dessine(enfant, contexte, visible, m) for enfant in reversed(enfants))
+    if nom in ['translation', 'rotation', 'homothetie']:
+        transformation = matrice(noeud)
+        contenu = dessine(enfants[0], contexte, boite_transformee(inverse(transformation), visible),
+                          compose(m, transformation))
+        return f'<g transform="matrix({" ".join(nombre(x) for x in transformation)})">{contenu}</g>'
+    if nom in ['decoupe_rectangulaire', 'decoupe_polygone_convexe', 'decoupe_circulaire']:
+        dedans = intersection(visible, boite_du_contour(noeud))
+        contenu = dessine(enfants[0], contexte, dedans, m) if dedans is not None else ''
+        identifiant = nouvel_identifiant(contexte)
+        return (autour(noeud, visible)
+                + f'<clipPath id="{identifiant}"><path d="{contour(noeud)}"/></clipPath>'
+                + f'<g clip-path="url(#{identifiant})">{contenu}</g>')
+    if nom in ['ligne', 'segment']:
+        points = polygone_du_segment(p, visible, nom == 'segment')
+        return f'<path {couleur(p["rgba"])} d="{chemin(points)}"/>' if points else ''
+    if nom == 'multi_segments':
+        # un seul <path> pour que les segments qui se croisent ne soient pas
+        # peints deux fois (c'est visible s'ils sont transparents); tous les
+        # polygones tournent dans le même sens pour que leur union soit peinte
+        morceaux = []
+        for enfant in enfants:
+            points = polygone_du_segment(enfant.noeud['parametres'], visible, True)
+            if points:
+                morceaux.append(chemin(points if aire(points) > 0 else points[::-1]))
+        return f'<path {couleur(p["rgba"])} d="{" ".join(morceaux)}"/>' if morceaux else ''
+    if nom == 'cercle':
+        return (f'<circle cx="{nombre(p["centre"][0])}" cy="{nombre(p["centre"][1])}" r="{nombre(p["rayon"])}" '
+                f'fill="none" stroke-width="{nombre(p["epaisseur"])}" {couleur(p["rgba"], "stroke")}/>')
+    if nom == 'disque':
+        return (f'<circle cx="{nombre(p["centre"][0])}" cy="{nombre(p["centre"][1])}" r="{nombre(p["rayon"])}" '
+                f'{couleur(p["rgba"])}/>')
+    if nom == 'pavage_parallelogramme' and vectorielle(enfants[0]):
+        (c1, c2, c3) = (p['coin_1'], p['coin_2'], p['coin_3'])
+        v1 = (c2[0] - c1[0], c2[1] - c1[1])
+        v2 = (c3[0] - c1[0], c3[1] - c1[1])
+        if abs(v1[0] * v2[1] - v1[1] * v2[0]) < 1e-6:
+            return ''
+        # le motif est un carré de côté 1, transformé en parallélogramme
+        tuile = (v1[0], v1[1], v2[0], v2[1], c1[0], c1[1])
+        # l'enfant n'est regardé qu'à l'intérieur du parallélogramme
+        dans_la_tuile = boite_transformee(tuile, [[0, 0], [1, 1]])
+        contenu = dessine(enfants[0], contexte, dans_la_tuile, m)
+        identifiant = nouvel_identifiant(contexte)
+        ((x1, y1), (x2, y2)) = visible
+        return (f'<pattern id="{identifiant}" patternUnits="userSpaceOnUse" width="1" height="1" '
+                f'patternTransform="matrix({" ".join(nombre(x) for x in tuile)})">'
+                f'<g transform="matrix({" ".join(nombre(x) for x in inverse(tuile))})">{contenu}</g></pattern>'
+                f'<path fill="url(#{identifiant})" d="{chemin([(x1, y1), (x2, y1), (x2, y2), (x1, y2)])}"/>')
+    if nom == 'image_pixelisee':
+        type_mime = TYPES_MIME.get(os.path.splitext(p['fichier'])[1].lower())
+        if type_mime is not None:
+            # le fichier lui-même, sans le transformer en tableau de pixels
+            # (la transparence du fichier est gardée, celle de `opacite' aussi)
+            with open(p['fichier'], 'rb') as f:
+                octets = f.read()
+            ((x1, y1), (x2, y2)) = boite_du_contour(noeud)
+            return autour(noeud, visible) + image_svg(x1, y1, x2, y2, type_mime, octets,
+                                                      f'opacity="{nombre(p["opacite"])}" ')
+    # pas d'équivalent SVG: des pixels
+    return en_pixels(image, contexte, visible, m)
+
+def svg(image, coin_1, coin_2, pixels_par_unite):
+    "Le texte SVG de la partie de l'image limitée au rectangle défini par les coins (cf. projette)"
+    visible = [[min(coin_1[0], coin_2[0]), min(coin_1[1], coin_2[1])],
+               [max(coin_1[0], coin_2[0]), max(coin_1[1], coin_2[1])]]
+    largeur = visible[1][0] - visible[0][0]
+    hauteur = visible[1][1] - visible[0][1]
+    contexte = {'pixels_par_unite': pixels_par_unite, 'numero': 0}
+    contenu = dessine(image, contexte, visible, IDENTITE)
+    # En SVG, y va vers le bas; dans nos images, vers le haut: tout le dessin
+    # est retourné par scale(1 -1).
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+            f'width="{round(largeur * pixels_par_unite)}" height="{round(hauteur * pixels_par_unite)}" '
+            f'viewBox="{nombre(visible[0][0])} {nombre(-visible[1][1])} {nombre(largeur)} {nombre(hauteur)}">'
+            f'<g transform="scale(1 -1)">{contenu}</g></svg>\n')
+
+def sauve_svg(fichier, image, coin_1, coin_2, pixels_par_unite):
+    "Sauve la partie l'image limitée au rectangle défini par les coins dans un fichier SVG"
+    with open(fichier, 'w') as f:
+        f.write(svg(image, coin_1, coin_2, pixels_par_unite))
@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+import base64
+import math
+import random
+import struct
+import xml.etree.ElementTree as ET
+import zlib
+
+import numpy as np
+
+from premier_jet import *
+import svg
+
+# Ces tests automatiques vérifient le cache de projette (cf. CACHE_DE_PIXELS)
+# et l'export SVG (cf. svg.py), comme demineur_papa/test.py vérifie le
+# démineur: si quelque chose casse, une exception dit quoi.
+
+def verifie(obtenu, attendu, s):
+    if obtenu == attendu:
+        return True
+    else:
+        raise Exception(f"{s}: j'ai eu {obtenu}, j'attendais {attendu}")
+
+def scene():
+    "Une petite image entièrement décrite (elle a donc une empreinte)"
+    return superpose(disque([0.2, 0.1], 0.5, [1.0, 0.0, 0.0, 0.8]),
+                     segment([-0.8, -0.6], [0.7, 0.4], 0.2, [0.0, 0.0, 1.0, 1.0]),
+                     decoupe_circulaire(opaque(cercle([0, 0], 0.6, 0.1, [0.0, 1.0, 0.0, 0.5])), [0, 0], 0.9))
+
+def cache_tout_neuf(octets_maximum=256 * 1024 * 1024):
+    "Chaque test commence avec un cache vide (de la taille par défaut)"
+    configure_cache(octets_maximum=octets_maximum)
+    vide_cache()
+
+def test_cache_sans_cache():
+    # la même image, projetée sans cache, puis avec (la deuxième fois, elle
+    # vient du cache): toujours exactement les mêmes pixels
+    cache_tout_neuf(octets_maximum=0)
+    sans_cache = projette(scene(), [-1, -1], [1, 1], 8)
+    verifie(len(CACHE_DE_PIXELS['pixels']), 0, "erreur: configure_cache(octets_maximum=0) garde des pixels")
+    configure_cache(octets_maximum=256 * 1024 * 1024)
+    trouves = CACHE_DE_PIXELS['trouves']
+    premiere_fois = projette(scene(), [-1, -1], [1, 1], 8)
+    deuxieme_fois = projette(scene(), [-1, -1], [1, 1], 8)
+    verifie(CACHE_DE_PIXELS['trouves'], trouves + 1, "erreur: la deuxième projection n'est pas venue du cache")
+    verifie(np.array_equal(premiere_fois, sans_cache), True, "erreur dans projette avec le cache")
+    verifie(np.array_equal(deuxieme_fois, sans_cache), True, "erreur dans les pixels venus du cache")
+    # le résultat est une copie: le modifier ne change pas le cache
+    deuxieme_fois[:] = 0
+    verifie(np.array_equal(projette(scene(), [-1, -1], [1, 1], 8), sans_cache), True,
+            "erreur: modifier le résultat de projette a changé le cache")
+
+def test_grille_decalee():
+    cache_tout_neuf()
+    logo = disque([0, 0], 0.5, [1.0, 0.5, 0.0, 1.0])
+    projette(logo, [-1, -1], [1, 1], 8)
+    texte = superpose(segment([-1, 0], [1, 0], 0.1, [0.0, 0.0, 0.0, 1.0]), logo)
+    # un rectangle décalé d'un nombre entier de pixels: les pixels du logo
+    # tombent juste et sont relus ...
+    bbox = ((-0.75, -1.0), (0.5, 0.75))
+    verifie(reutilise_les_pixels(texte, bbox, 8) is texte, False,
+            "erreur: les pixels du logo ne sont pas réutilisés sur la même grille")
+    # ... mais décalé d'une fraction de pixel, ils ne tombent plus juste et
+    # ne doivent pas être réutilisés
+    bbox_decalee = ((-0.75 + 1 / 32, -1.0), (0.5 + 1 / 32, 0.75))
+    verifie(reutilise_les_pixels(texte, bbox_decalee, 8) is texte, True,
+            "erreur: les pixels du logo sont réutilisés sur une grille décalée")
+    verifie(reutilise_les_pixels(texte, bbox, 16) is texte, True,
+            "erreur: les pixels du logo sont réutilisés à une autre résolution")
+    # dans les deux cas, le résultat est celui d'une projection sans cache
+    for (gauche_bas, droite_haut) in [bbox, bbox_decalee]:
+        verifie(np.array_equal(projette(texte, gauche_bas, droite_haut, 8),
+                               projette_sans_cache(texte, (gauche_bas, droite_haut), 8)), True,
+                f"erreur dans projette(texte, {gauche_bas}, {droite_haut}, 8)")
+
+def test_cache_plein():
+    # de la place pour deux projections de 8x8 pixels seulement
+    octets = 8 * 8 * 4 * 8
+    cache_tout_neuf(octets_maximum=2 * octets)
+    images = [disque([0, 0], 0.1 * (i + 1), [1.0, 0.0, 0.0, 1.0]) for i in range(3)]
+    for image in images[:2]:
+        projette(image, [0, 0], [1, 1], 8)
+    # la première redevient la plus récente: c'est la deuxième qui sera
+    # oubliée pour faire de la place à la troisième
+    projette(images[0], [0, 0], [1, 1], 8)
+    projette(images[2], [0, 0], [1, 1], 8)
+    verifie([cle[0] for cle in CACHE_DE_PIXELS['pixels']], [empreinte(images[0]), empreinte(images[2])],
+            "erreur dans l'ordre des pixels gardés")
+    verifie(CACHE_DE_PIXELS['octets'], 2 * octets, "erreur dans le nombre d'octets gardés")
+    verifie(CACHE_DE_PIXELS['par_empreinte'].get(empreinte(images[1]), set()), set(),
+            "erreur: par_empreinte connaît encore des pixels oubliés")
+    verifie(sorted(cle for cles in CACHE_DE_PIXELS['par_empreinte'].values() for cle in cles),
+            sorted(CACHE_DE_PIXELS['pixels']), "erreur: par_empreinte et pixels ne correspondent plus")
+    # des pixels oubliés ne sont plus réutilisés
+    verifie(reutilise_les_pixels(superpose(images[1]), ((0, 0), (1, 1)), 8).noeud['enfants'][0] is images[1],
+            True, "erreur: des pixels oubliés sont réutilisés")
+    # rien n'est plus gardé avec une taille de 0
+    configure_cache(octets_maximum=0)
+    verifie((len(CACHE_DE_PIXELS['pixels']), CACHE_DE_PIXELS['octets']), (0, 0),
+            "erreur dans configure_cache(octets_maximum=0)")
+    verifie([cle for cles in CACHE_DE_PIXELS['par_empreinte'].values() for cle in cles], [],
+            "erreur: par_empreinte connaît encore des pixels oubliés")
+
+def test_parametres_figes():
+    # les listes passées à une image sont copiées: les modifier ensuite ne
+    # change ni l'image ni son empreinte
+    cache_tout_neuf()
+    rouge = [1.0, 0.0, 0.0, 1.0]
+    centre = [0, 0]
+    image = disque(centre, 0.5, rouge)
+    avant = empreinte(image)
+    pixels_avant = projette(image, [-1, -1], [1, 1], 4)
+    rouge[1] = 1.0
+    centre[0] = 0.5
+    verifie(empreinte(image), avant, "erreur: l'empreinte a changé avec la liste de l'appelant")
+    verifie(list(image(0, 0)), [1.0, 0.0, 0.0, 1.0], "erreur: l'image a changé avec la liste de l'appelant")
+    verifie(np.array_equal(projette_sans_cache(image, ((-1, -1), (1, 1)), 4), pixels_avant), True,
+            "erreur: les pixels ont changé avec les listes de l'appelant")
+    # une nouvelle image avec les listes modifiées est une autre image
+    verifie(empreinte(disque(centre, 0.5, rouge)) == avant, False,
+            "erreur: deux images différentes ont la même empreinte")
+    verifie(empreinte(disque((0.5, 0), 0.5, (1.0, 1.0, 0.0, 1.0))), empreinte(disque(centre, 0.5, rouge)),
+            "erreur: une liste et un tuple égaux donnent deux empreintes")
+
+SVG = '{http://www.w3.org/2000/svg}'
+
+def lit_svg(image, coin_1, coin_2, pixels_par_unite):
+    "Le dessin SVG de l'image, lu comme du XML (une exception s'il est mal formé)"
+    return ET.fromstring(svg.svg(image, coin_1, coin_2, pixels_par_unite))
+
+def elements(racine, nom):
+    return list(racine.iter(SVG + nom))
+
+def test_svg_xml():
+    cache_tout_neuf()
+    dessin = superpose(
+        rotation(polygone_regulier([0, 0], 0.5, 5, 0.05, [0.0, 0.0, 1.0, 1.0]), 30, 0.1, 0.2),
+        translation(homothetie(disque([0, 0], 0.2, [1.0, 0.0, 0.0, 0.5]), [0, 0], 1.5), [0.3, -0.3]),
+        decoupe_circulaire(cercle([0, 0], 0.6, 0.1, [0.0, 1.0, 0.0, 1.0]), [0.2, 0], 0.5, [1.0, 1.0, 0.0, 1.0]),
+        decoupe_polygone_convexe(ligne([-1, -1], [1, 1], 0.1, [0.0, 0.0, 0.0, 1.0]), [[0, 0], [1, 0], [0, 1]]),
+        pavage_parallelogramme(disque([0.1, 0.1], 0.05, [0.5, 0.5, 0.5, 1.0]), [0, 0], [0.2, 0], [0, 0.2]))
+    racine = lit_svg(dessin, [-1, -1], [1, 1], 16)
+    verifie(racine.tag, SVG + 'svg', "erreur: le dessin n'est pas un <svg>")
+    verifie((racine.get('width'), racine.get('height')), ('32', '32'), "erreur dans la taille du dessin")
+    verifie(len(elements(racine, 'circle')), 3, "erreur dans le nombre de <circle>")
+    verifie(len(elements(racine, 'clipPath')), 2, "erreur dans le nombre de <clipPath>")
+    verifie(len(elements(racine, 'pattern')), 1, "erreur dans le nombre de <pattern>")
+    # tout est vectoriel: aucun pixel
+    verifie(elements(racine, 'image'), [], "erreur: une image vectorielle a été transformée en pixels")
+    # chaque clip-path et chaque fill="url(#...)" renvoie à un identifiant du dessin
+    identifiants = set(element.get('id') for element in racine.iter() if element.get('id') is not None)
+    for element in racine.iter():
+        for attribut in ['clip-path', 'fill']:
+            valeur = element.get(attribut, '')
+            if valeur.startswith('url(#'):
+                verifie(valeur[len('url(#'):-1] in identifiants, True, f"erreur: {valeur} n'existe pas")
+
+def pixels_du_svg(element):
+    "Le tableau (rangées, colonnes) du PNG d'un <image> (cf. png_en_octets)"
+    octets = base64.b64decode(element.get('{http://www.w3.org/1999/xlink}href').split(',', 1)[1])
+    verifie(octets[:8], b'\x89PNG\r\n\x1a\n', "erreur: l'<image> n'est pas un PNG")
+    (largeur, hauteur) = (int.from_bytes(octets[16:20], 'big'), int.from_bytes(octets[20:24], 'big'))
+    return (hauteur, largeur)
+
+def test_svg_pixels():
+    # les images sans équivalent SVG deviennent des pixels, seulement pour la
+    # partie visible et à la résolution demandée
+    cache_tout_neuf()
+    disque_rouge = disque([0, 0], 0.5, [1.0, 0.0, 0.0, 1.0])
+    for (nom, image) in [('comprime_dans_un_cercle', comprime_dans_un_cercle(disque_rouge, 1)),
+                         ('instances', instances(disque_rouge, [-0.5, -0.5], [0.5, 0.5],
+                                                 [([0.2, 0.1], 30, 0.5), ([-0.3, 0], 0, 1)], 8)),
+                         ('opaque', opaque(disque_rouge, 0.5)),
+                         ('im1', im1)]:
+        racine = lit_svg(image, [-1, -1], [1, 0.5], 8)
+        images = elements(racine, 'image')
+        verifie(len(images), 1, f"erreur dans le nombre de <image> pour {nom}")
+        verifie(pixels_du_svg(images[0]), (12, 16), f"erreur dans la taille des pixels pour {nom}")
+        verifie((float(images[0].get('width')), float(images[0].get('height'))), (2.0, 1.5),
+                f"erreur dans la taille de l'<image> pour {nom}")
+    # une rotation agrandie: plus de pixels par unité de l'image tournée
+    racine = lit_svg(homothetie(opaque(disque_rouge), [0, 0], 2), [-1, -1], [1, 1], 8)
+    verifie(pixels_du_svg(elements(racine, 'image')[0]), (16, 16),
+            "erreur dans la résolution des pixels sous une homothetie")
+    # une découpe ne transforme en pixels que ce qui est dedans
+    racine = lit_svg(decoupe_rectangulaire(im1, [0, 0], [0.5, 0.25]), [-1, -1], [1, 1], 8)
+    verifie(pixels_du_svg(elements(racine, 'image')[0]), (2, 4), "erreur dans les pixels d'une découpe")
+
+def test_svg_matrice():
+    # matrice(noeud) envoie les points de l'enfant sur ceux de l'image: la
+    # fonction de l'image doit donc demander à l'enfant le point
+    # applique(inverse(matrice(noeud)), (x, y))
+    hasard = random.Random(0)
+    def position(x, y):
+        "Une image dont la couleur est le point demandé"
+        return [x, y, 0.0, 1.0]
+    for _ in range(50):
+        centre = [hasard.uniform(-5, 5), hasard.uniform(-5, 5)]
+        for image in [rotation(position, hasard.uniform(-360, 360), *centre),
+                      homothetie(position, centre, hasard.choice([-1, 1]) * hasard.uniform(0.1, 10)),
+                      translation(position, centre)]:
+            m = svg.matrice(image.noeud)
+            for _ in range(5):
+                point = (hasard.uniform(-10, 10), hasard.uniform(-10, 10))
+                demande = image(*point)[:2]
+                attendu = svg.applique(svg.inverse(m), point)
+                verifie(all(abs(a - b) < 1e-9 for (a, b) in zip(demande, attendu)), True,
+                        f"erreur dans matrice({image.noeud['nom']}): {demande} au lieu de {attendu}")
+                retour = svg.applique(m, demande)
+                verifie(all(abs(a - b) < 1e-9 for (a, b) in zip(retour, point)), True,
+                        f"erreur dans matrice({image.noeud['nom']}): {retour} au lieu de {point}")
+
+def test_instances():
+    # instances donne (aux pixels près) la même image que les copies faites
+    # une à une avec superpose, translation, rotation et homothetie
+    cache_tout_neuf()
+    def degrade(x, y):
+        return [(x + 1) / 2, (y + 1) / 2, 0.5, 0.6]
+    (coin_1, coin_2) = ([-1, -0.5], [1, 0.5])
+    hasard = random.Random(1)
+    placements = [([hasard.uniform(-2, 2), hasard.uniform(-2, 2)], hasard.uniform(-180, 180),
+                   hasard.choice([-1, 1]) * hasard.uniform(0.3, 2))
+                  for _ in range(8)]
+    pixels_par_unite = 16
+    rapide = instances(degrade, coin_1, coin_2, placements, pixels_par_unite)
+    une_a_une = superpose(*[translation(rotation(homothetie(decoupe_rectangulaire(degrade, coin_1, coin_2),
+                                                           [0, 0], facteur),
+                                                 angle_degres),
+                                        v)
+                            for (v, angle_degres, facteur) in placements])
+    # la taille d'un pixel de l'image d'origine (cf. instances)
+    pixel = 1 / (pixels_par_unite * max(abs(facteur) for (_, _, facteur) in placements))
+    def pres_d_un_bord(x, y):
+        "Vrai si le point est à moins de 2 pixels du bord d'une copie"
+        for (v, angle_degres, facteur) in placements:
+            (c, s) = (math.cos(math.pi * angle_degres / 180), math.sin(math.pi * angle_degres / 180))
+            (dx, dy) = ((x - v[0]) / facteur, (y - v[1]) / facteur)
+            (ox, oy) = (c * dx + s * dy, -s * dx + c * dy)
+            if min(abs(ox - coin_1[0]), abs(ox - coin_2[0]), abs(oy - coin_1[1]), abs(oy - coin_2[1])) < 2 * pixel:
+                return True
+        return False
+    compares = 0
+    for _ in range(1000):
+        point = (hasard.uniform(-4, 4), hasard.uniform(-4, 4))
+        if pres_d_un_bord(*point):
+            # un pixel au bord peut être dedans pour l'une et dehors pour l'autre
+            continue
+        compares += 1
+        (obtenu, attendu) = (rapide(*point), une_a_une(*point))
+        verifie(all(abs(a - b) <= pixel for (a, b) in zip(obtenu, attendu)), True,
+                f"erreur dans instances au point {point}: {obtenu} au lieu de {attendu}")
+    verifie(compares > 500, True, "erreur dans test_instances: trop peu de points comparés")
+    # un facteur nul est refusé tout de suite
+    try:
+        instances(degrade, coin_1, coin_2, [([0, 0], 0, 1), ([1, 1], 30, 0)], pixels_par_unite)
+        verifie('instances accepte un facteur nul', 'ValueError', "erreur dans instances(..., facteur=0)")
+    except ValueError:
+        pass
+
+def test_png_en_octets():
+    # le PNG se relit avec zlib seul: des morceaux au CRC juste, et les
+    # pixels de projette arrondis à 8 bits
+    cache_tout_neuf()
+    data = projette(scene(), [-1, -1], [1, 0.5], 8)
+    octets = png_en_octets(data)
+    verifie(octets[:8], b'\x89PNG\r\n\x1a\n', "erreur dans la signature du PNG")
+    morceaux = []
+    position = 8
+    while position < len(octets):
+        (longueur, nom) = struct.unpack_from('>I4s', octets, position)
+        contenu = octets[position + 8:position + 8 + longueur]
+        (crc,) = struct.unpack_from('>I', octets, position + 8 + longueur)
+        verifie(crc, zlib.crc32(nom + contenu), f"erreur dans le CRC du morceau {nom}")
+        morceaux.append((nom, contenu))
+        position += 12 + longueur
+    verifie([nom for (nom, _) in morceaux], [b'IHDR', b'IDAT', b'IEND'], "erreur dans les morceaux du PNG")
+    (hauteur, largeur) = data.shape[:2]
+    verifie(struct.unpack('>IIBBBBB', morceaux[0][1]), (largeur, hauteur, 8, 6, 0, 0, 0),
+            "erreur dans l'en-tête IHDR")
+    rangees = np.frombuffer(zlib.decompress(morceaux[1][1]), dtype=np.uint8).reshape(hauteur, 1 + 4 * largeur)
+    verifie(set(rangees[:, 0].tolist()), {0}, "erreur: une rangée du PNG a un filtre")
+    attendu = np.clip(np.round(data * 255), 0, 255).astype(np.uint8)
+    verifie(np.array_equal(rangees[:, 1:].reshape(hauteur, largeur, 4), attendu), True,
+            "erreur dans les pixels du PNG")
+
+def test_rendu():
+    # une scène décrite en JSON (cf. rendu.py) donne exactement les mêmes
+    # pixels que la même scène construite en Python
+    import json
+    import os
+    import tempfile
+    import rendu
+    cache_tout_neuf()
+    description = {
+        'fonction': 'superpose',
+        'images': [{'fonction': 'rotation', 'angle_degres': 30,
+                    'image': {'fonction': 'segment', 'point_1': [-0.8, 0], 'point_2': [0.8, 0],
+                              'epaisseur': 0.1, 'rgba': [0, 0, 1, 1]}},
+                   'image_vide',
+                   {'fonction': 'instances', 'coin_1': [-0.5, -0.5], 'coin_2': [0.5, 0.5],
+                    'placements': [[[0.3, 0.2], 45, 0.5], [[-0.4, -0.1], 0, -0.8]],
+                    'pixels_par_unite': 8,
+                    'image': {'fonction': 'disque', 'centre': [0, 0], 'rayon': 0.4,
+                              'rgba': [1, 0, 0, 0.7]}}]}
+    en_python = superpose(rotation(segment([-0.8, 0], [0.8, 0], 0.1, [0, 0, 1, 1]), 30),
+                          image_vide,
+                          instances(disque([0, 0], 0.4, [1, 0, 0, 0.7]), [-0.5, -0.5], [0.5, 0.5],
+                                    [([0.3, 0.2], 45, 0.5), ([-0.4, -0.1], 0, -0.8)], 8))
+    attendu = projette(en_python, [-1, -1], [1, 1], 8)
+    with tempfile.TemporaryDirectory() as repertoire:
+        fichier = os.path.join(repertoire, 'scene.json')
+        with open(fichier, 'w') as f:
+            json.dump([{'sortie': 'scene.npy', 'coin_1': [-1, -1], 'coin_2': [1, 1],
+                        'pixels_par_unite': 8, 'image': description},
+                       {'sortie': 'vide.npy', 'coin_1': [0, 0], 'coin_2': [1, 1],
+                        'pixels_par_unite': 4, 'image': 'image_vide'}], f)
+        dessins = rendu.lit_descriptions(fichier)
+        verifie(len(dessins), 2, "erreur dans rendu.lit_descriptions")
+        verifie(np.array_equal(projette(rendu.construit(description), [-1, -1], [1, 1], 8), attendu), True,
+                "erreur dans rendu.construit")
+        sorties = [rendu.dessine(dessin, repertoire, repertoire) for dessin in dessins]
+        verifie(np.array_equal(np.load(sorties[0]), attendu), True, "erreur dans rendu.dessine")
+        verifie(np.array_equal(np.load(sorties[1]), projette(image_vide, [0, 0], [1, 1], 4)), True,
+                "erreur dans rendu.dessine('image_vide')")
+
+def tout_tester():
+    test_cache_sans_cache()
+    test_grille_decalee()
+    test_cache_plein()
+    test_parametres_figes()
+    test_svg_xml()
+    test_svg_pixels()
+    test_svg_matrice()
+    test_instances()
+    test_png_en_octets()
+    test_rendu()
+    cache_tout_neuf()
+
+if __name__ == "__main__":
+    tout_tester()
@@ -1,6 +1,12 @@
 # -*- coding: utf-8 -*-
+import bisect
+import collections
+import heapq
+import os
 import random
-from tkinter import (Tk, Canvas, ALL)
+import sys
+import time
+from tkinter import (Tk, Canvas, PhotoImage, ALL)
 
 # Dans les commentaires, l'abbréviation PplK signifie "Python pour les Kids"
 # et renvoit à des explications dans ce livre.
@@ -24,56 +30,216 @@ OBSTACLE = 3 # pour empêcher de sortir du terrain de jeu ou pour marquer les d
 
 TAILLE_CASE = 30 # chaque case est dessinée avec un carré de ... pixels de côté
 
-def nouveau_jeu():
-    "Crée un nouveau terrain de jeu"
+class TerrainIndexe(list):
+    """Un terrain de jeu qui se souvient d'où sont le joueur et les robots
+
+    C'est une liste de rangées comme les autres (terrain[rangee][colonne]
+    fonctionne toujours), avec en plus `position_joueur' (rangée, colonne),
+    `positions_robots', l'ensemble (set) des positions des robots, et
+    `positions_obstacles', celui des obstacles.  Ainsi, joueur() et robots()
+    n'ont plus besoin de parcourir tout le terrain.
+
+    Pour que ces positions restent justes, il faut changer les cases avec
+    change_case() plutôt qu'avec terrain[rangee][colonne] = ....
+
+    change_case() note aussi chaque changement dans un `journal': c'est ce
+    qui permet d'annuler des tours (cf. instantane et annule_tour).  Quand
+    personne n'annulera jamais rien (p.ex. simulation.py), TerrainIndexe(...,
+    journal=False) évite de garder tous les changements de toute la partie."""
+    def __init__(self, tableau, journal=True):
+        super().__init__(tableau) # recopie les rangées (PplK 165)
+        self.position_joueur = None
+        self.positions_robots = set()
+        self.positions_obstacles = set()
+        # augmente chaque fois qu'un obstacle apparaît ou disparaît: on peut
+        # ainsi garder des calculs sur les obstacles d'un tour à l'autre tant
+        # qu'il ne change pas (cf. ia.etat_du_terrain)
+        self.changements_obstacles = 0
+        # ... et les cases où c'est arrivé (sauf en préparant le terrain),
+        # pour ne redessiner que celles-là (cf. montre_les_obstacles)
+        self.cases_obstacles_changees = []
+        self.obstacles_numerotes = None # (changements_obstacles, numéros des obstacles), cf. ia.py
+        # les (départ, arrivée) de chaque robot au dernier tour (cf. bouge_robots)
+        self.mouvements_robots = []
+        # les changements de cases: (rangée, colonne, avant, après), ou None
+        # sans journal
+        self.journal = [] if journal else None
+        # la longueur du journal au début de chaque tour joué ...
+        self.debuts_de_tours = []
+        # ... et les changements des tours annulés, pour pouvoir les refaire
+        self.a_refaire = []
+        # il faut parcourir le terrain une fois, au début
+        for (rangee, ligne) in enumerate(self):
+            if not any(ligne):
+                continue # rangée toute vide (VIDE = 0), rien à noter
+            for (colonne, valeur) in enumerate(ligne):
+                if valeur == JOUEUR:
+                    self.position_joueur = (rangee, colonne)
+                elif valeur == ROBOT:
+                    self.positions_robots.add((rangee, colonne))
+                elif valeur == OBSTACLE:
+                    self.positions_obstacles.add((rangee, colonne))
+
+def change_case(terrain_de_jeu, rangee, colonne, valeur):
+    "Change le contenu d'une case (et tient les positions d'un TerrainIndexe à jour)"
+    ancienne_valeur = terrain_de_jeu[rangee][colonne]
+    terrain_de_jeu[rangee][colonne] = valeur
+    # isinstance(x, T) est vrai si x a été créé avec T(...)
+    if isinstance(terrain_de_jeu, TerrainIndexe):
+        if terrain_de_jeu.journal is not None:
+            terrain_de_jeu.journal.append((rangee, colonne, ancienne_valeur, valeur))
+        mets_a_jour_positions(terrain_de_jeu, rangee, colonne, ancienne_valeur, valeur)
+
+def mets_a_jour_positions(terrain_de_jeu, rangee, colonne, ancienne_valeur, valeur):
+    "Tient les positions d'un TerrainIndexe à jour quand une case change"
+    if ancienne_valeur == ROBOT:
+        # discard retire un élément d'un ensemble (s'il y est)
+        terrain_de_jeu.positions_robots.discard((rangee, colonne))
+    elif ancienne_valeur == OBSTACLE:
+        terrain_de_jeu.positions_obstacles.discard((rangee, colonne))
+        terrain_de_jeu.changements_obstacles += 1
+        terrain_de_jeu.cases_obstacles_changees.append((rangee, colonne))
+    if valeur == ROBOT:
+        terrain_de_jeu.positions_robots.add((rangee, colonne))
+    elif valeur == OBSTACLE:
+        terrain_de_jeu.positions_obstacles.add((rangee, colonne))
+        terrain_de_jeu.changements_obstacles += 1
+        terrain_de_jeu.cases_obstacles_changees.append((rangee, colonne))
+    elif valeur == JOUEUR:
+        terrain_de_jeu.position_joueur = (rangee, colonne)
+    elif ancienne_valeur == JOUEUR:
+        terrain_de_jeu.position_joueur = None
+
+def tire_sans_remise(hasard, nombre, combien):
+    """`combien' nombres différents au hasard parmi 0, 1, ..., nombre - 1
+
+    C'est l'algorithme de Robert Floyd: le temps nécessaire ne dépend que de
+    `combien', pas de `nombre', et il n'y a jamais besoin de recommencer."""
+    choisis = set()
+    for dernier in range(nombre - combien, nombre):
+        tirage = hasard.randrange(dernier + 1)
+        # si `tirage' a déjà été choisi, `dernier' ne l'a sûrement pas été
+        choisis.add(dernier if tirage in choisis else tirage)
+    return choisis
+
+def nouveau_jeu(colonnes=30, rangees=18, nombre_de_robots=15, obstacles=None, graine=None,
+                densite_obstacles=None, distance_minimum=None, journal=True):
+    """Crée un nouveau terrain de jeu
+
+    `obstacles' est le nombre d'obstacles à l'intérieur du terrain (par
+    défaut la moitié de la plus petite dimension), ou bien
+    `densite_obstacles' la fraction des cases intérieures qui sont des
+    obstacles (p.ex. 0.05).  Les robots sont au moins à `distance_minimum'
+    pas du joueur (par défaut, un tiers de la plus petite dimension).  Avec
+    une `graine', le terrain est toujours le même pour la même graine.
+    Avec journal=False, les tours ne peuvent pas être annulés (cf.
+    TerrainIndexe).
+
+    ValueError si c'est impossible (pas assez de place)."""
     # Dimensions du terrain de jeu (compté en cases)
-    COLONNES = 30
-    RANGEES = 18
+    COLONNES = colonnes
+    RANGEES = rangees
+    if min(RANGEES, COLONNES) < 3:
+        raise ValueError("Le terrain doit avoir au moins 3 rangées et 3 colonnes")
+    if distance_minimum is None:
+        # La distance initiale entre les robots et le joueur dépend de la
+        # taille du terrain: p.ex. min(3, 1, 2) = 1 (PplK 122-123)
+        distance_minimum = min(RANGEES, COLONNES) // 3 + 1
+    distance_minimum = max(1, distance_minimum) # pas de robot sur le joueur!
+    # Sans graine, nous utilisons le hasard habituel du module random (PplK
+    # 176), sinon un générateur à part qui donne toujours les mêmes nombres
+    # pour la même graine:
+    hasard = random if graine is None else random.Random(graine)
     # Commençons avec un tableau vide ...
-    tableau = [[VIDE] * COLONNES for _r in range(RANGEES)]
+    tableau = TerrainIndexe(([VIDE] * COLONNES for _r in range(RANGEES)), journal)
     # ... entouré par des obstacles (en haut et en bas du tableau) ...
     for colonne in range(COLONNES):
-        tableau[0][colonne] = OBSTACLE
-        tableau[RANGEES - 1][colonne] = OBSTACLE
+        change_case(tableau, 0, colonne, OBSTACLE)
+        change_case(tableau, RANGEES - 1, colonne, OBSTACLE)
     # ... entouré par des obstacles (à gauche et à droite du tableau)
     for rangee in range(RANGEES):
-        tableau[rangee][0] = OBSTACLE
-        tableau[rangee][COLONNES - 1] = OBSTACLE
+        change_case(tableau, rangee, 0, OBSTACLE)
+        change_case(tableau, rangee, COLONNES - 1, OBSTACLE)
     # Plaçons le joueur (pas trop près du bord):
-    # p.ex. random.randrange(6, 18 - 6) = 6, 7, 8, 9, 10 ou 11 (au hasard, PplK 176)
-    rangee_joueur = random.randrange(6, RANGEES - 6)
-    colonne_joueur = random.randrange(6, COLONNES - 6)
-    tableau[rangee_joueur][colonne_joueur] = JOUEUR
-    # Plaçons les robots:
-    ROBOTS = 15 # combien de robots il faut placer en tout.
-    # Nous allons essayer de placer un nouveau robot aussi longtemps qu'il n'y
-    # en a pas assez (PplK 81 et 311):
-    while robots(tableau) < ROBOTS:
-        # Choisissons une place au hasard en évitant les obstacles qui
-        # entourent le terrain de jeu ...
-        rangee = random.randrange(1, RANGEES - 1)
-        colonne = random.randrange(1, COLONNES - 1)
-        # ... et en ne nous mettant pas trop près du joueur. `abs' rend un
-        # nombre positif, p.ex. abs(-3) = 3 et abs(4) = 4 (PplK 114); cela
-        # permet de calculer la distance de (rangee, colonne) par rapport au
-        # joueur:
-        if (abs(rangee - rangee_joueur) + abs(colonne - colonne_joueur)
-            # La distance initiale entre les robots et le joueur dépend de la
-            # taille du terrain:
-            > (min(RANGEES, COLONNES) // 3)): # p.ex. min(3, 1, 2) = 1 (PplK 122-123)
-            tableau[rangee][colonne] = ROBOT
+    # p.ex. random.randrange(6, 18 - 6) = 6, 7, 8, 9, 10 ou 11 (au hasard,
+    # PplK 176).  Sur un petit terrain, la marge est plus petite:
+    rangee_joueur = hasard.randrange(min(6, (RANGEES - 1) // 2), RANGEES - min(6, (RANGEES - 1) // 2))
+    colonne_joueur = hasard.randrange(min(6, (COLONNES - 1) // 2), COLONNES - min(6, (COLONNES - 1) // 2))
+    change_case(tableau, rangee_joueur, colonne_joueur, JOUEUR)
+    # Plaçons les robots.  Au lieu d'essayer des cases au hasard jusqu'à en
+    # trouver une assez loin du joueur (ce qui peut durer très longtemps s'il
+    # y en a peu), comptons les cases permises dans chaque rangée: toutes les
+    # cases intérieures sauf celles trop près du joueur, qui forment un seul
+    # morceau de la rangée, de la colonne `debut' à la colonne `fin'.
+    # `abs' rend un nombre positif, p.ex. abs(-3) = 3 et abs(4) = 4 (PplK 114).
+    exclues = [] # (debut, fin) pour chaque rangée intérieure
+    permises_avant = [0] # permises_avant[i]: cases permises dans les i premières rangées intérieures
+    for rangee in range(1, RANGEES - 1):
+        # les colonnes à moins de `distance_minimum' pas du joueur
+        largeur = distance_minimum - 1 - abs(rangee - rangee_joueur)
+        debut = max(1, colonne_joueur - largeur)
+        fin = min(COLONNES - 2, colonne_joueur + largeur)
+        if largeur < 0:
+            (debut, fin) = (1, 0) # aucune colonne exclue
+        exclues.append((debut, fin))
+        permises_avant.append(permises_avant[-1] + (COLONNES - 2) - (fin - debut + 1))
+    if permises_avant[-1] < nombre_de_robots:
+        raise ValueError(f"Pas assez de place pour {nombre_de_robots} robots "
+                         f"à au moins {distance_minimum} pas du joueur")
+    # Numérotons les cases permises de 0 à permises_avant[-1] - 1 et tirons
+    # au hasard autant de numéros que de robots (jamais deux fois le même)
+    for numero in tire_sans_remise(hasard, permises_avant[-1], nombre_de_robots):
+        # bisect trouve la rangée du numéro dans la liste (triée) permises_avant
+        interieure = bisect.bisect_right(permises_avant, numero) - 1
+        (debut, fin) = exclues[interieure]
+        # le numéro de la case parmi les cases permises de la rangée: d'abord
+        # celles à gauche du morceau exclu, puis celles à droite
+        dans_la_rangee = numero - permises_avant[interieure]
+        if dans_la_rangee < debut - 1:
+            colonne = 1 + dans_la_rangee
+        else:
+            colonne = fin + 1 + dans_la_rangee - (debut - 1)
+        change_case(tableau, interieure + 1, colonne, ROBOT)
     # Mettons aussi quelques obstacles pour que le joueur puisse se cacher.
-    # Nous utilisons une boucle for (PplK 73 et 304) parce que le nombre de
-    # fois que nous voulons essayer de placer un obstacle est décidé à
-    # l'avance:
-    for _ in range(min(COLONNES, RANGEES) // 2):
-        # Choisissons une place au hasard en évitant les obstacles qui
-        # entourent le terrain de jeu
-        rangee = random.randrange(1, RANGEES - 1)
-        colonne = random.randrange(1, COLONNES - 1)
-        # si la case est encore vide, on peut mettre un obstacle
-        if case(tableau, rangee, colonne) == VIDE:
-            tableau[rangee][colonne] = OBSTACLE
+    cases_interieures = (RANGEES - 2) * (COLONNES - 2)
+    if densite_obstacles is not None:
+        obstacles = round(densite_obstacles * cases_interieures)
+    elif obstacles is None:
+        obstacles = min(COLONNES, RANGEES) // 2
+    if obstacles > cases_interieures - 1 - nombre_de_robots:
+        raise ValueError(f"Pas assez de place pour {obstacles} obstacles")
+    # Comme pour les robots, numérotons les cases intérieures encore vides
+    # et tirons autant de numéros que d'obstacles.  Les cases intérieures
+    # ont un numéro rangée par rangée: (rangée - 1) * (COLONNES - 2) +
+    # colonne - 1.  Les cases occupées (le joueur et les robots) sont
+    # sautées: `libres_avant[i]' est le nombre de cases vides avant la i-ème
+    # case occupée, et la case vide numéro n est la case intérieure
+    # n + (nombre de cases occupées avant elle).
+    occupees = sorted((rangee - 1) * (COLONNES - 2) + colonne - 1
+                      for (rangee, colonne) in [tableau.position_joueur, *tableau.positions_robots])
+    libres_avant = [occupee - i for (i, occupee) in enumerate(occupees)]
+    libres = cases_interieures - len(occupees)
+    if 2 * obstacles > libres:
+        # Plus d'obstacles que de cases qui restent vides: il est plus
+        # rapide de tirer les cases qui restent vides (cf. place_bombes dans
+        # le démineur)
+        vides = tire_sans_remise(hasard, libres, libres - obstacles)
+        numeros = (numero for numero in range(libres) if numero not in vides)
+    else:
+        numeros = tire_sans_remise(hasard, libres, obstacles)
+    places = []
+    for numero in numeros:
+        (rangee, colonne) = divmod(numero + bisect.bisect_right(libres_avant, numero), COLONNES - 2)
+        # directement dans le tableau, sans change_case: il peut y avoir
+        # des centaines de milliers d'obstacles, et la préparation du
+        # terrain ne va pas dans le journal
+        tableau[rangee + 1][colonne + 1] = OBSTACLE
+        places.append((rangee + 1, colonne + 1))
+    tableau.positions_obstacles.update(places)
+    tableau.changements_obstacles += 1
+    # la préparation du terrain ne s'annule pas
+    if tableau.journal is not None:
+        tableau.journal.clear()
     return tableau
 
 def rangees(terrain_de_jeu):
@@ -89,6 +255,8 @@ def case(terrain_de_jeu, rangee, colonne):
 
 def robots(terrain_de_jeu):
     "Compte le nombre de robots présents sur le terrain de jeu"
+    if isinstance(terrain_de_jeu, TerrainIndexe):
+        return len(terrain_de_jeu.positions_robots)
     # p.ex. sum([1, 1, 1]) = 3 (PplK 125)
     return sum(1
                # parcourt toutes les rangées
@@ -98,110 +266,203 @@ def robots(terrain_de_jeu):
                # [i for i in [1, 2, 3, 1, 2] if i > 1] = [2, 3, 2]
                if case(terrain_de_jeu, rangee, colonne) == ROBOT)
 
-def montre_joueur(canvas, x_origine, y_origine):
-    "Dessine le joueur sur le canevas"
-    cou_y = y_origine + TAILLE_CASE // 3
-    droite_x = x_origine + TAILLE_CASE - 1
-    bifurcum_x = x_origine + TAILLE_CASE // 2
-    bifurcum_y = y_origine + (2 * TAILLE_CASE) // 3
-    pied_y = y_origine + TAILLE_CASE - 1
+# Pour que le jeu reste rapide même avec un grand terrain, nous ne
+# redessinons pas tout à chaque tour:
+# - les images du joueur, d'un robot et d'un obstacle (les "sprites") sont
+#   dessinées une seule fois, point par point, dans des PhotoImage;
+# - chaque chose sur le terrain est un seul objet du canevas (une image) que
+#   nous gardons d'un tour à l'autre: quand un robot bouge, nous déplaçons
+#   simplement son image avec canvas.coords;
+# - les commandes et les obstacles, qui ne bougent jamais, ne sont dessinés
+#   qu'une fois.
+
+def trace_point(image, couleur, x, y):
+    "Colorie un point d'une image (s'il est dans l'image)"
+    if 0 <= x < TAILLE_CASE and 0 <= y < TAILLE_CASE:
+        image.put(couleur, to=(x, y))
+
+def trace_ligne(image, couleur, x1, y1, x2, y2):
+    "Dessine une ligne point par point dans une image"
+    pas = max(abs(x2 - x1), abs(y2 - y1), 1)
+    for i in range(pas + 1):
+        trace_point(image, couleur, round(x1 + (x2 - x1) * i / pas), round(y1 + (y2 - y1) * i / pas))
+
+def trace_rectangle(image, couleur, x1, y1, x2, y2):
+    "Remplit un rectangle (les coins (x1, y1) et (x2, y2) compris) dans une image"
+    image.put(couleur, to=(x1, y1, x2 + 1, y2 + 1))
+
+def trace_ovale(image, couleur, x1, y1, x2, y2, rempli):
+    "Dessine un ovale (rempli ou seulement le tour) dans le rectangle (x1, y1)-(x2, y2)"
+    centre_x = (x1 + x2) / 2
+    centre_y = (y1 + y2) / 2
+    demi_largeur = (x2 - x1) / 2
+    demi_hauteur = max((y2 - y1) / 2, 0.5)
+    for y in range(y1, y2 + 1):
+        # pour chaque rangée de points, l'ovale va de gauche à droite
+        hauteur = (y - centre_y) / demi_hauteur
+        demi_rangee = demi_largeur * max(0, 1 - hauteur * hauteur) ** 0.5
+        gauche = round(centre_x - demi_rangee)
+        droite = round(centre_x + demi_rangee)
+        if rempli or y in (y1, y2):
+            trace_rectangle(image, couleur, gauche, y, droite, y)
+        else:
+            trace_point(image, couleur, gauche, y)
+            trace_point(image, couleur, droite, y)
+
+def image_joueur():
+    "L'image du joueur (une PhotoImage est transparente là où on ne dessine pas)"
+    image = PhotoImage(width=TAILLE_CASE, height=TAILLE_CASE)
+    cou_y = TAILLE_CASE // 3
+    droite_x = TAILLE_CASE - 1
+    bifurcum_x = TAILLE_CASE // 2
+    bifurcum_y = (2 * TAILLE_CASE) // 3
+    pied_y = TAILLE_CASE - 1
     # Tête
-    canvas.create_oval(x_origine + TAILLE_CASE // 3, y_origine,
-                       x_origine + (2 * TAILLE_CASE) // 3, cou_y)
+    trace_ovale(image, 'black', TAILLE_CASE // 3, 0, (2 * TAILLE_CASE) // 3, cou_y, False)
     # Bras
-    canvas.create_line(x_origine, cou_y, droite_x, cou_y)
+    trace_ligne(image, 'black', 0, cou_y, droite_x, cou_y)
     # Tronc
-    canvas.create_line(bifurcum_x, cou_y, bifurcum_x, bifurcum_y)
+    trace_ligne(image, 'black', bifurcum_x, cou_y, bifurcum_x, bifurcum_y)
     # 2 jambes:
-    canvas.create_line(x_origine, pied_y, bifurcum_x, bifurcum_y)
-    canvas.create_line(droite_x, pied_y, bifurcum_x, bifurcum_y)
-
-def montre_obstacle(canvas, x_origine, y_origine):
-    "Dessine un obstacle sur le canvas"
-    canvas.create_rectangle(x_origine, y_origine,
-                            x_origine + TAILLE_CASE - 1, y_origine + TAILLE_CASE - 1,
-                            fill='black')
-
-def montre_robot(canvas, x_origine, y_origine):
-    "Dessine un robot sur le canvas"
-    droite_x = x_origine + TAILLE_CASE - 1
-    cou_y = y_origine + TAILLE_CASE // 2
-    bifurcum_y = y_origine + (3 * TAILLE_CASE) // 4
-    pied_y = y_origine + TAILLE_CASE - 1
+    trace_ligne(image, 'black', 0, pied_y, bifurcum_x, bifurcum_y)
+    trace_ligne(image, 'black', droite_x, pied_y, bifurcum_x, bifurcum_y)
+    return image
+
+def image_obstacle():
+    "L'image d'un obstacle"
+    image = PhotoImage(width=TAILLE_CASE, height=TAILLE_CASE)
+    trace_rectangle(image, 'black', 0, 0, TAILLE_CASE - 1, TAILLE_CASE - 1)
+    return image
+
+def image_robot():
+    "L'image d'un robot"
+    image = PhotoImage(width=TAILLE_CASE, height=TAILLE_CASE)
+    droite_x = TAILLE_CASE - 1
+    cou_y = TAILLE_CASE // 2
+    bifurcum_y = (3 * TAILLE_CASE) // 4
+    pied_y = TAILLE_CASE - 1
     COULEUR = 'red' # rouge
     # Tête
-    canvas.create_oval(x_origine, y_origine + 1, droite_x, cou_y,
-                       outline=COULEUR, fill=COULEUR)
+    trace_ovale(image, COULEUR, 0, 1, droite_x, cou_y, True)
     # Corps
-    canvas.create_rectangle(x_origine, cou_y, droite_x, bifurcum_y,
-                            outline=COULEUR, fill=COULEUR)
+    trace_rectangle(image, COULEUR, 0, cou_y, droite_x, bifurcum_y)
     # 2 jambes:
-    canvas.create_line(x_origine, pied_y, x_origine, bifurcum_y, fill=COULEUR)
-    canvas.create_line(droite_x, pied_y, droite_x, bifurcum_y, fill=COULEUR)
-
-def montre_le_terrain(terrain_de_jeu, canvas):
-    canvas.delete(ALL) # efface tout avant de re-dessiner au-dessus dessiner
-    # les commandes: un carré de 3x3 `boutons', chaque bouton représentant une
-    # direction et le bouton du centre signifiant que le joueur veut passer
-    # son tour.
-    #
-    # Si ça paraît un peu long, on peut remplacer par
-    # DEMI_CASE = TAILLE_CASE // 2
-    # # p.ex. enumerate(['a', 'b', 'c']) = [(0, 'a'), ('1', 'b'), (2, 'c')
-    # for (rangee, rangee_de_commandes) in enumerate(
-    #         [['no', 'n', 'ne'],
-    #          ['o', 'Zzz', 'e'],
-    #          ['so', 's', 'se']]):
-    #     for (colonne, commande) in enumerate(rangee_de_commandes):
-    #         # `+ DEMI_CASE' pour se décaler au milieu de la case, afin de
-    #         # centrer `anchor=center' le texte au milieu de la case
-    #         canvas.create_text(colonne * TAILLE_CASE + DEMI_CASE,
-    #                            rangee * TAILLE_CASE + DEMI_CASE,
-    #                            text=commande, anchor='center')
-    canvas.create_text(0 * TAILLE_CASE + TAILLE_CASE // 2, # distance horizontale
-                       0 * TAILLE_CASE + TAILLE_CASE // 2, # distance verticale
-                       text='no', anchor='center')
-    canvas.create_text(1 * TAILLE_CASE + TAILLE_CASE // 2, # distance horizontale
-                       0 * TAILLE_CASE + TAILLE_CASE // 2, # distance verticale
-                       text='n', anchor='center')
-    canvas.create_text(2 * TAILLE_CASE + TAILLE_CASE // 2, # distance horizontale
-                       0 * TAILLE_CASE + TAILLE_CASE // 2, # distance verticale
-                       text='ne', anchor='center')
-    canvas.create_text(0 * TAILLE_CASE + TAILLE_CASE // 2, # distance horizontale
-                       1 * TAILLE_CASE + TAILLE_CASE // 2, # distance verticale
-                       text='o', anchor='center')
-    canvas.create_text(1 * TAILLE_CASE + TAILLE_CASE // 2, # distance horizontale
-                       1 * TAILLE_CASE + TAILLE_CASE // 2, # distance verticale
-                       text='Zzz', anchor='center')
-    canvas.create_text(2 * TAILLE_CASE + TAILLE_CASE // 2, # distance horizontale
-                       1 * TAILLE_CASE + TAILLE_CASE // 2, # distance verticale
-                       text='e', anchor='center')
-    canvas.create_text(0 * TAILLE_CASE + TAILLE_CASE // 2, # distance horizontale
-                       2 * TAILLE_CASE + TAILLE_CASE // 2, # distance verticale
-                       text='so', anchor='center')
-    canvas.create_text(1 * TAILLE_CASE + TAILLE_CASE // 2, # distance horizontale
-                       2 * TAILLE_CASE + TAILLE_CASE // 2, # distance verticale
-                       text='s', anchor='center')
-    canvas.create_text(2 * TAILLE_CASE + TAILLE_CASE // 2, # distance horizontale
-                       2 * TAILLE_CASE + TAILLE_CASE // 2, # distance verticale
-                       text='se', anchor='center')
-    # dessiner le terrain en parcourant toutes les cases rangée par rangée ...
-    for rangee in range(rangees(terrain_de_jeu)):
-        # ... puis dans la rangée, parcourons chaque colonne
-        for colonne in range(colonnes(terrain_de_jeu)):
-            # `+ 4' pour laisser la place aux commandes sur la gauche du terrain
-            x_origine = (colonne + 4) * TAILLE_CASE
-            y_origine = rangee * TAILLE_CASE
-            # Choisir l'affichage en fonction du contenu de la case
-            if case(terrain_de_jeu, rangee, colonne) == OBSTACLE:
-                montre_obstacle(canvas, x_origine, y_origine)
-            elif case(terrain_de_jeu, rangee, colonne) == JOUEUR:
-                montre_joueur(canvas, x_origine, y_origine)
-            elif case(terrain_de_jeu, rangee, colonne) == ROBOT:
-                montre_robot(canvas, x_origine, y_origine)
+    trace_ligne(image, COULEUR, 0, pied_y, 0, bifurcum_y)
+    trace_ligne(image, COULEUR, droite_x, pied_y, droite_x, bifurcum_y)
+    return image
+
+def montre_les_commandes(canvas):
+    """Dessine les commandes: un carré de 3x3 `boutons', chaque bouton
+    représentant une direction et le bouton du centre signifiant que le
+    joueur veut passer son tour."""
+    DEMI_CASE = TAILLE_CASE // 2
+    # p.ex. enumerate(['a', 'b', 'c']) = [(0, 'a'), ('1', 'b'), (2, 'c')
+    for (rangee, rangee_de_commandes) in enumerate(
+            [['no', 'n', 'ne'],
+             ['o', 'Zzz', 'e'],
+             ['so', 's', 'se']]):
+        for (colonne, commande) in enumerate(rangee_de_commandes):
+            # `+ DEMI_CASE' pour se décaler au milieu de la case, afin de
+            # centrer `anchor=center' le texte au milieu de la case
+            canvas.create_text(colonne * TAILLE_CASE + DEMI_CASE,
+                               rangee * TAILLE_CASE + DEMI_CASE,
+                               text=commande, anchor='center')
+
+def nouvel_affichage(canvas):
+    """Prépare le canevas: les commandes et les images sont dessinées une fois pour toutes
+
+    Le résultat est un dictionnaire qui se souvient des objets du canevas
+    (leur numéro) pour chaque chose sur le terrain (cf. montre_le_terrain)."""
+    canvas.delete(ALL)
+    montre_les_commandes(canvas)
+    return {'canvas': canvas,
+            # il faut garder les images quelque part, sinon Python les jette
+            'images': {JOUEUR: image_joueur(), ROBOT: image_robot(), OBSTACLE: image_obstacle()},
+            'joueur': None, # le numéro de l'image du joueur sur le canevas
+            'robots': {}, # (rangée, colonne) -> numéro de l'image de ce robot
+            'obstacles': {}, # (rangée, colonne) -> numéro de l'image de cet obstacle
+            # terrain.changements_obstacles et len(terrain.cases_obstacles_changees)
+            # la dernière fois que les obstacles ont été dessinés (cf.
+            # montre_les_obstacles), None avant la première fois
+            'changements_obstacles': None,
+            'obstacles_lus': 0}
+
+def coin(position):
+    "Les coordonnées (x, y) sur le canevas du coin en haut à gauche d'une case"
+    (rangee, colonne) = position
+    # `+ 4' pour laisser la place aux commandes sur la gauche du terrain
+    return ((colonne + 4) * TAILLE_CASE, rangee * TAILLE_CASE)
+
+def positions(terrain_de_jeu, valeur):
+    "L'ensemble des positions des cases qui contiennent `valeur'"
+    if isinstance(terrain_de_jeu, TerrainIndexe):
+        if valeur == ROBOT:
+            return terrain_de_jeu.positions_robots
+        if valeur == OBSTACLE:
+            return terrain_de_jeu.positions_obstacles
+    return set((rangee, colonne)
+               for rangee in range(rangees(terrain_de_jeu))
+               for colonne in range(colonnes(terrain_de_jeu))
+               if case(terrain_de_jeu, rangee, colonne) == valeur)
+
+def montre_les_obstacles(terrain_de_jeu, affichage):
+    """Met les images des obstacles à jour
+
+    Avec un TerrainIndexe, seules les cases où un obstacle est apparu (débris
+    de robots) ou a disparu (quand on annule un tour, cf. annule_tour) depuis
+    la dernière fois sont regardées: rien du tout si changements_obstacles
+    n'a pas bougé.  Sinon (et la première fois), tout le terrain."""
+    canvas = affichage['canvas']
+    if isinstance(terrain_de_jeu, TerrainIndexe) and affichage['changements_obstacles'] is not None:
+        if affichage['changements_obstacles'] == terrain_de_jeu.changements_obstacles:
+            return
+        a_regarder = set(terrain_de_jeu.cases_obstacles_changees[affichage['obstacles_lus']:])
+    else:
+        a_regarder = positions(terrain_de_jeu, OBSTACLE) | affichage['obstacles'].keys()
+    for position in a_regarder:
+        obstacle = case(terrain_de_jeu, *position) == OBSTACLE
+        if obstacle and position not in affichage['obstacles']:
+            affichage['obstacles'][position] = canvas.create_image(
+                *coin(position), image=affichage['images'][OBSTACLE], anchor='nw')
+        elif not obstacle and position in affichage['obstacles']:
+            canvas.delete(affichage['obstacles'].pop(position))
+    if isinstance(terrain_de_jeu, TerrainIndexe):
+        affichage['changements_obstacles'] = terrain_de_jeu.changements_obstacles
+        affichage['obstacles_lus'] = len(terrain_de_jeu.cases_obstacles_changees)
+
+def montre_le_terrain(terrain_de_jeu, affichage):
+    "Met le canevas à jour: seules les choses qui ont changé sont redessinées"
+    canvas = affichage['canvas']
+    images = affichage['images']
+    montre_les_obstacles(terrain_de_jeu, affichage)
+    # les robots: ceux qui ont quitté leur case sont déplacés vers une case
+    # où un robot vient d'arriver, les autres ne changent pas
+    robots_presents = positions(terrain_de_jeu, ROBOT)
+    partis = [position for position in affichage['robots'] if position not in robots_presents]
+    arrives = [position for position in robots_presents if position not in affichage['robots']]
+    for (depart, arrivee) in zip(partis, arrives):
+        objet = affichage['robots'].pop(depart)
+        canvas.coords(objet, *coin(arrivee))
+        affichage['robots'][arrivee] = objet
+    # s'il y a plus de départs que d'arrivées, des robots se sont cassés ...
+    for depart in partis[len(arrives):]:
+        canvas.delete(affichage['robots'].pop(depart))
+    # ... et s'il y a plus d'arrivées que de départs (au début du jeu), il
+    # faut de nouvelles images
+    for arrivee in arrives[len(partis):]:
+        affichage['robots'][arrivee] = canvas.create_image(
+            *coin(arrivee), image=images[ROBOT], anchor='nw')
+    # le joueur
+    if affichage['joueur'] is None:
+        affichage['joueur'] = canvas.create_image(
+            *coin(joueur(terrain_de_jeu)), image=images[JOUEUR], anchor='nw')
+    else:
+        canvas.coords(affichage['joueur'], *coin(joueur(terrain_de_jeu)))
 
 def joueur(terrain_de_jeu):
     "Donne la position (rangée, colonne) du joueur sur le terrain"
+    if isinstance(terrain_de_jeu, TerrainIndexe) and terrain_de_jeu.position_joueur is not None:
+        return terrain_de_jeu.position_joueur
     # p.ex. next(i for i in [1, 3, 2] if i > 1), parcourt la liste [1, 3, 2],
     # donnant tour à tour la valeur 1, 3, puis 2 à i.  Dès que i > 1 (donc 3),
     # arrêter de chercher et prendre 3 comme solution.
@@ -225,28 +486,50 @@ def approche(coordonnee_robot, coordonnee_joueur):
         # joueur, ne rien changer dans cette direction
         return coordonnee_robot
 
-def bouge_robots(terrain_de_jeu):
+def positions_robots(terrain_de_jeu):
+    "Liste des positions (rangée, colonne) de tous les robots, rangée par rangée"
+    if isinstance(terrain_de_jeu, TerrainIndexe):
+        # sorted trie les positions dans le même ordre que si on parcourait
+        # le terrain rangée par rangée
+        return sorted(terrain_de_jeu.positions_robots)
+    return [(rangee, colonne)
+            for rangee in range(rangees(terrain_de_jeu))
+            for colonne in range(colonnes(terrain_de_jeu))
+            if case(terrain_de_jeu, rangee, colonne) == ROBOT]
+
+def bouge_robots(terrain_de_jeu, champ=None):
+    """Bouge tous les robots vers le joueur
+
+    Avec un `champ' (cf. nouveau_champ), les robots contournent les obstacles.
+    Vrai (True) si le jeu peut continuer, faux (False) si un robot a rattrapé
+    le joueur."""
     # D'abord calculer la position du joueur puisque tous les robots veulent s'en rapprocher
     (rangee_joueur, colonne_joueur) = joueur(terrain_de_jeu)
+    if champ is not None and champ['joueur'] != (rangee_joueur, colonne_joueur):
+        calcule_champ(champ, terrain_de_jeu)
     # Pour ne pas changer le terrain de jeu avant d'avoir bougé tous les
     # robots, nous calculons d'abord toutes les nouvelles positions des
     # robots (stockées dans cette liste):
     nouvelles_positions = []
-    # Parcourons tout le tableau, rangée par rangée ...
-    for rangee in range(rangees(terrain_de_jeu)):
-        # ... et colonne par colonne pour trouver tous les robots
-        for colonne in range(colonnes(terrain_de_jeu)):
-            if case(terrain_de_jeu, rangee, colonne) == ROBOT:
-                # Puisque nous avons trouvé un robot, calculons la nouvelle
-                # position ...
-                nouvelle_rangee = approche(rangee, rangee_joueur)
-                nouvelle_colonne = approche(colonne, colonne_joueur)
-                # ... et mettons la de côté
-                nouvelles_positions.append((nouvelle_rangee, nouvelle_colonne))
-                # nous retirons le robot temporairement, nous le remettrons
-                # en place grâce à nouvelles_positions.
-                terrain_de_jeu[rangee][colonne] = VIDE
+    departs = positions_robots(terrain_de_jeu)
+    # Pour chaque robot ...
+    for (rangee, colonne) in departs:
+        # ... calculons la nouvelle position ...
+        if champ is None:
+            nouvelle_rangee = approche(rangee, rangee_joueur)
+            nouvelle_colonne = approche(colonne, colonne_joueur)
+        else:
+            (nouvelle_rangee, nouvelle_colonne) = descend(champ, terrain_de_jeu, rangee, colonne)
+        # ... et mettons la de côté
+        nouvelles_positions.append((nouvelle_rangee, nouvelle_colonne))
+        # nous retirons le robot temporairement, nous le remettrons
+        # en place grâce à nouvelles_positions.
+        change_case(terrain_de_jeu, rangee, colonne, VIDE)
+    if isinstance(terrain_de_jeu, TerrainIndexe):
+        # pour pouvoir montrer comment chaque robot a bougé
+        terrain_de_jeu.mouvements_robots = list(zip(departs, nouvelles_positions))
     # Remettre les robots en place en tenant compte des collisions
+    debris = [] # les cases où des robots viennent de se casser
     for (rangee, colonne) in nouvelles_positions:
         if (rangee == rangee_joueur) and (colonne == colonne_joueur):
             # un robot a rattrapé le joueur
@@ -254,15 +537,22 @@ def bouge_robots(terrain_de_jeu):
         # si on arrive ici: la case est soit VIDE, ROBOT ou OBSTACLE:
         assert case(terrain_de_jeu, rangee, colonne) in [VIDE, ROBOT, OBSTACLE]
         if case(terrain_de_jeu, rangee, colonne) != VIDE:
+            if case(terrain_de_jeu, rangee, colonne) == ROBOT:
+                debris.append((rangee, colonne))
             # collision -> la case devient inaccessible
-            terrain_de_jeu[rangee][colonne] = OBSTACLE
+            change_case(terrain_de_jeu, rangee, colonne, OBSTACLE)
         else:
             # il y a place pour le robot: on le remet à sa place
-            terrain_de_jeu[rangee][colonne] = ROBOT
+            change_case(terrain_de_jeu, rangee, colonne, ROBOT)
+    if champ is not None and debris:
+        repare_champ(champ, terrain_de_jeu, debris)
     # Si on arrive ici, aucun robot n'a rattrapé le joueur, le jeu peut continuer
     return True
 
 PASSER_SON_TOUR = (0, 0) # le joueur ne veut pas bouger
+# pas des directions, mais des ordres pour revenir en arrière (cf. annule_tour)
+ANNULER = 'annuler'
+REFAIRE = 'refaire'
 # Les 8 directions dans lesquelles peut bouger le joueur
 NORD = (-1, 0) # -1: vers le haut, 0: ni à gauche, ni à droite
 NORD_EST = (-1, 1) # -1: vers le haut, 1: vers la droite
@@ -286,19 +576,338 @@ def bouge_joueur(terrain_de_jeu, direction):
     nouvelle_colonne = ancienne_colonne + direction[1]
     if case(terrain_de_jeu, nouvelle_rangee, nouvelle_colonne) == VIDE:
         # il y a de la place, donc nous pouvons effectuer le mouvement
-        terrain_de_jeu[ancienne_rangee][ancienne_colonne] = VIDE
-        terrain_de_jeu[nouvelle_rangee][nouvelle_colonne] = JOUEUR
+        change_case(terrain_de_jeu, ancienne_rangee, ancienne_colonne, VIDE)
+        change_case(terrain_de_jeu, nouvelle_rangee, nouvelle_colonne, JOUEUR)
         return True # pour signaler le succès du mouvement
     else:
         return False # pour signaler que le mouvement était impossible
 
-def joue(terrain_de_jeu, tk, canvas):
+# Annuler et refaire des tours.
+#
+# Plutôt que de recopier tout le terrain avant chaque tour (ce qui prend
+# beaucoup de temps pour un grand terrain), change_case note chaque
+# changement dans le journal du terrain.  Pour revenir en arrière, il suffit
+# de défaire les derniers changements du journal, du plus récent au plus
+# ancien: le temps nécessaire ne dépend que du nombre de cases qui ont
+# changé, pas de la taille du terrain.
+#
+# instantane() et revient_a() peuvent aussi servir à essayer des coups pour
+# voir ce qui se passerait, p.ex.:
+#
+#    avant = instantane(terrain)
+#    bouge_joueur(terrain, NORD)
+#    survit = bouge_robots(terrain)
+#    revient_a(terrain, avant)  # le terrain est comme avant l'essai
+
+def peut_annuler(terrain_de_jeu):
+    "Vrai si le terrain a un journal (cf. TerrainIndexe)"
+    return isinstance(terrain_de_jeu, TerrainIndexe) and terrain_de_jeu.journal is not None
+
+def instantane(terrain_de_jeu):
+    "Un repère pour revenir plus tard à l'état actuel du terrain (cf. revient_a)"
+    return len(terrain_de_jeu.journal)
+
+def revient_a(terrain_de_jeu, repere):
+    """Défait tous les changements faits depuis instantane() et les renvoie
+
+    (du plus ancien au plus récent, pour pouvoir les refaire dans l'ordre)"""
+    journal = terrain_de_jeu.journal
+    defaits = journal[repere:]
+    del journal[repere:]
+    # reversed: du plus récent au plus ancien
+    for (rangee, colonne, avant, apres) in reversed(defaits):
+        terrain_de_jeu[rangee][colonne] = avant
+        mets_a_jour_positions(terrain_de_jeu, rangee, colonne, apres, avant)
+    return defaits
+
+def tour_joue(terrain_de_jeu, debut):
+    """À appeler après chaque tour joué, avec instantane() d'avant le tour
+
+    Jouer un nouveau tour oublie les tours annulés."""
+    terrain_de_jeu.debuts_de_tours.append(debut)
+    terrain_de_jeu.a_refaire.clear()
+
+def annule_tour(terrain_de_jeu):
+    "Annule le dernier tour joué; faux s'il n'y en a pas"
+    if not terrain_de_jeu.debuts_de_tours:
+        return False
+    defaits = revient_a(terrain_de_jeu, terrain_de_jeu.debuts_de_tours.pop())
+    terrain_de_jeu.a_refaire.append(defaits)
+    return True
+
+def refait_tour(terrain_de_jeu):
+    "Refait le dernier tour annulé; faux s'il n'y en a pas"
+    if not terrain_de_jeu.a_refaire:
+        return False
+    terrain_de_jeu.debuts_de_tours.append(instantane(terrain_de_jeu))
+    for (rangee, colonne, _avant, apres) in terrain_de_jeu.a_refaire.pop():
+        change_case(terrain_de_jeu, rangee, colonne, apres)
+    return True
+
+# Des robots plus malins (facultatif): au lieu d'aller tout droit vers le
+# joueur avec approche(), quitte à se casser contre un obstacle, ils le
+# contournent.
+#
+# Pour cela, nous calculons pour chaque case le nombre de pas qu'il faut pour
+# aller jusqu'au joueur sans passer par un obstacle: c'est un "champ de
+# distances".  Le joueur est à 0, les cases autour de lui à 1, les cases
+# autour de celles-là à 2, etc. (cela s'appelle un parcours en largeur).  Un
+# robot n'a plus qu'à aller dans une case voisine plus proche du joueur que
+# la sienne, comme une bille qui roule vers le bas.  Le même champ sert pour
+# tous les robots: il n'est calculé qu'une fois par tour.
+#
+# Pour que cela reste rapide même sur un très grand terrain:
+# - le parcours s'arrête dès qu'il a trouvé tous les robots (les cases plus
+#   loin ne servent à rien);
+# - si le joueur n'a pas bougé, le champ est gardé d'un tour à l'autre et il
+#   suffit de le réparer autour des nouveaux débris (cf. repare_champ).
+
+# Les 8 directions dans lesquelles un robot peut bouger, rangée par rangée
+DEPLACEMENTS = [NORD_OUEST, NORD, NORD_EST, OUEST, EST, SUD_OUEST, SUD, SUD_EST]
+
+def nouveau_champ():
+    "Un champ de distances vide, il sera calculé au premier tour des robots"
+    return {'joueur': None, # la position du joueur quand le champ a été calculé
+            'distances': {}, # (rangée, colonne) -> nombre de pas jusqu'au joueur
+            # les cases qui ne sont pas dans `distances' sont au moins à
+            # `limite' pas du joueur (ou on ne peut pas y aller du tout)
+            'limite': 0}
+
+def voisines_libres(terrain_de_jeu, rangee, colonne):
+    "Les cases autour de (rangee, colonne) qui ne sont pas des obstacles"
+    return [(rangee + d_rangee, colonne + d_colonne)
+            for (d_rangee, d_colonne) in DEPLACEMENTS
+            if (0 <= rangee + d_rangee < rangees(terrain_de_jeu)
+                and 0 <= colonne + d_colonne < colonnes(terrain_de_jeu)
+                and case(terrain_de_jeu, rangee + d_rangee, colonne + d_colonne) != OBSTACLE)]
+
+def calcule_champ(champ, terrain_de_jeu):
+    "Parcours en largeur à partir du joueur, jusqu'à avoir trouvé tous les robots"
+    depart = joueur(terrain_de_jeu)
+    a_trouver = set(positions_robots(terrain_de_jeu))
+    distances = {depart: 0}
+    # une file d'attente: on ajoute à droite et on retire à gauche, donc les
+    # cases sont parcourues dans l'ordre de leur distance
+    a_parcourir = collections.deque([depart])
+    while a_parcourir and a_trouver:
+        position = a_parcourir.popleft()
+        for voisine in voisines_libres(terrain_de_jeu, *position):
+            if voisine not in distances:
+                distances[voisine] = distances[position] + 1
+                a_trouver.discard(voisine)
+                a_parcourir.append(voisine)
+    champ['joueur'] = depart
+    champ['distances'] = distances
+    if a_parcourir:
+        # toutes les cases plus proches que la dernière trouvée sont connues
+        champ['limite'] = max(distances.values())
+    else:
+        # le parcours est allé partout où on peut aller
+        champ['limite'] = float('inf')
+
+def repare_champ(champ, terrain_de_jeu, debris):
+    """Met le champ à jour quand de nouveaux débris sont apparus
+
+    Seules les cases dont le plus court chemin passait par un débris changent:
+    nous les cherchons (de la plus proche du joueur à la plus éloignée), puis
+    nous recalculons leur distance à partir des cases voisines qui n'ont pas
+    changé."""
+    distances = champ['distances']
+    # heapq garde une liste où heapq.heappop donne toujours le plus petit
+    # élément: ici la case la plus proche du joueur
+    a_verifier = []
+    for position in debris:
+        distance = distances.pop(position, None)
+        if distance is not None:
+            for voisine in voisines_libres(terrain_de_jeu, *position):
+                if distances.get(voisine) == distance + 1:
+                    heapq.heappush(a_verifier, (distance + 1, voisine))
+    perdues = set() # les cases qui ont perdu leur plus court chemin
+    while a_verifier:
+        (distance, position) = heapq.heappop(a_verifier)
+        if position in perdues:
+            continue
+        voisines = voisines_libres(terrain_de_jeu, *position)
+        if any(distances.get(voisine) == distance - 1 and voisine not in perdues
+               for voisine in voisines):
+            continue # il y a encore un chemin aussi court
+        perdues.add(position)
+        for voisine in voisines:
+            if distances.get(voisine) == distance + 1:
+                heapq.heappush(a_verifier, (distance + 1, voisine))
+    for position in perdues:
+        del distances[position]
+    a_calculer = []
+    for position in perdues:
+        connues = [distances[voisine] for voisine in voisines_libres(terrain_de_jeu, *position)
+                   if voisine in distances]
+        if connues:
+            heapq.heappush(a_calculer, (min(connues) + 1, position))
+    while a_calculer:
+        (distance, position) = heapq.heappop(a_calculer)
+        if position in distances:
+            continue
+        if distance > champ['limite']:
+            # le nouveau chemin passe peut-être par des cases que le parcours
+            # n'a jamais visitées: il faudra tout recalculer au prochain tour
+            champ['joueur'] = None
+            return
+        distances[position] = distance
+        for voisine in voisines_libres(terrain_de_jeu, *position):
+            if voisine in perdues and voisine not in distances:
+                heapq.heappush(a_calculer, (distance + 1, voisine))
+    if champ['limite'] != float('inf') and any(position not in distances for position in perdues):
+        champ['joueur'] = None # même chose: il faudra tout recalculer
+
+def descend(champ, terrain_de_jeu, rangee, colonne):
+    "La case où va un robot malin: une voisine plus proche du joueur"
+    (rangee_joueur, colonne_joueur) = champ['joueur']
+    tout_droit = (approche(rangee, rangee_joueur), approche(colonne, colonne_joueur))
+    ici = champ['distances'].get((rangee, colonne))
+    if ici is None or champ['distances'].get(tout_droit) == ici - 1:
+        # soit le robot ne peut pas arriver jusqu'au joueur (et il fait comme
+        # les autres robots), soit aller tout droit est un plus court chemin
+        return tout_droit
+    return next((voisine for voisine in voisines_libres(terrain_de_jeu, rangee, colonne)
+                 if champ['distances'].get(voisine) == ici - 1),
+                tout_droit)
+
+# Au lieu de sauter d'une case à l'autre, le joueur et les robots glissent
+# d'une case à l'autre pendant DUREE_MOUVEMENT secondes.  tk.after(ms,
+# fonction) demande à Tk d'appeler `fonction' dans `ms' millisecondes: c'est
+# ainsi que nous dessinons une image toutes les DELAI_IMAGE millisecondes,
+# sans jamais bloquer la fenêtre.  La position de chaque sprite dépend du
+# temps écoulé (pas du nombre d'images déjà dessinées): si l'ordinateur est
+# trop lent, des images sont sautées mais le mouvement dure toujours le même
+# temps.  Les ordres donnés pendant un mouvement sont mis en file d'attente.
+
+DUREE_MOUVEMENT = 0.15 # secondes
+DELAI_IMAGE = 16 # millisecondes, environ 60 images par seconde
+
+# Les touches du clavier: le pavé numérique (ou les chiffres), les flèches et
+# la barre d'espace pour passer son tour
+TOUCHES = {'7': NORD_OUEST, '8': NORD, '9': NORD_EST,
+           '4': OUEST, '5': PASSER_SON_TOUR, '6': EST,
+           '1': SUD_OUEST, '2': SUD, '3': SUD_EST,
+           'KP_7': NORD_OUEST, 'KP_8': NORD, 'KP_9': NORD_EST,
+           'KP_4': OUEST, 'KP_5': PASSER_SON_TOUR, 'KP_6': EST,
+           'KP_1': SUD_OUEST, 'KP_2': SUD, 'KP_3': SUD_EST,
+           'KP_Home': NORD_OUEST, 'KP_Up': NORD, 'KP_Prior': NORD_EST,
+           'KP_Left': OUEST, 'KP_Begin': PASSER_SON_TOUR, 'KP_Right': EST,
+           'KP_End': SUD_OUEST, 'KP_Down': SUD, 'KP_Next': SUD_EST,
+           'Up': NORD, 'Down': SUD, 'Left': OUEST, 'Right': EST,
+           'space': PASSER_SON_TOUR,
+           # et pour revenir en arrière (cf. annule_tour)
+           'a': ANNULER, 'BackSpace': ANNULER, 'r': REFAIRE}
+
+def prepare_animation(terrain_de_jeu, affichage, depart_joueur):
+    """Les glissements à montrer après un tour: (objet du canevas, départ, arrivée)
+
+    Met aussi affichage['robots'] à jour; le résultat est (glissements,
+    objets à effacer à la fin: les robots qui se sont cassés)."""
+    glissements = [(affichage['joueur'], depart_joueur, joueur(terrain_de_jeu))]
+    anciens = affichage['robots']
+    nouveaux = {}
+    a_effacer = []
+    for (depart, arrivee) in terrain_de_jeu.mouvements_robots:
+        objet = anciens.pop(depart, None)
+        if objet is None:
+            continue
+        glissements.append((objet, depart, arrivee))
+        if arrivee in terrain_de_jeu.positions_robots and arrivee not in nouveaux:
+            nouveaux[arrivee] = objet
+        else:
+            a_effacer.append(objet)
+    # les robots qui n'ont pas bougé (s'il y en a) gardent leur image
+    nouveaux.update(anciens)
+    affichage['robots'] = nouveaux
+    return (glissements, a_effacer)
+
+def joue(terrain_de_jeu, tk, canvas, champ=None):
     """Joue une partie sur le terrain de jeu donné
 
-    Vrai (True): le joueur a gagné: tous les robots sont morts avant de l'attraper
-    Faux (False): le joueur a perdu"""
+    Avec un `champ' (cf. nouveau_champ), les robots sont plus malins.  Le
+    joueur bouge en cliquant sur les commandes ou avec le clavier (cf.
+    TOUCHES), qui permet aussi d'annuler et de refaire des tours (si le
+    terrain a un journal, cf. TerrainIndexe).
+
+    Le terrain doit être un TerrainIndexe (cf. nouveau_jeu): l'animation a
+    besoin des mouvements des robots (cf. prepare_animation)."""
+    if not isinstance(terrain_de_jeu, TerrainIndexe):
+        raise ValueError("joue() a besoin d'un TerrainIndexe (cf. nouveau_jeu), "
+                         f"pas d'un {type(terrain_de_jeu).__name__}")
     tours = 0 # le nombre de tours auquel le joueur a déjà survécu
-    montre_le_terrain(terrain_de_jeu, canvas)
+    affichage = nouvel_affichage(canvas)
+    montre_le_terrain(terrain_de_jeu, affichage)
+    # les directions demandées par le joueur pendant un mouvement
+    a_faire = collections.deque()
+    # ce qui est en train de bouger (None si rien ne bouge)
+    animation = None
+    def tour_suivant():
+        "Joue le prochain tour de la file d'attente (s'il y en a un)"
+        nonlocal tours, animation # déclaration nécessaire pour changer les variables de joue()
+        while a_faire and animation is None:
+            direction = a_faire.popleft()
+            if direction in [ANNULER, REFAIRE]:
+                if direction == ANNULER and annule_tour(terrain_de_jeu):
+                    tours -= 1
+                elif direction == REFAIRE and refait_tour(terrain_de_jeu):
+                    tours += 1
+                if champ is not None:
+                    champ['joueur'] = None # le champ sera recalculé
+                montre_le_terrain(terrain_de_jeu, affichage)
+                continue
+            depart_joueur = joueur(terrain_de_jeu)
+            # sans journal (journal=False), ce tour ne pourra pas être annulé
+            debut = instantane(terrain_de_jeu) if peut_annuler(terrain_de_jeu) else None
+            debut_du_tour()
+            if not bouge_joueur(terrain_de_jeu, direction):
+                continue # mouvement impossible: on passe à l'ordre suivant
+            # si nous arrivons ici, le mouvement demandé par le joueur est
+            # valable:
+            tours += 1
+            # le joueur a bougé, c'est le tour des robots
+            en_vie = bouge_robots(terrain_de_jeu, champ)
+            if debut is not None:
+                tour_joue(terrain_de_jeu, debut)
+            (glissements, a_effacer) = prepare_animation(terrain_de_jeu, affichage, depart_joueur)
+            animation = {'debut': time.perf_counter(),
+                         'glissements': glissements,
+                         'a_effacer': a_effacer,
+                         'en_vie': en_vie}
+            image_suivante()
+            # la suite de l'animation est dessinée plus tard, par Tk: le tour
+            # s'arrête à la première image
+            fin_du_tour()
+    def image_suivante():
+        "Dessine une image du mouvement, puis demande à Tk de rappeler dans DELAI_IMAGE ms"
+        nonlocal animation
+        # de 0 (début du mouvement) à 1 (fin du mouvement)
+        avancement = min(1, (time.perf_counter() - animation['debut']) / DUREE_MOUVEMENT)
+        for (objet, depart, arrivee) in animation['glissements']:
+            ((x_depart, y_depart), (x_arrivee, y_arrivee)) = (coin(depart), coin(arrivee))
+            canvas.coords(objet,
+                          x_depart + (x_arrivee - x_depart) * avancement,
+                          y_depart + (y_arrivee - y_depart) * avancement)
+        if avancement < 1:
+            tk.after(DELAI_IMAGE, image_suivante)
+            return
+        # fin du mouvement
+        for objet in animation['a_effacer']:
+            canvas.delete(objet)
+        if not animation['en_vie']:
+            tk.destroy() # ferme la fenêtre et arrête le jeu
+            print('Un robot vous a tué après {} tour{}!'.format (
+                tours, '' if tours == 1 else 's'))
+        elif robots(terrain_de_jeu) <= 0:
+            # il n'y a plus de robots -> le jeu est fini
+            tk.destroy() # ferme la fenêtre et arrête le jeu
+            print('Félicitations, vous avez survécu à tous les robots')
+        else:
+            # les nouveaux débris (et tout ce que l'animation n'a pas montré)
+            montre_le_terrain(terrain_de_jeu, affichage)
+            animation = None
+            tour_suivant()
     def action_joueur(evenement):
         "Fonction à appeler pour chaque click souris"
         colonne_click = evenement.x // TAILLE_CASE
@@ -313,32 +922,24 @@ def joue(terrain_de_jeu, tk, canvas):
                      [OUEST,      PASSER_SON_TOUR, EST],
                      [SUD_OUEST,  SUD,             SUD_EST]
         ][rangee_click][colonne_click]
-        if bouge_joueur(terrain_de_jeu, direction):
-            # si nous arrivons ici, le mouvement demandé par le joueur est
-            # valable:
-            nonlocal tours # déclaration nécessaire pour accéder à la variable définie plus haut dans joue()
-            tours += 1
-            # le joueur a bougé, c'est le tour des robots
-            if not bouge_robots(terrain_de_jeu):
-                tk.destroy() # ferme la fenêtre et arrête le jeu
-                print('Un robot vous a tué après {} tour{}!'.format (
-                    tours, '' if tours == 1 else 's'))
-            else:
-                if robots(terrain_de_jeu) <= 0:
-                    # il n'y a plus de robots -> le jeu est fini
-                    tk.destroy() # ferme la fenêtre et arrête le jeu
-                    print('Félicitations, vous avez survécu à tous les robots')
-                else:
-                    # le joueur n'est pas encore mort mais il y a encore des
-                    # robots, redessinons le terrain
-                    montre_le_terrain(terrain_de_jeu, canvas)
-    ##### Fin de la définition locale de `action_joueur' ##########
+        a_faire.append(direction)
+        tour_suivant()
+    def action_clavier(evenement):
+        "Fonction à appeler pour chaque touche du clavier"
+        if evenement.keysym in TOUCHES:
+            a_faire.append(TOUCHES[evenement.keysym])
+            tour_suivant()
+    ##### Fin des définitions locales ##########
     # PplK 191-193: chaque fois que l'utilisateur cliquera dans le canevas, la
     # fonction action_joueur doit être appelée:
     canvas.bind('<Button-1>', action_joueur)
+    # et pour chaque touche du clavier, action_clavier
+    tk.bind('<Key>', action_clavier)
+
+def partie(malins=False):
+    """Crée un nouveau terrain de jeu puis laisse l'utilisateur jouer avec
 
-def partie():
-    "Crée un nouveau terrain de jeu puis laisse l'utilisateur jouer avec"
+    partie(malins=True): les robots contournent les obstacles."""
     terrain_de_jeu = nouveau_jeu()
     # Créer une nouvelle fenêtre
     tk = Tk()
@@ -351,5 +952,21 @@ def partie():
                     # joueur et le terrain de jeu:
                     width=(4 + colonnes(terrain_de_jeu)) * TAILLE_CASE);
     canvas.pack()
-    joue(terrain_de_jeu, tk, canvas)
+    joue(terrain_de_jeu, tk, canvas, nouveau_champ() if malins else None)
     tk.mainloop()
+
+def debut_du_tour():
+    "Le joueur a choisi son coup: le tour commence (pour le chronomètre, ne fait rien sinon)"
+
+def fin_du_tour():
+    "Le tour est fini et montré au joueur (cf. debut_du_tour)"
+
+# Pour savoir où passe le temps pendant une partie: ces fonctions (et les
+# tours, entre debut_du_tour et fin_du_tour) sont chronométrées si la
+# variable d'environnement CHRONOMETRE est définie (cf. chronometre.py, à la
+# racine du dépôt).  Sinon, rien ne change.
+A_CHRONOMETRER = ['joueur', 'robots', 'bouge_joueur', 'bouge_robots', 'montre_le_terrain']
+if os.environ.get('CHRONOMETRE'):
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import chronometre
+    chronometre.active(sys.modules[__name__])
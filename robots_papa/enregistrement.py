@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+import argparse
+import hashlib
+import os
+import random
+import struct
+import time
+
+from robots import *
+
+# Enregistrer une partie pour pouvoir la revoir (ou retrouver un bug).
+#
+# Il n'y a pas besoin d'enregistrer le terrain à chaque tour: avec la même
+# graine, nouveau_jeu crée toujours le même terrain, et les robots bougent
+# toujours de la même façon.  Il suffit donc d'enregistrer la graine, les
+# paramètres de nouveau_jeu et la direction choisie par le joueur à chaque
+# tour.  Il y a 9 directions possibles (cf. CODES), donc un octet par tour
+# suffit largement.
+#
+# Le fichier contient:
+#
+#    l'en-tête (ENTETE): paramètres de nouveau_jeu, nombre de tours, résultat
+#    la graine (en texte, UTF-8)
+#    un octet par tour
+#    l'empreinte (sha256) du terrain à la fin, pour vérifier que la partie
+#    rejouée finit bien de la même façon
+#
+# Pour aller directement au tour N d'une longue partie, le lecteur (cf.
+# nouveau_lecteur) garde une copie du terrain tous les `intervalle' tours
+# ("points de contrôle"): il repart de la copie la plus proche au lieu de
+# rejouer depuis le début.
+#
+# Exemple (enregistre 1000 parties jouées par la stratégie prudente, puis les
+# vérifie toutes):
+#
+#    python enregistrement.py --enregistre 1000 --repertoire parties
+#    python enregistrement.py --verifie parties/*.robo
+
+MAGIQUE = b'ROBO' # pour reconnaître nos fichiers
+VERSION = 3 # à chaque nouvelle version, nouveau_jeu crée d'autres terrains (2: robots, 3: obstacles)
+# < = petit-boutiste, 4s = 4 octets, B/H/I = entier de 1/2/4 octets sans
+# signe, i = entier de 4 octets avec signe
+ENTETE = struct.Struct('<4sHHHIiIBBH')
+SANS_OBSTACLES = -1 # dans l'en-tête: obstacles=None (le nombre par défaut)
+
+# le numéro (l'octet) de chaque direction
+CODES = [PASSER_SON_TOUR, NORD, NORD_EST, EST, SUD_EST, SUD, SUD_OUEST, OUEST, NORD_OUEST]
+
+# le résultat d'une partie
+EN_COURS = 0
+PERDU = 1
+GAGNE = 2
+
+def empreinte_terrain(terrain_de_jeu):
+    "Un résumé (sha256) de tout le terrain: deux terrains différents n'ont (presque) jamais le même"
+    empreinte = hashlib.sha256(struct.pack('<II', rangees(terrain_de_jeu), colonnes(terrain_de_jeu)))
+    for rangee in terrain_de_jeu:
+        empreinte.update(bytes(rangee))
+    return empreinte.digest()
+
+def nouvelle_partie_enregistree(graine, colonnes=30, rangees=18, nombre_de_robots=15,
+                                obstacles=None, malins=False):
+    """Commence une partie en se souvenant de tout ce qu'il faut pour la rejouer
+
+    Le résultat est un dictionnaire avec le terrain, les paramètres et les
+    directions jouées."""
+    # la graine est toujours gardée en texte: random.Random(3) et
+    # random.Random('3') ne donnent pas les mêmes nombres!
+    graine = str(graine)
+    parametres = {'colonnes': colonnes, 'rangees': rangees,
+                  'nombre_de_robots': nombre_de_robots, 'obstacles': obstacles}
+    return {'graine': graine,
+            'parametres': parametres,
+            'malins': malins,
+            'terrain': nouveau_jeu(graine=graine, journal=False, **parametres),
+            'champ': nouveau_champ() if malins else None,
+            'coups': bytearray(),
+            'resultat': EN_COURS}
+
+def joue_tour(partie, direction):
+    """Joue un tour (le joueur puis les robots) et l'enregistre
+
+    Faux si le mouvement est impossible (rien n'est enregistré)."""
+    if partie['resultat'] != EN_COURS or not bouge_joueur(partie['terrain'], direction):
+        return False
+    partie['coups'].append(CODES.index(direction))
+    if not bouge_robots(partie['terrain'], partie['champ']):
+        partie['resultat'] = PERDU
+    elif robots(partie['terrain']) == 0:
+        partie['resultat'] = GAGNE
+    return True
+
+def sauve(fichier, partie):
+    "Écrit la partie dans un fichier"
+    parametres = partie['parametres']
+    graine = partie['graine'].encode('utf-8')
+    entete = ENTETE.pack(MAGIQUE, VERSION, parametres['colonnes'], parametres['rangees'],
+                         parametres['nombre_de_robots'],
+                         SANS_OBSTACLES if parametres['obstacles'] is None else parametres['obstacles'],
+                         len(partie['coups']), partie['resultat'], partie['malins'], len(graine))
+    with open(fichier, 'wb') as f:
+        f.write(entete)
+        f.write(graine)
+        f.write(partie['coups'])
+        f.write(empreinte_terrain(partie['terrain']))
+
+def charge(fichier):
+    """Relit un enregistrement (sans rejouer la partie, cf. rejoue)
+
+    Le résultat est un dictionnaire avec les clés graine, parametres, malins,
+    coups, resultat et empreinte."""
+    with open(fichier, 'rb') as f:
+        donnees = f.read()
+    (magique, version, nombre_de_colonnes, nombre_de_rangees, nombre_de_robots, obstacles,
+     tours, resultat, malins, longueur_graine) = ENTETE.unpack_from(donnees)
+    if magique != MAGIQUE or version != VERSION:
+        raise ValueError("Ce n'est pas une partie de robots enregistrée")
+    debut = ENTETE.size + longueur_graine
+    return {'graine': donnees[ENTETE.size:debut].decode('utf-8'),
+            'parametres': {'colonnes': nombre_de_colonnes, 'rangees': nombre_de_rangees,
+                           'nombre_de_robots': nombre_de_robots,
+                           'obstacles': None if obstacles == SANS_OBSTACLES else obstacles},
+            'malins': bool(malins),
+            'coups': donnees[debut:debut + tours],
+            'resultat': resultat,
+            'empreinte': donnees[debut + tours:]}
+
+def nouveau_lecteur(enregistrement, intervalle=256):
+    """Un lecteur pour revoir une partie enregistrée, tour par tour (cf. va_au_tour)
+
+    Un point de contrôle (une copie compacte du terrain) est gardé tous les
+    `intervalle' tours."""
+    partie = nouvelle_partie_enregistree(enregistrement['graine'], malins=enregistrement['malins'],
+                                         **enregistrement['parametres'])
+    return {'enregistrement': enregistrement,
+            'intervalle': intervalle,
+            'partie': partie,
+            'tour': 0,
+            # tour -> (cases du terrain, une par octet, et résultat)
+            'points_de_controle': {0: (bytes(case for rangee in partie['terrain'] for case in rangee),
+                                       EN_COURS)}}
+
+def va_au_tour(lecteur, tour):
+    """Met le terrain du lecteur dans l'état où il était après `tour' tours
+
+    Le résultat est le terrain (lecteur['partie']['terrain'])."""
+    enregistrement = lecteur['enregistrement']
+    tour = min(tour, len(enregistrement['coups']))
+    partie = lecteur['partie']
+    # le point de contrôle le plus proche avant `tour'
+    depart = max(t for t in lecteur['points_de_controle'] if t <= tour)
+    if tour < lecteur['tour'] or depart > lecteur['tour']:
+        # il faut revenir en arrière, ou le point de contrôle est plus proche
+        # que le tour actuel: repartons de là
+        (cases, resultat) = lecteur['points_de_controle'][depart]
+        nombre_de_colonnes = enregistrement['parametres']['colonnes']
+        partie['terrain'] = TerrainIndexe((list(cases[debut:debut + nombre_de_colonnes])
+                                           for debut in range(0, len(cases), nombre_de_colonnes)),
+                                          journal=False)
+        # le champ des robots malins sera recalculé au prochain tour
+        partie['champ'] = nouveau_champ() if enregistrement['malins'] else None
+        partie['coups'] = bytearray(enregistrement['coups'][:depart])
+        partie['resultat'] = resultat
+        lecteur['tour'] = depart
+    while lecteur['tour'] < tour:
+        direction = CODES[enregistrement['coups'][lecteur['tour']]]
+        if not joue_tour(partie, direction):
+            raise ValueError(f"Le tour {lecteur['tour'] + 1} de l'enregistrement est impossible")
+        lecteur['tour'] += 1
+        if lecteur['tour'] % lecteur['intervalle'] == 0:
+            lecteur['points_de_controle'][lecteur['tour']] = (
+                bytes(case for rangee in partie['terrain'] for case in rangee), partie['resultat'])
+    return partie['terrain']
+
+def rejoue(enregistrement):
+    """Rejoue toute la partie, aussi vite que possible
+
+    Vrai si elle finit exactement comme quand elle a été enregistrée."""
+    partie = nouvelle_partie_enregistree(enregistrement['graine'], malins=enregistrement['malins'],
+                                         **enregistrement['parametres'])
+    for code in enregistrement['coups']:
+        if not joue_tour(partie, CODES[code]):
+            return False
+    return (partie['resultat'] == enregistrement['resultat']
+            and empreinte_terrain(partie['terrain']) == enregistrement['empreinte'])
+
+def partie_enregistree(fichier, graine=None, malins=False):
+    "Comme partie(), mais la partie est enregistrée dans `fichier'"
+    if graine is None:
+        graine = random.getrandbits(64)
+    partie = nouvelle_partie_enregistree(graine, malins=malins)
+    try:
+        while partie['resultat'] == EN_COURS:
+            montre_le_terrain(partie['terrain'])
+            while not joue_tour(partie, demande_direction()):
+                print('Désolé, vous ne pouvez pas faire ce mouvement')
+    finally:
+        # même si le joueur arrête avec Ctrl-C, ce qui a été joué est gardé
+        sauve(fichier, partie)
+    print('Félicitations, vous avez survécu à tous les robots' if partie['resultat'] == GAGNE
+          else 'Un robot vous a tué après {} tours!'.format(len(partie['coups'])))
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description='Enregistre ou vérifie des parties de robots')
+    arguments.add_argument('--enregistre', type=int, default=0,
+                           help='nombre de parties à faire jouer et enregistrer')
+    arguments.add_argument('--strategie', default='prudent')
+    arguments.add_argument('--repertoire', default='.')
+    arguments.add_argument('--graine', default='0')
+    arguments.add_argument('--verifie', nargs='*', default=[], help='fichiers à rejouer et vérifier')
+    options = arguments.parse_args()
+    if options.enregistre:
+        import simulation
+        strategie = simulation.STRATEGIES[options.strategie]
+        os.makedirs(options.repertoire, exist_ok=True)
+        for numero in range(options.enregistre):
+            graine = simulation.graine_de_partie(options.graine, numero)
+            partie = nouvelle_partie_enregistree(graine)
+            hasard = random.Random(graine + ':strategie')
+            while partie['resultat'] == EN_COURS and len(partie['coups']) < 10000:
+                if not joue_tour(partie, strategie(partie['terrain'], hasard)):
+                    joue_tour(partie, PASSER_SON_TOUR)
+            sauve(os.path.join(options.repertoire, f'{numero}.robo'), partie)
+    if options.verifie:
+        debut = time.perf_counter()
+        mauvaises = [fichier for fichier in options.verifie if not rejoue(charge(fichier))]
+        duree = time.perf_counter() - debut
+        print(f'{len(options.verifie)} parties rejouées en {duree:.2f} s '
+              f'({len(options.verifie) / duree:.0f} par seconde), {len(mauvaises)} différentes')
+        for fichier in mauvaises:
+            print(f'  {fichier}')
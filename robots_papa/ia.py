@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+import argparse
+import random
+import time
+
+from robots import *
+
+# Un joueur automatique pour robots.py: il essaie tous les coups possibles,
+# puis tous les coups possibles après chacun d'eux, etc. (on dit qu'il
+# "regarde plusieurs coups à l'avance") et choisit le coup qui lui permet de
+# survivre le plus longtemps.
+#
+# Les robots bougent toujours de la même façon (cf. bouge_robots), donc il
+# n'y a pas de hasard: après une suite de coups du joueur, on sait exactement
+# où seront les robots.
+#
+# Pour aller vite:
+# - un "état" du jeu est tout petit: (joueur, robots, obstacles) avec des
+#   numéros de cases (rangée * colonnes + colonne) au lieu d'un terrain
+#   complet à recopier;
+# - chaque état reçoit une "empreinte" (hachage de Zobrist): un nombre au
+#   hasard par case et par sorte de chose dans la case, combinés avec ^ (ou
+#   exclusif).  Souvent, plusieurs suites de coups mènent au même état: la
+#   "table de transposition" se souvient de l'empreinte des états déjà
+#   examinés et de leur résultat, pour ne pas les examiner deux fois;
+# - "approfondissement itératif": on cherche d'abord 1 coup à l'avance, puis
+#   2, puis 3, ... tant qu'il reste du temps, et on garde le résultat de la
+#   dernière recherche terminée;
+# - dès qu'une suite de coups permet de survivre jusqu'au bout de la
+#   recherche, inutile d'essayer les autres coups (sauf pour le premier coup,
+#   où on les compare tous).
+#
+# Exemple (fait jouer 20 parties avec 50 ms par coup):
+#
+#    python ia.py --parties 20 --temps 0.05
+
+DIRECTIONS = [NORD_OUEST, NORD, NORD_EST, OUEST, EST, SUD_OUEST, SUD, SUD_EST, PASSER_SON_TOUR]
+
+class TempsEcoule(Exception):
+    "Le temps de réflexion est écoulé: la recherche en cours est abandonnée"
+
+def etat_du_terrain(terrain_de_jeu):
+    """L'état (joueur, robots, obstacles) d'un terrain de robots.py
+
+    Pour un TerrainIndexe, les numéros des obstacles sont gardés dans le
+    terrain et ne sont recalculés que si un obstacle a changé: la plupart des
+    tours, seuls le joueur et les robots bougent, et le prix ne dépend plus
+    de la taille du terrain."""
+    nombre_de_colonnes = colonnes(terrain_de_jeu)
+    (rangee_joueur, colonne_joueur) = joueur(terrain_de_jeu)
+    if isinstance(terrain_de_jeu, TerrainIndexe):
+        gardes = terrain_de_jeu.obstacles_numerotes
+        if gardes is None or gardes[0] != terrain_de_jeu.changements_obstacles:
+            gardes = (terrain_de_jeu.changements_obstacles,
+                      frozenset(rangee * nombre_de_colonnes + colonne
+                                for (rangee, colonne) in terrain_de_jeu.positions_obstacles))
+            terrain_de_jeu.obstacles_numerotes = gardes
+        obstacles = gardes[1]
+        robots_positions = terrain_de_jeu.positions_robots
+    else:
+        obstacles = frozenset(rangee * nombre_de_colonnes + colonne
+                              for rangee in range(rangees(terrain_de_jeu))
+                              for colonne in range(nombre_de_colonnes)
+                              if case(terrain_de_jeu, rangee, colonne) == OBSTACLE)
+        robots_positions = positions_robots(terrain_de_jeu)
+    robots_numeros = frozenset(rangee * nombre_de_colonnes + colonne
+                               for (rangee, colonne) in robots_positions)
+    return (rangee_joueur * nombre_de_colonnes + colonne_joueur, robots_numeros, obstacles)
+
+def tour(etat, direction, nombre_de_colonnes):
+    """Le joueur bouge, puis les robots (cf. bouge_joueur et bouge_robots)
+
+    None si le mouvement du joueur est impossible, sinon (nouvel état,
+    débris), et None à la place du nouvel état si un robot attrape le
+    joueur.  `débris' est la liste des cases qui viennent de devenir des
+    obstacles."""
+    (joueur_numero, robots_numeros, obstacles) = etat
+    if direction != PASSER_SON_TOUR:
+        joueur_numero += direction[0] * nombre_de_colonnes + direction[1]
+        if joueur_numero in obstacles or joueur_numero in robots_numeros:
+            return None
+    (rangee_joueur, colonne_joueur) = divmod(joueur_numero, nombre_de_colonnes)
+    arrivees = {} # case -> nombre de robots qui y arrivent
+    for robot in robots_numeros:
+        (rangee, colonne) = divmod(robot, nombre_de_colonnes)
+        arrivee = (approche(rangee, rangee_joueur) * nombre_de_colonnes
+                   + approche(colonne, colonne_joueur))
+        if arrivee == joueur_numero:
+            return (None, [])
+        arrivees[arrivee] = arrivees.get(arrivee, 0) + 1
+    # un robot seul dans une case libre survit; deux robots ou plus dans la
+    # même case libre font des débris; un robot qui arrive sur un obstacle
+    # disparaît simplement
+    survivants = frozenset(arrivee for (arrivee, combien) in arrivees.items()
+                           if combien == 1 and arrivee not in obstacles)
+    debris = [arrivee for (arrivee, combien) in arrivees.items()
+              if combien > 1 and arrivee not in obstacles]
+    if debris:
+        obstacles = obstacles.union(debris)
+    return ((joueur_numero, survivants, obstacles), debris)
+
+def nouvelle_recherche(cases, graine=0):
+    "Les nombres au hasard du hachage de Zobrist et la table de transposition"
+    hasard = random.Random(graine)
+    return {'zobrist_joueur': [hasard.getrandbits(64) for _ in range(cases)],
+            'zobrist_robot': [hasard.getrandbits(64) for _ in range(cases)],
+            'zobrist_obstacle': [hasard.getrandbits(64) for _ in range(cases)],
+            # empreinte -> (profondeur cherchée, tours de survie)
+            'table': {},
+            'noeuds': 0,
+            'fin': None}
+
+def empreinte(recherche, etat):
+    "Le hachage de Zobrist complet d'un état"
+    (joueur_numero, robots_numeros, obstacles) = etat
+    resultat = recherche['zobrist_joueur'][joueur_numero]
+    for robot in robots_numeros:
+        resultat ^= recherche['zobrist_robot'][robot]
+    for obstacle in obstacles:
+        resultat ^= recherche['zobrist_obstacle'][obstacle]
+    return resultat
+
+def empreinte_suivante(recherche, cle, etat, suivant, debris):
+    "L'empreinte de `suivant' à partir de celle de `etat' (sans tout recalculer)"
+    cle ^= recherche['zobrist_joueur'][etat[0]] ^ recherche['zobrist_joueur'][suivant[0]]
+    for robot in etat[1]:
+        cle ^= recherche['zobrist_robot'][robot]
+    for robot in suivant[1]:
+        cle ^= recherche['zobrist_robot'][robot]
+    for obstacle in debris:
+        cle ^= recherche['zobrist_obstacle'][obstacle]
+    return cle
+
+def survie(recherche, etat, cle, profondeur, nombre_de_colonnes):
+    """Le plus grand nombre de tours (au plus `profondeur') que le joueur peut survivre"""
+    if profondeur == 0 or not etat[1]:
+        return profondeur # plus de robots: le joueur a gagné
+    connu = recherche['table'].get(cle)
+    if connu is not None:
+        (profondeur_connue, tours) = connu
+        if tours < profondeur_connue:
+            # tous les coups ont été essayés: le joueur meurt forcément après
+            # `tours' tours, même si on cherche plus loin
+            return min(tours, profondeur)
+        if profondeur_connue >= profondeur:
+            return profondeur
+    recherche['noeuds'] += 1
+    if recherche['noeuds'] % 256 == 0 and time.perf_counter() > recherche['fin']:
+        raise TempsEcoule()
+    meilleur = 0
+    for direction in DIRECTIONS:
+        resultat = tour(etat, direction, nombre_de_colonnes)
+        if resultat is None or resultat[0] is None:
+            continue # mouvement impossible ou attrapé par un robot
+        (suivant, debris) = resultat
+        tours = 1 + survie(recherche, suivant, empreinte_suivante(recherche, cle, etat, suivant, debris),
+                           profondeur - 1, nombre_de_colonnes)
+        if tours > meilleur:
+            meilleur = tours
+            if meilleur == profondeur:
+                break # survivre jusqu'au bout: pas besoin de chercher mieux
+    recherche['table'][cle] = (profondeur, meilleur)
+    return meilleur
+
+def qualite(etat, suivant, nombre_de_colonnes):
+    "Pour départager des coups qui survivent aussi longtemps: robots détruits, puis distance au robot le plus proche"
+    (rangee_joueur, colonne_joueur) = divmod(suivant[0], nombre_de_colonnes)
+    distance = min((max(abs(robot // nombre_de_colonnes - rangee_joueur),
+                        abs(robot % nombre_de_colonnes - colonne_joueur))
+                    for robot in suivant[1]),
+                   default=0)
+    return (len(etat[1]) - len(suivant[1]), distance)
+
+def cherche(terrain_de_jeu, temps=0.05, profondeur_maximum=64, recherche=None):
+    """Cherche le meilleur coup pendant `temps' secondes
+
+    Le résultat est (direction, profondeur atteinte, tours de survie prévus)."""
+    nombre_de_colonnes = colonnes(terrain_de_jeu)
+    if recherche is None:
+        recherche = nouvelle_recherche(rangees(terrain_de_jeu) * nombre_de_colonnes)
+    if len(recherche['table']) > 1000000:
+        recherche['table'].clear() # pour ne pas remplir toute la mémoire
+    recherche['fin'] = time.perf_counter() + temps
+    etat = etat_du_terrain(terrain_de_jeu)
+    cle = empreinte(recherche, etat)
+    coups = []
+    for direction in DIRECTIONS:
+        resultat = tour(etat, direction, nombre_de_colonnes)
+        if resultat is not None:
+            coups.append((direction, resultat[0], resultat[1]))
+    # si tout est perdu, autant passer son tour
+    choix = (PASSER_SON_TOUR, 0, 0)
+    for profondeur in range(1, profondeur_maximum + 1):
+        try:
+            notes = []
+            for (direction, suivant, debris) in coups:
+                if suivant is None:
+                    continue
+                tours = 1 + survie(recherche, suivant, empreinte_suivante(recherche, cle, etat, suivant, debris),
+                                   profondeur - 1, nombre_de_colonnes)
+                notes.append(((tours, qualite(etat, suivant, nombre_de_colonnes)), direction))
+        except TempsEcoule:
+            break
+        if not notes:
+            break
+        ((tours, _), direction) = max(notes, key=lambda note: note[0])
+        choix = (direction, profondeur, tours)
+        if tours < profondeur or not etat[1]:
+            break # le résultat ne changera plus en cherchant plus loin
+    return choix
+
+def choisit_direction(terrain_de_jeu, temps=0.05):
+    "La direction choisie par le joueur automatique (cf. demande_direction)"
+    return cherche(terrain_de_jeu, temps)[0]
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description='Fait jouer le joueur automatique')
+    arguments.add_argument('--parties', type=int, default=10)
+    arguments.add_argument('--temps', type=float, default=0.05)
+    arguments.add_argument('--graine', type=int, default=0)
+    options = arguments.parse_args()
+    random.seed(options.graine)
+    victoires = 0
+    profondeurs = []
+    for _ in range(options.parties):
+        terrain_de_jeu = nouveau_jeu(journal=False)
+        recherche = nouvelle_recherche(rangees(terrain_de_jeu) * colonnes(terrain_de_jeu))
+        while robots(terrain_de_jeu) > 0:
+            (direction, profondeur, _) = cherche(terrain_de_jeu, options.temps, recherche=recherche)
+            profondeurs.append(profondeur)
+            bouge_joueur(terrain_de_jeu, direction)
+            if not bouge_robots(terrain_de_jeu):
+                break
+        else:
+            victoires += 1
+    print(f'{victoires} parties gagnées sur {options.parties}, profondeur moyenne '
+          f'{sum(profondeurs) / len(profondeurs):.1f}, minimum {min(profondeurs)}')
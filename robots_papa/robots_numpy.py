@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+import argparse
+import time
+
+import numpy as np
+
+from robots import (VIDE, JOUEUR, ROBOT, OBSTACLE, PASSER_SON_TOUR, joueur)
+
+# Les mêmes règles que robots.py, mais pour des terrains gigantesques avec
+# des centaines de milliers de robots.
+#
+# Au lieu de bouger les robots un par un (cf. bouge_robots), nous utilisons
+# numpy qui fait le même calcul sur tous les robots d'un seul coup:
+#
+# - le terrain est un seul long tableau de cases (uint8: un octet par case),
+#   la case (rangée, colonne) a le numéro rangée * colonnes + colonne;
+# - les robots sont un tableau de numéros de cases, toujours triés (c'est
+#   l'ordre dans lequel robots.py les trouve en parcourant le terrain rangée
+#   par rangée);
+# - np.sign(joueur - robot) donne -1, 0 ou 1: c'est approche() pour tous les
+#   robots en même temps;
+# - np.unique(..., return_counts=True) compte combien de robots veulent aller
+#   dans chaque case: s'il y en a plus qu'un, c'est une collision.
+#
+# Le résultat est exactement celui de bouge_robots (même quand un robot
+# attrape le joueur).  Exemple (mesure la durée d'un tour):
+#
+#    python robots_numpy.py --rangees 2000 --colonnes 2000 --robots 100000
+
+def jeu_numpy(cases, colonnes, joueur_numero):
+    "Un jeu pour ce module: un dictionnaire avec le terrain et les positions"
+    return {'cases': cases,
+            'colonnes': colonnes,
+            'rangees': len(cases) // colonnes,
+            'joueur': joueur_numero,
+            # np.flatnonzero donne les numéros (déjà triés) des cases où la
+            # condition est vraie
+            'robots': np.flatnonzero(cases == ROBOT)}
+
+def depuis_terrain(terrain_de_jeu):
+    "Transforme un terrain de robots.py en jeu pour ce module"
+    cases = np.array(terrain_de_jeu, dtype=np.uint8)
+    (rangee, colonne) = joueur(terrain_de_jeu)
+    return jeu_numpy(cases.ravel(), cases.shape[1], rangee * cases.shape[1] + colonne)
+
+def vers_terrain(jeu):
+    "Le terrain de robots.py (liste de rangées) qui correspond au jeu"
+    return jeu['cases'].reshape(jeu['rangees'], jeu['colonnes']).tolist()
+
+def nouveau_jeu_numpy(rangees=18, colonnes=30, nombre_de_robots=15, graine=None):
+    """Crée un nouveau jeu (cf. nouveau_jeu) de n'importe quelle taille
+
+    ValueError s'il n'y a pas assez de place pour tous les robots."""
+    hasard = np.random.default_rng(graine)
+    cases = np.full((rangees, colonnes), VIDE, dtype=np.uint8)
+    # les obstacles autour du terrain
+    cases[0, :] = cases[-1, :] = OBSTACLE
+    cases[:, 0] = cases[:, -1] = OBSTACLE
+    cases = cases.ravel()
+    # le joueur, pas trop près du bord
+    marge_rangees = min(6, (rangees - 1) // 2)
+    marge_colonnes = min(6, (colonnes - 1) // 2)
+    rangee_joueur = int(hasard.integers(marge_rangees, rangees - marge_rangees))
+    colonne_joueur = int(hasard.integers(marge_colonnes, colonnes - marge_colonnes))
+    joueur_numero = rangee_joueur * colonnes + colonne_joueur
+    cases[joueur_numero] = JOUEUR
+    # les robots, dans des cases vides pas trop près du joueur
+    (toutes_rangees, toutes_colonnes) = np.divmod(np.arange(rangees * colonnes), colonnes)
+    distance = np.abs(toutes_rangees - rangee_joueur) + np.abs(toutes_colonnes - colonne_joueur)
+    possibles = np.flatnonzero((cases == VIDE) & (distance > min(rangees, colonnes) // 3))
+    if len(possibles) < nombre_de_robots:
+        raise ValueError(f"Pas assez de place pour {nombre_de_robots} robots")
+    cases[hasard.choice(possibles, nombre_de_robots, replace=False)] = ROBOT
+    # quelques obstacles, seulement dans les cases encore vides
+    essais = (hasard.integers(1, rangees - 1, min(rangees, colonnes) // 2) * colonnes
+              + hasard.integers(1, colonnes - 1, min(rangees, colonnes) // 2))
+    cases[essais[cases[essais] == VIDE]] = OBSTACLE
+    return jeu_numpy(cases, colonnes, joueur_numero)
+
+def bouge_joueur_numpy(jeu, direction):
+    "Bouge le joueur dans une direction (cf. bouge_joueur)"
+    if direction == PASSER_SON_TOUR:
+        return True
+    nouveau = jeu['joueur'] + direction[0] * jeu['colonnes'] + direction[1]
+    if jeu['cases'][nouveau] != VIDE:
+        return False
+    jeu['cases'][jeu['joueur']] = VIDE
+    jeu['cases'][nouveau] = JOUEUR
+    jeu['joueur'] = nouveau
+    return True
+
+def bouge_robots_numpy(jeu):
+    """Bouge tous les robots d'un coup (cf. bouge_robots)
+
+    Vrai si le jeu peut continuer, faux si un robot a rattrapé le joueur."""
+    cases = jeu['cases']
+    colonnes = jeu['colonnes']
+    robots_numeros = jeu['robots']
+    (rangee_joueur, colonne_joueur) = divmod(jeu['joueur'], colonnes)
+    (rangees_robots, colonnes_robots) = np.divmod(robots_numeros, colonnes)
+    nouveaux = (robots_numeros
+                + np.sign(rangee_joueur - rangees_robots) * colonnes
+                + np.sign(colonne_joueur - colonnes_robots))
+    # tous les robots quittent leur case ...
+    cases[robots_numeros] = VIDE
+    # ... bouge_robots s'arrête au premier robot (dans l'ordre des cases) qui
+    # attrape le joueur: ceux qui le suivent ne sont pas remis sur le terrain
+    attrape = np.flatnonzero(nouveaux == jeu['joueur'])
+    if len(attrape) > 0:
+        nouveaux = nouveaux[:attrape[0]]
+    # ... et arrivent dans leur nouvelle case: un robot seul dans une case
+    # vide y reste, sinon il y a des débris (collision entre robots ou avec
+    # un obstacle)
+    (destinations, combien) = np.unique(nouveaux, return_counts=True)
+    survivants = (combien == 1) & (cases[destinations] == VIDE)
+    cases[destinations[~survivants]] = OBSTACLE
+    jeu['robots'] = destinations[survivants] # np.unique les a triés
+    cases[jeu['robots']] = ROBOT
+    return len(attrape) == 0
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description='Mesure la durée des tours de robots_numpy')
+    arguments.add_argument('--rangees', type=int, default=2000)
+    arguments.add_argument('--colonnes', type=int, default=2000)
+    arguments.add_argument('--robots', type=int, default=100000)
+    arguments.add_argument('--tours', type=int, default=20)
+    arguments.add_argument('--graine', type=int, default=0)
+    options = arguments.parse_args()
+    jeu = nouveau_jeu_numpy(options.rangees, options.colonnes, options.robots, options.graine)
+    durees = []
+    for _ in range(options.tours):
+        debut = time.perf_counter()
+        en_vie = bouge_robots_numpy(jeu)
+        durees.append(time.perf_counter() - debut)
+        if not en_vie:
+            break
+    print(f'{len(durees)} tours, {len(jeu["robots"])} robots restants, '
+          f'{1000 * sum(durees) / len(durees):.2f} ms par tour en moyenne')
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+import argparse
+import csv
+import json
+import multiprocessing
+import random
+import sys
+import time
+
+from robots import *
+import ia
+
+# Ce module joue des parties de robots "sans écran": au lieu de demander au
+# joueur où il veut aller (avec input ou avec la souris), c'est une stratégie
+# (une fonction) qui choisit chaque direction.  Cela permet de jouer des
+# milliers de parties pour régler le jeu: combien de robots, quelle taille de
+# terrain, combien d'obstacles pour qu'il ne soit ni trop facile ni trop
+# difficile?
+#
+# Comme pour le démineur (cf. demineur_papa/simulation.py), les parties sont
+# réparties sur plusieurs processus et chaque partie a sa propre graine: le
+# même numéro de partie donne toujours le même terrain et les mêmes coups.
+# Le résultat de chaque partie est écrit dès qu'il est connu (une ligne par
+# partie, en CSV ou en JSONL), à la fin il ne reste que les totaux.
+#
+# Exemple (depuis une ligne de commande):
+#
+#    python simulation.py --parties 1000000 --strategie prudent --robots 20 --sortie parties.csv
+
+def strategie_passe(terrain_de_jeu, hasard):
+    "Ne bouge jamais"
+    return PASSER_SON_TOUR
+
+def strategie_au_hasard(terrain_de_jeu, hasard):
+    "Une direction possible choisie au hasard"
+    (rangee, colonne) = joueur(terrain_de_jeu)
+    possibles = [direction for direction in ia.DIRECTIONS
+                 if direction == PASSER_SON_TOUR
+                 or case(terrain_de_jeu, rangee + direction[0], colonne + direction[1]) == VIDE]
+    return hasard.choice(possibles)
+
+def strategie_prudente(terrain_de_jeu, hasard):
+    """Regarde un seul tour à l'avance
+
+    Parmi les directions où aucun robot n'attrape le joueur, choisit celle qui
+    détruit le plus de robots, puis celle qui l'éloigne le plus du robot le
+    plus proche (cf. ia.qualite)."""
+    etat = ia.etat_du_terrain(terrain_de_jeu)
+    nombre_de_colonnes = colonnes(terrain_de_jeu)
+    notes = []
+    for direction in ia.DIRECTIONS:
+        resultat = ia.tour(etat, direction, nombre_de_colonnes)
+        if resultat is not None and resultat[0] is not None:
+            notes.append((ia.qualite(etat, resultat[0], nombre_de_colonnes), direction))
+    if not notes:
+        return PASSER_SON_TOUR
+    meilleure = max(note for (note, _) in notes)
+    return hasard.choice([direction for (note, direction) in notes if note == meilleure])
+
+def strategie_ia(terrain_de_jeu, hasard):
+    """Le joueur automatique de ia.py (10 ms par coup)
+
+    Attention: le nombre de coups examinés dépend de la vitesse de
+    l'ordinateur, donc les résultats ne sont pas tout à fait reproductibles."""
+    return ia.choisit_direction(terrain_de_jeu, 0.01)
+
+# Les stratégies sont désignées par leur nom pour pouvoir les envoyer
+# facilement aux autres processus.
+STRATEGIES = {'passe': strategie_passe,
+              'hasard': strategie_au_hasard,
+              'prudent': strategie_prudente,
+              'ia': strategie_ia}
+
+def partie_sans_ecran(terrain_de_jeu, strategie, hasard, tours_maximum=1000):
+    """Joue une partie en laissant la stratégie choisir les directions (cf. joue)
+
+    Le résultat est un dictionnaire avec les clés 'gagne' (vrai ou faux),
+    'tours' (le nombre de tours survécus), 'robots_detruits' et
+    'robots_restants'."""
+    robots_au_depart = robots(terrain_de_jeu)
+    tours = 0
+    perdu = False
+    while robots(terrain_de_jeu) > 0 and not perdu and tours < tours_maximum:
+        direction = strategie(terrain_de_jeu, hasard)
+        debut_du_tour()
+        if not bouge_joueur(terrain_de_jeu, direction):
+            # une stratégie qui propose un mouvement impossible passe son tour
+            bouge_joueur(terrain_de_jeu, PASSER_SON_TOUR)
+        perdu = not bouge_robots(terrain_de_jeu)
+        fin_du_tour()
+        if not perdu:
+            tours += 1
+    restants = robots(terrain_de_jeu)
+    return {'gagne': restants == 0 and not perdu,
+            'tours': tours,
+            'robots_detruits': robots_au_depart - restants,
+            'robots_restants': restants}
+
+def graine_de_partie(graine, numero):
+    "Graine d'une partie donnée (cf. demineur_papa/simulation.py)"
+    return f'{graine}:{numero}'
+
+def joue_une_partie(travail):
+    "Crée un terrain et joue une partie (cette fonction tourne dans un des processus)"
+    (graine, numero, nom_strategie, parametres) = travail
+    graine = graine_de_partie(graine, numero)
+    # personne n'annulera de tour: pas besoin de journal
+    terrain_de_jeu = nouveau_jeu(graine=graine, journal=False, **parametres)
+    hasard = random.Random(graine + ':strategie')
+    debut = time.perf_counter()
+    resultat = partie_sans_ecran(terrain_de_jeu, STRATEGIES[nom_strategie], hasard)
+    resultat['duree'] = time.perf_counter() - debut
+    resultat['numero'] = numero
+    mesures_du_chronometre(resultat)
+    return resultat
+
+def mesures_du_chronometre(resultat):
+    """Joint au résultat les mesures du chronomètre de ce processus (s'il est actif)
+
+    Les parties sont jouées dans d'autres processus: sans cela, leurs mesures
+    seraient perdues (cf. chronometre.envoie et ajoute_mesures)."""
+    chronometre = sys.modules.get('chronometre')
+    if chronometre is not None:
+        resultat['chronometre'] = chronometre.envoie()
+
+def ajoute_mesures(resultat):
+    "Ajoute au chronomètre de ce processus les mesures jointes au résultat"
+    mesures = resultat.pop('chronometre', None)
+    if mesures is not None:
+        sys.modules['chronometre'].recoit(mesures)
+
+def commence_les_mesures():
+    "Au début de chaque processus: oublie les mesures copiées du processus principal"
+    chronometre = sys.modules.get('chronometre')
+    if chronometre is not None:
+        chronometre.remet_a_zero()
+
+# l'ordre des colonnes dans les fichiers de résultats
+CHAMPS = ['numero', 'gagne', 'tours', 'robots_detruits', 'robots_restants', 'duree']
+
+def nouvel_ecrivain(fichier, format_de_sortie):
+    "Une fonction qui écrit le résultat d'une partie dans `fichier' (une ligne par partie)"
+    if format_de_sortie == 'csv':
+        ecrivain = csv.DictWriter(fichier, CHAMPS)
+        ecrivain.writeheader()
+        return ecrivain.writerow
+    def ecrit_jsonl(resultat):
+        fichier.write(json.dumps({champ: resultat[champ] for champ in CHAMPS}) + '\n')
+    return ecrit_jsonl
+
+def nouvelles_statistiques():
+    "Statistiques vides, à remplir avec ajoute_resultat"
+    return {'parties': 0,
+            'victoires': 0,
+            'tours': 0,
+            'robots_detruits': 0,
+            'duree': 0.0}
+
+def ajoute_resultat(statistiques, resultat):
+    "Ajoute le résultat d'une partie aux statistiques (seulement des totaux)"
+    statistiques['parties'] += 1
+    if resultat['gagne']:
+        statistiques['victoires'] += 1
+    statistiques['tours'] += resultat['tours']
+    statistiques['robots_detruits'] += resultat['robots_detruits']
+    statistiques['duree'] += resultat['duree']
+
+def resume(statistiques):
+    "Texte résumant les statistiques"
+    parties = max(1, statistiques['parties'])
+    return ('{} parties, {:.2%} gagnées, {:.2f} tours par partie, {:.2f} robots détruits '
+            'par partie, {:.1f} µs par partie').format(
+                statistiques['parties'],
+                statistiques['victoires'] / parties,
+                statistiques['tours'] / parties,
+                statistiques['robots_detruits'] / parties,
+                1e6 * statistiques['duree'] / parties)
+
+def simule(parties, nom_strategie='prudent', graine=0, processus=None, paquet=64,
+           parametres=None, ecrit=None):
+    """Joue beaucoup de parties en parallèle et renvoie les statistiques
+
+    `parametres' est un dictionnaire pour nouveau_jeu (p.ex. {'nombre_de_robots':
+    20}) et `ecrit' une fonction appelée avec le résultat de chaque partie
+    (cf. nouvel_ecrivain)."""
+    parametres = parametres or {}
+    travail = ((graine, numero, nom_strategie, parametres) for numero in range(parties))
+    statistiques = nouvelles_statistiques()
+    with multiprocessing.Pool(processus, initializer=commence_les_mesures) as pool:
+        for resultat in pool.imap_unordered(joue_une_partie, travail, chunksize=paquet):
+            ajoute_mesures(resultat)
+            ajoute_resultat(statistiques, resultat)
+            if ecrit is not None:
+                ecrit(resultat)
+    return statistiques
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description='Joue beaucoup de parties de robots sans écran')
+    arguments.add_argument('--parties', type=int, default=10000)
+    arguments.add_argument('--strategie', choices=sorted(STRATEGIES.keys()), default='prudent')
+    arguments.add_argument('--graine', default='0')
+    arguments.add_argument('--processus', type=int, default=None)
+    arguments.add_argument('--colonnes', type=int, default=30)
+    arguments.add_argument('--rangees', type=int, default=18)
+    arguments.add_argument('--robots', type=int, default=15)
+    arguments.add_argument('--obstacles', type=int, default=None)
+    arguments.add_argument('--densite', type=float, default=None, help='fraction de cases avec un obstacle')
+    arguments.add_argument('--distance', type=int, default=None, help='distance minimum joueur-robots')
+    arguments.add_argument('--sortie', default=None, help='fichier des résultats (- pour l\'écran)')
+    arguments.add_argument('--format', choices=['csv', 'jsonl'], default=None,
+                           help='par défaut: csv si la sortie finit par .csv, sinon jsonl')
+    options = arguments.parse_args()
+    parametres = {'colonnes': options.colonnes,
+                  'rangees': options.rangees,
+                  'nombre_de_robots': options.robots,
+                  'obstacles': options.obstacles,
+                  'densite_obstacles': options.densite,
+                  'distance_minimum': options.distance}
+    format_de_sortie = options.format or ('csv' if (options.sortie or '').endswith('.csv') else 'jsonl')
+    if options.sortie is None:
+        statistiques = simule(options.parties, options.strategie, options.graine, options.processus,
+                              parametres=parametres)
+    elif options.sortie == '-':
+        statistiques = simule(options.parties, options.strategie, options.graine, options.processus,
+                              parametres=parametres, ecrit=nouvel_ecrivain(sys.stdout, format_de_sortie))
+    else:
+        with open(options.sortie, 'w', newline='') as fichier:
+            statistiques = simule(options.parties, options.strategie, options.graine, options.processus,
+                                  parametres=parametres, ecrit=nouvel_ecrivain(fichier, format_de_sortie))
+    print(resume(statistiques), file=sys.stderr if options.sortie == '-' else sys.stdout)
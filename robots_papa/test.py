@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+import copy
+import random
+
+from robots import *
+import ia
+import simulation
+
+try:
+    import robots_numpy
+except ImportError:
+    # numpy n'est pas installé: ce moteur-là n'est pas testé
+    robots_numpy = None
+
+# Ces tests automatiques vérifient que les différentes façons de jouer aux
+# robots (cf. demineur_papa/test.py) donnent toutes exactement le même
+# résultat.
+#
+# La "référence" est la version la plus simple: une liste de rangées, et
+# bouge_joueur/bouge_robots qui parcourent tout le terrain.  Chaque "moteur"
+# plus rapide (TerrainIndexe, ia.tour, robots_numpy, ...) joue les mêmes
+# parties au hasard, coup par coup, et après chaque tour le terrain doit être
+# exactement celui de la référence.  On appelle cela un test "différentiel":
+# on ne sait pas à l'avance quel doit être le résultat, mais tous les moteurs
+# doivent trouver le même.
+#
+# Pour tester un nouveau moteur, il suffit de l'ajouter dans MOTEURS.
+
+def verifie(obtenu, attendu, s):
+    if obtenu == attendu:
+        return True
+    else:
+        raise Exception(f"{s}: j'ai eu {obtenu}, j'attendais {attendu}")
+
+# Un moteur est un dictionnaire avec trois fonctions:
+# - 'prepare': transforme un terrain de référence (liste de rangées) en jeu
+#   pour ce moteur;
+# - 'tour': joue un tour (le joueur, puis les robots) et renvoie (mouvement
+#   possible, joueur encore en vie), comme bouge_joueur et bouge_robots;
+# - 'terrain': redonne le terrain sous forme de liste de rangées.
+
+def tour_reference(terrain_de_jeu, direction):
+    possible = bouge_joueur(terrain_de_jeu, direction)
+    return (possible, bouge_robots(terrain_de_jeu))
+
+def prepare_ia(terrain_de_jeu):
+    return {'etat': ia.etat_du_terrain(terrain_de_jeu),
+            'rangees': rangees(terrain_de_jeu),
+            'colonnes': colonnes(terrain_de_jeu)}
+
+def tour_ia(jeu, direction):
+    resultat = ia.tour(jeu['etat'], direction, jeu['colonnes'])
+    possible = resultat is not None
+    if not possible:
+        # comme pour les autres moteurs, les robots bougent quand même
+        resultat = ia.tour(jeu['etat'], PASSER_SON_TOUR, jeu['colonnes'])
+    if resultat[0] is None:
+        return (possible, False)
+    jeu['etat'] = resultat[0]
+    return (possible, True)
+
+def terrain_ia(jeu):
+    (joueur_numero, robots_numeros, obstacles) = jeu['etat']
+    terrain_de_jeu = [[VIDE] * jeu['colonnes'] for _ in range(jeu['rangees'])]
+    for (numeros, valeur) in [(obstacles, OBSTACLE), (robots_numeros, ROBOT), ([joueur_numero], JOUEUR)]:
+        for numero in numeros:
+            (rangee, colonne) = divmod(numero, jeu['colonnes'])
+            terrain_de_jeu[rangee][colonne] = valeur
+    return terrain_de_jeu
+
+def tour_numpy(jeu, direction):
+    possible = robots_numpy.bouge_joueur_numpy(jeu, direction)
+    return (possible, robots_numpy.bouge_robots_numpy(jeu))
+
+MOTEURS = {'indexe': {'prepare': TerrainIndexe,
+                      'tour': tour_reference,
+                      'terrain': lambda jeu: [list(rangee) for rangee in jeu]},
+           'sans_journal': {'prepare': lambda terrain_de_jeu: TerrainIndexe(terrain_de_jeu, journal=False),
+                            'tour': tour_reference,
+                            'terrain': lambda jeu: [list(rangee) for rangee in jeu]},
+           'ia': {'prepare': prepare_ia,
+                  'tour': tour_ia,
+                  'terrain': terrain_ia}}
+if robots_numpy is not None:
+    MOTEURS['numpy'] = {'prepare': robots_numpy.depuis_terrain,
+                        'tour': tour_numpy,
+                        'terrain': robots_numpy.vers_terrain}
+
+DIRECTIONS = [PASSER_SON_TOUR, NORD, NORD_EST, EST, SUD_EST, SUD, SUD_OUEST, OUEST, NORD_OUEST]
+
+def direction_au_hasard(terrain_de_jeu, hasard):
+    """Le plus souvent un coup "prudent", parfois n'importe quelle direction
+
+    Un joueur qui ne fait que des coups au hasard est attrapé après deux ou
+    trois tours: les parties seraient trop courtes pour tester grand-chose."""
+    if hasard.random() < 0.8:
+        return simulation.strategie_prudente(terrain_de_jeu, hasard)
+    return hasard.choice(DIRECTIONS)
+
+def terrain_au_hasard(hasard):
+    "Un terrain de référence (liste de rangées) de taille et de contenu au hasard"
+    nombre_de_colonnes = hasard.randint(5, 40)
+    nombre_de_rangees = hasard.randint(5, 25)
+    # les robots pas trop près du joueur, sinon la partie ne dure pas
+    terrain_de_jeu = nouveau_jeu(nombre_de_colonnes, nombre_de_rangees,
+                                 hasard.randint(1, (nombre_de_rangees - 2) * (nombre_de_colonnes - 2) // 20 + 1),
+                                 densite_obstacles=hasard.choice([None, 0.0, 0.05, 0.2]),
+                                 distance_minimum=min(nombre_de_rangees, nombre_de_colonnes) // 3,
+                                 graine=hasard.getrandbits(32))
+    return [list(rangee) for rangee in terrain_de_jeu]
+
+def test_moteurs_differentiel(parties=200, graine=0):
+    hasard = random.Random(graine)
+    for numero in range(parties):
+        reference = terrain_au_hasard(hasard)
+        jeux = {nom: moteur['prepare'](copy.deepcopy(reference)) for (nom, moteur) in MOTEURS.items()}
+        for numero_du_tour in range(100):
+            direction = direction_au_hasard(reference, hasard)
+            attendu = tour_reference(reference, direction)
+            for (nom, moteur) in MOTEURS.items():
+                s = f"erreur dans le moteur {nom} (partie {numero}, tour {numero_du_tour}, direction {direction})"
+                verifie(moteur['tour'](jeux[nom], direction), attendu, s)
+                if attendu[1]:
+                    # quand le joueur est attrapé, seul le résultat compte
+                    verifie(moteur['terrain'](jeux[nom]), reference, s)
+            if not attendu[1] or robots(reference) == 0:
+                break
+
+def test_terrain_indexe():
+    hasard = random.Random(1)
+    for numero in range(50):
+        terrain_de_jeu = TerrainIndexe(terrain_au_hasard(hasard))
+        reference = [list(rangee) for rangee in terrain_de_jeu]
+        for numero_du_tour in range(30):
+            s = f"erreur dans TerrainIndexe (partie {numero}, tour {numero_du_tour})"
+            verifie(joueur(terrain_de_jeu), joueur(reference), s)
+            verifie(robots(terrain_de_jeu), robots(reference), s)
+            verifie(positions_robots(terrain_de_jeu), positions_robots(reference), s)
+            direction = direction_au_hasard(reference, hasard)
+            en_vie = tour_reference(reference, direction)[1]
+            verifie(tour_reference(terrain_de_jeu, direction)[1], en_vie, s)
+            if not en_vie or robots(reference) == 0:
+                break
+
+def test_nouveau_jeu():
+    for graine in range(100):
+        (nombre_de_colonnes, nombre_de_rangees) = (10 + graine % 20, 8 + graine % 13)
+        terrain_de_jeu = nouveau_jeu(nombre_de_colonnes, nombre_de_rangees, 5 + graine % 10,
+                                     obstacles=graine % 7, distance_minimum=3, graine=graine)
+        s = f"erreur dans nouveau_jeu(..., graine={graine})"
+        verifie(robots(terrain_de_jeu), 5 + graine % 10, s)
+        verifie(sum(rangee.count(OBSTACLE) for rangee in terrain_de_jeu),
+                2 * (nombre_de_colonnes + nombre_de_rangees) - 4 + graine % 7, s)
+        (rangee_joueur, colonne_joueur) = joueur(terrain_de_jeu)
+        verifie(all(abs(rangee - rangee_joueur) + abs(colonne - colonne_joueur) >= 3
+                    for (rangee, colonne) in positions_robots(terrain_de_jeu)), True, s)
+        verifie(nouveau_jeu(nombre_de_colonnes, nombre_de_rangees, 5 + graine % 10,
+                            obstacles=graine % 7, distance_minimum=3, graine=graine),
+                terrain_de_jeu, f"erreur: nouveau_jeu(..., graine={graine}) change d'un appel à l'autre")
+    try:
+        nouveau_jeu(5, 5, 100, graine=0)
+    except ValueError:
+        pass
+    else:
+        raise Exception("erreur: nouveau_jeu(5, 5, 100) devrait refuser")
+
+def test_annule_et_refait():
+    hasard = random.Random(2)
+    for numero in range(30):
+        terrain_de_jeu = TerrainIndexe(terrain_au_hasard(hasard))
+        etats = [copy.deepcopy(list(terrain_de_jeu))]
+        for _ in range(20):
+            debut = instantane(terrain_de_jeu)
+            if not bouge_joueur(terrain_de_jeu, direction_au_hasard(terrain_de_jeu, hasard)):
+                bouge_joueur(terrain_de_jeu, PASSER_SON_TOUR)
+            en_vie = bouge_robots(terrain_de_jeu)
+            tour_joue(terrain_de_jeu, debut)
+            etats.append(copy.deepcopy(list(terrain_de_jeu)))
+            if not en_vie or robots(terrain_de_jeu) == 0:
+                break
+        for tour in range(len(etats) - 2, -1, -1):
+            verifie(annule_tour(terrain_de_jeu), True, f"erreur dans annule_tour (partie {numero})")
+            verifie(list(terrain_de_jeu), etats[tour], f"erreur dans annule_tour (partie {numero}, tour {tour})")
+        verifie(annule_tour(terrain_de_jeu), False, f"erreur: rien à annuler (partie {numero})")
+        for tour in range(1, len(etats)):
+            verifie(refait_tour(terrain_de_jeu), True, f"erreur dans refait_tour (partie {numero})")
+            verifie(list(terrain_de_jeu), etats[tour], f"erreur dans refait_tour (partie {numero}, tour {tour})")
+        verifie(positions_robots(terrain_de_jeu), positions_robots(etats[-1]),
+                f"erreur dans les positions après refait_tour (partie {numero})")
+    # sans journal, rien n'est gardé (et rien ne peut être annulé)
+    terrain_de_jeu = nouveau_jeu(graine=0, journal=False)
+    bouge_joueur(terrain_de_jeu, PASSER_SON_TOUR)
+    bouge_robots(terrain_de_jeu)
+    verifie(terrain_de_jeu.journal, None, "erreur: nouveau_jeu(..., journal=False) a un journal")
+    verifie(peut_annuler(terrain_de_jeu), False, "erreur dans peut_annuler")
+
+def test_etat_du_terrain():
+    # l'état d'un TerrainIndexe (obstacles gardés d'un tour à l'autre) doit
+    # toujours être celui d'une simple liste de rangées, même quand des
+    # débris apparaissent ou disparaissent (annule_tour)
+    hasard = random.Random(4)
+    for numero in range(30):
+        terrain_de_jeu = TerrainIndexe(terrain_au_hasard(hasard))
+        for numero_du_tour in range(20):
+            s = f"erreur dans etat_du_terrain (partie {numero}, tour {numero_du_tour})"
+            verifie(ia.etat_du_terrain(terrain_de_jeu), ia.etat_du_terrain([list(rangee) for rangee in terrain_de_jeu]), s)
+            debut = instantane(terrain_de_jeu)
+            if not bouge_joueur(terrain_de_jeu, direction_au_hasard(terrain_de_jeu, hasard)):
+                bouge_joueur(terrain_de_jeu, PASSER_SON_TOUR)
+            en_vie = bouge_robots(terrain_de_jeu)
+            tour_joue(terrain_de_jeu, debut)
+            if hasard.random() < 0.2:
+                annule_tour(terrain_de_jeu)
+            elif not en_vie or robots(terrain_de_jeu) == 0:
+                break
+
+def test_champ_repare():
+    # un champ gardé et réparé d'un tour à l'autre doit faire bouger les
+    # robots malins exactement comme un champ tout neuf à chaque tour
+    hasard = random.Random(3)
+    for numero in range(50):
+        repare = TerrainIndexe(terrain_au_hasard(hasard))
+        neuf = TerrainIndexe([list(rangee) for rangee in repare])
+        champ = nouveau_champ()
+        for numero_du_tour in range(50):
+            direction = direction_au_hasard(neuf, hasard)
+            verifie(bouge_joueur(repare, direction), bouge_joueur(neuf, direction),
+                    f"erreur dans bouge_joueur (partie {numero}, tour {numero_du_tour})")
+            en_vie = bouge_robots(repare, champ)
+            verifie(en_vie, bouge_robots(neuf, nouveau_champ()),
+                    f"erreur dans bouge_robots(..., champ) (partie {numero}, tour {numero_du_tour})")
+            if not en_vie or robots(neuf) == 0:
+                break
+            verifie(list(repare), list(neuf),
+                    f"erreur dans repare_champ (partie {numero}, tour {numero_du_tour})")
+
+def test_enregistrement():
+    import enregistrement
+    for graine in range(10):
+        partie = enregistrement.nouvelle_partie_enregistree(graine, malins=graine % 2 == 1)
+        hasard = random.Random(graine)
+        while partie['resultat'] == enregistrement.EN_COURS and len(partie['coups']) < 200:
+            if not enregistrement.joue_tour(partie, direction_au_hasard(partie['terrain'], hasard)):
+                enregistrement.joue_tour(partie, PASSER_SON_TOUR)
+        relu = {'graine': partie['graine'], 'parametres': partie['parametres'],
+                'malins': partie['malins'], 'coups': bytes(partie['coups']),
+                'resultat': partie['resultat'],
+                'empreinte': enregistrement.empreinte_terrain(partie['terrain'])}
+        verifie(enregistrement.rejoue(relu), True, f"erreur dans rejoue (graine={graine})")
+        lecteur = enregistrement.nouveau_lecteur(relu, intervalle=4)
+        for tour in [len(relu['coups']), 3, 0, len(relu['coups']) // 2]:
+            attendu = enregistrement.nouveau_lecteur(relu)
+            verifie(enregistrement.va_au_tour(lecteur, tour), enregistrement.va_au_tour(attendu, tour),
+                    f"erreur dans va_au_tour(..., {tour}) (graine={graine})")
+
+def test_simulation_reproductible():
+    def sans_duree(resultat):
+        del resultat['duree']
+        return resultat
+    for numero in range(20):
+        verifie(sans_duree(simulation.joue_une_partie((7, numero, 'prudent', {}))),
+                sans_duree(simulation.joue_une_partie((7, numero, 'prudent', {}))),
+                f"erreur dans joue_une_partie((7, {numero}, 'prudent', {{}}))")
+
+def tout_tester():
+    test_moteurs_differentiel()
+    test_terrain_indexe()
+    test_nouveau_jeu()
+    test_annule_et_refait()
+    test_etat_du_terrain()
+    test_champ_repare()
+    test_enregistrement()
+    test_simulation_reproductible()
+
+if __name__ == "__main__":
+    tout_tester()